@@ -0,0 +1,313 @@
+"""Time `dtop` commands end to end against a fake `docker` on a synthetic fleet.
+
+Generates a registry of N projects with M services each (prod and dev
+compose files, dependency chains, a shared network and a volume, and a
+Dockerfile the dev services build from), puts benchmarks/fake_docker.py on
+PATH as `docker` and forces the CLI backend, so every Docker interaction
+is a counted process spawn.  Each scenario
+starts from a known fleet state and records the best and median wall time
+and how many docker invocations of each kind it made:
+
+    python benchmarks/cli.py --output cli.json
+    python benchmarks/cli.py --projects 300 --services 12 --latency 0.02
+    python benchmarks/cli.py --baseline cli.json --tolerance 0.25
+
+With --baseline, any scenario that makes more docker calls than before, or
+whose median wall time grows beyond --tolerance, is reported and the script
+exits non-zero.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import yaml
+
+HERE = Path(__file__).resolve().parent
+SRC = HERE.parent / "src"
+FAKE_DOCKER = HERE / "fake_docker.py"
+
+# name -> (initial state, dtop arguments)
+SCENARIOS = {
+    "ls": ("fleet", ["ls"]),
+    "ls-json": ("fleet", ["ls", "--format", "json"]),
+    "ls-project": ("fleet", ["ls", "p0"]),
+    "up-cold": ("fleet-without-p0", ["up", "p0"]),
+    "up-warm": ("after:up-cold", ["up", "p0"]),
+    "up-dev": ("fleet", ["up", "p0", "--dev", "s1,s2"]),
+    "up-minimal": ("fleet-without-p0", ["up", "p0", "--dev", "s2", "--minimal"]),
+    "up-wait": ("fleet", ["up", "p0", "--dev", "s1,s2", "--wait"]),
+    "up-prefetch": ("fleet-without-p0", ["up", "p0", "--prefetch"]),
+    "up-build": ("fleet", ["up", "p0", "--dev", "ALL", "--build"]),
+    "up-build-warm": ("after:up-build", ["up", "p0", "--dev", "ALL", "--build"]),
+    "up-after-build": ("after:up-build", ["up", "p0", "--dev", "ALL"]),
+    "swap": ("fleet", ["swap", "p0", "s1,s2"]),
+    "swap-overlap": ("fleet", ["swap", "p0", "s1,s2", "--overlap"]),
+    "down": ("fleet", ["down", "p0", "--all"]),
+    "pull": ("fleet", ["pull", "p0"]),
+    "down-fleet": ("fleet", ["down", "--all-projects", "--all", "--jobs", "8"]),
+    "up-fleet": ("empty", ["up", "--all-projects", "--jobs", "8"]),
+}
+
+
+def _service(project: int, index: int, env: str) -> dict:
+    cfg = {"image": f"svc{index}:{env}"} if env == "prod" else {"build": {"context": "."}}
+    # Chains of five: s1 -> s0, s2 -> s1, ... restart at every fifth service.
+    if index % 5:
+        cfg["depends_on"] = [f"s{index - 1}"]
+    if index == 0:
+        cfg["volumes"] = [f"data:/var/lib/p{project}"]
+    return cfg
+
+
+def generate_fleet(root: Path, projects: int, services: int) -> dict:
+    """Write compose files and a registry, and return the state with every project up."""
+    registry = root / "registry" / "projects"
+    registry.mkdir(parents=True)
+    state = {"containers": [], "networks": {}, "volumes": {}, "images": {}}
+    for p in range(projects):
+        name = f"p{p}"
+        project_dir = root / "projects" / name
+        project_dir.mkdir(parents=True)
+        (project_dir / "Dockerfile").write_text(f"FROM scratch\nLABEL project={name}\n")
+        for env in ("prod", "dev"):
+            compose = {
+                "services": {f"s{i}": _service(p, i, env) for i in range(services)},
+                "networks": {"default": {"name": f"{name}_net"}},
+                "volumes": {"data": {"name": f"{name}_data"}},
+            }
+            (project_dir / f"{env}.yml").write_text(yaml.safe_dump(compose))
+        (registry / f"{name}.yml").write_text(
+            yaml.safe_dump(
+                {
+                    "root": str(project_dir),
+                    "compose": {
+                        "dev": str(project_dir / "dev.yml"),
+                        "prod": str(project_dir / "prod.yml"),
+                    },
+                }
+            )
+        )
+
+        labels = {"dtop.project": name}
+        state["networks"][f"{name}_net"] = labels
+        state["volumes"][f"{name}_data"] = labels
+        for i in range(services):
+            state["containers"].append(
+                {
+                    "Id": f"{p:06x}{i:06x}".ljust(64, "0"),
+                    "Name": f"{name}-s{i}-1",
+                    "Image": f"svc{i}:prod",
+                    "State": "running",
+                    "Labels": {
+                        "dtop.project": name,
+                        "dtop.env": "prod",
+                        "com.docker.compose.service": f"s{i}",
+                        "com.docker.compose.project": name,
+                    },
+                    "Networks": [f"{name}_net"],
+                    "Mounts": [f"{name}_data"] if i == 0 else [],
+                }
+            )
+    return state
+
+
+def _initial_state(kind: str, fleet: dict, produced: dict[str, dict]) -> dict:
+    if kind == "fleet":
+        return fleet
+    if kind == "empty":
+        return {"containers": [], "networks": {}, "volumes": {}, "images": {}}
+    if kind == "fleet-without-p0":
+        return {
+            **fleet,
+            "containers": [
+                c for c in fleet["containers"] if c["Labels"]["dtop.project"] != "p0"
+            ],
+        }
+    if kind.startswith("after:"):
+        return produced[kind.split(":", 1)[1]]
+    raise ValueError(f"unknown initial state {kind!r}")
+
+
+def _env(root: Path, args) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "PATH": os.pathsep.join([str(root / "bin"), env.get("PATH", "")]),
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")])),
+            "HOME": str(root / "home"),
+            "DTOP_CACHE_DIR": str(root / "cache"),
+            "DTOP_DOCKER_BACKEND": "cli",
+            "DTOP_FAKE_STATE": str(root / "state.json"),
+            "DTOP_FAKE_LOG": str(root / "calls.log"),
+            "DTOP_FAKE_LATENCY": str(args.latency),
+            "DTOP_FAKE_COMPOSE_LATENCY": str(args.compose_latency),
+            "DTOP_FAKE_PULL_LATENCY": str(args.pull_latency),
+        }
+    )
+    return env
+
+
+def _command_name(argv: list[str]) -> str:
+    """Group invocations by command, e.g. "compose up" or "network ls"."""
+    words = [a for a in argv if not a.startswith("-")]
+    if argv and argv[0] == "compose":
+        # Skip the -f value.
+        rest = argv[argv.index("-f") + 2:] if "-f" in argv else argv[1:]
+        words = ["compose", *[a for a in rest if not a.startswith("-")][:1]]
+    elif argv and argv[0] in ("image", "network", "volume", "system"):
+        words = words[:2]
+    else:
+        words = words[:1]
+    return " ".join(words)
+
+
+def run_scenario(name: str, root: Path, fleet: dict, produced: dict, args) -> dict:
+    initial, dtop_args = SCENARIOS[name]
+    state = _initial_state(initial, fleet, produced)
+    argv = [sys.executable, "-m", "docktapus.main", *dtop_args]
+    if dtop_args[0] in ("up", "swap", "down", "pull"):
+        argv += ["-conf", str(root / "registry")]
+    env = _env(root, args)
+    state_path = root / "state.json"
+    log_path = root / "calls.log"
+
+    wall = []
+    for _ in range(args.repeat):
+        state_path.write_text(json.dumps(state))
+        log_path.write_text("")
+        start = time.perf_counter()
+        result = subprocess.run(argv, env=env, capture_output=True, text=True, input="")
+        wall.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            print(f"{name}: exit {result.returncode}\n{result.stdout}{result.stderr}", file=sys.stderr)
+            break
+
+    produced[name] = json.loads(state_path.read_text())
+    calls = Counter(
+        _command_name(json.loads(line)) for line in log_path.read_text().splitlines() if line
+    )
+    return {
+        "scenario": name,
+        "argv": ["dtop", *dtop_args],
+        "exit_code": result.returncode,
+        "wall_ms": {
+            "min": round(min(wall) * 1000, 1),
+            "median": round(statistics.median(wall) * 1000, 1),
+        },
+        "docker_calls": sum(calls.values()),
+        "calls": dict(sorted(calls.items())),
+        "output_lines": len(result.stdout.splitlines()),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--projects", type=int, default=200, help="Projects in the fleet")
+    parser.add_argument("--services", type=int, default=10, help="Services per project")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every docker call")
+    parser.add_argument(
+        "--compose-latency", type=float, default=0.0,
+        help="Seconds added per service started by docker compose up",
+    )
+    parser.add_argument(
+        "--pull-latency", type=float, default=0.0, help="Seconds added per image pulled"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous JSON result")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="Allowed fractional growth in median wall time over the baseline",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the generated fleet directory")
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    # Scenarios that start from another's result need it to run first.
+    for name in list(names):
+        initial = SCENARIOS[name][0]
+        if initial.startswith("after:") and initial[6:] not in names:
+            names.insert(names.index(name), initial[6:])
+
+    root = Path(tempfile.mkdtemp(prefix="dtop-bench-"))
+    try:
+        (root / "bin").mkdir()
+        shim = root / "bin" / "docker"
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_DOCKER}" "$@"\n')
+        shim.chmod(0o755)
+        fleet = generate_fleet(root, args.projects, args.services)
+
+        produced: dict[str, dict] = {}
+        results = [run_scenario(name, root, fleet, produced, args) for name in names]
+    finally:
+        if args.keep:
+            print(f"Fleet kept in {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = json.dumps(
+        {
+            "python": sys.version.split()[0],
+            "fleet": {
+                "projects": args.projects,
+                "services": args.services,
+                "containers": args.projects * args.services,
+                "latency": args.latency,
+                "compose_latency": args.compose_latency,
+                "pull_latency": args.pull_latency,
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        args.output.write_text(report + "\n")
+    else:
+        print(report)
+
+    for r in results:
+        print(
+            f"{r['scenario']:<11} {r['wall_ms']['median']:>9.1f} ms median"
+            f"  {r['docker_calls']:>5} docker calls  exit {r['exit_code']}",
+            file=sys.stderr,
+        )
+
+    failed = [r["scenario"] for r in results if r["exit_code"] != 0]
+    if failed:
+        print(f"Failed scenarios: {', '.join(failed)}", file=sys.stderr)
+        return 1
+
+    if args.baseline:
+        baseline = {r["scenario"]: r for r in json.loads(args.baseline.read_text())["results"]}
+        regressed = []
+        for r in results:
+            before = baseline.get(r["scenario"])
+            if before is None:
+                continue
+            if r["docker_calls"] > before["docker_calls"]:
+                regressed.append(f"{r['scenario']} (docker calls {before['docker_calls']} -> {r['docker_calls']})")
+            elif r["wall_ms"]["median"] > before["wall_ms"]["median"] * (1 + args.tolerance):
+                regressed.append(
+                    f"{r['scenario']} (median {before['wall_ms']['median']} -> {r['wall_ms']['median']} ms)"
+                )
+        if regressed:
+            print(f"Regression in: {', '.join(regressed)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
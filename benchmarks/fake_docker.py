@@ -0,0 +1,387 @@
+"""A scriptable stand-in for the `docker` CLI, for benchmarks.
+
+Implements just enough of `docker` and `docker compose` for docktapus' CLI
+backend: ps, inspect, stop, rm, events, stats, pull, network/volume ls/create/rm/inspect,
+image ls, system df and compose up/build/pull.  Containers, networks, volumes and
+images live in a JSON state file, so concurrent invocations see each
+other's changes.
+
+Configured through the environment:
+
+    DTOP_FAKE_STATE            state file (required)
+    DTOP_FAKE_LOG              append each invocation's argv here as a JSON line
+    DTOP_FAKE_LATENCY          seconds to sleep on every call (default 0)
+    DTOP_FAKE_COMPOSE_LATENCY  extra seconds per service started or built by compose
+    DTOP_FAKE_PULL_LATENCY     extra seconds per image pulled, by `pull` or compose up
+    DTOP_FAKE_FAIL             regex; matching invocations exit 1
+"""
+
+import fcntl
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+# Options that take a separate value argument.
+_VALUE_OPTIONS = {
+    "-f", "--file", "-p", "--project-name", "-t", "--time", "--filter", "--format", "--label",
+    "--driver", "--since", "--until", "--type", "--scale",
+}
+
+
+def _split(args: list[str]) -> tuple[dict[str, list[str]], list[str]]:
+    """Split args into {option: [values]} and positional arguments."""
+    options: dict[str, list[str]] = {}
+    positional = []
+    it = iter(args)
+    for arg in it:
+        if arg.startswith("-"):
+            options.setdefault(arg, []).append(next(it) if arg in _VALUE_OPTIONS else "")
+        else:
+            positional.append(arg)
+    return options, positional
+
+
+@contextmanager
+def _state(write: bool):
+    path = os.environ["DTOP_FAKE_STATE"]
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        state.setdefault("containers", [])
+        state.setdefault("networks", {})
+        state.setdefault("volumes", {})
+        state.setdefault("images", {})
+        yield state
+        if write:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+
+
+def _label_string(labels: dict[str, str]) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels.items())
+
+
+def _matches(labels: dict[str, str], filters: list[str]) -> bool:
+    for f in filters:
+        key, sep, value = f.partition("=")
+        if key not in labels or (sep and labels[key] != value):
+            return False
+    return True
+
+
+def _filters(options: dict[str, list[str]]) -> dict[str, list[str]]:
+    out: dict[str, list[str]] = {}
+    for f in options.get("--filter", []):
+        key, _, value = f.partition("=")
+        out.setdefault(key, []).append(value)
+    return out
+
+
+def _emit(rows):
+    sys.stdout.write("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def ps(args):
+    options, _ = _split(args)
+    filters = _filters(options)
+    with _state(write=False) as state:
+        rows = []
+        for c in state["containers"]:
+            if "-a" not in options and c["State"] != "running":
+                continue
+            if not _matches(c["Labels"], filters.get("label", [])):
+                continue
+            if "id" in filters and not any(c["Id"].startswith(i) for i in filters["id"]):
+                continue
+            rows.append(
+                {
+                    "ID": c["Id"],
+                    "Names": c["Name"],
+                    "Image": c["Image"],
+                    "State": c["State"],
+                    "Status": "Up 1 minute" if c["State"] == "running" else f"Exited ({c.get('ExitCode', 0)})",
+                    "Ports": "",
+                    "Labels": _label_string(c["Labels"]),
+                    "Networks": ",".join(c.get("Networks", [])),
+                    "Mounts": ",".join(c.get("Mounts", [])),
+                }
+            )
+    _emit(rows)
+
+
+def inspect(args):
+    _, ids = _split(args)
+    with _state(write=False) as state:
+        found = [c for c in state["containers"] if any(c["Id"].startswith(i) for i in ids)]
+    # Containers have no healthcheck and expose no ports, so they are ready once running.
+    json.dump(
+        [
+            {
+                "Id": c["Id"],
+                "Name": "/" + c["Name"],
+                "State": {"Status": c["State"], "ExitCode": c.get("ExitCode", 0)},
+                "Config": {"Labels": c["Labels"]},
+                "NetworkSettings": {"Networks": {}, "Ports": {}},
+            }
+            for c in found
+        ],
+        sys.stdout,
+    )
+
+
+def events(args):
+    # No events are recorded; a stream without --until stays open until killed.
+    options, _ = _split(args)
+    if "--until" not in options:
+        while True:
+            time.sleep(3600)
+
+
+def stats(args):
+    # A steady reading per running container, refreshed every second like `docker stats`.
+    options, ids = _split(args)
+    while True:
+        with _state(write=False) as state:
+            found = [
+                c for c in state["containers"]
+                if c["State"] == "running" and (not ids or any(c["Id"].startswith(i) for i in ids))
+            ]
+        try:
+            sys.stdout.write("\x1b[2J\x1b[H")
+            _emit(
+                {
+                    "ID": c["Id"],
+                    "Name": c["Name"],
+                    "CPUPerc": f"{int(c['Id'][-13:], 16) % 7 + 0.5:.2f}%",
+                    "MemUsage": "64MiB / 7.7GiB",
+                }
+                for c in found
+            )
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader went away, as `docker stats` would on SIGPIPE; keep
+            # the final flush at exit from failing again.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+        if "--no-stream" in options:
+            return
+        time.sleep(1)
+
+
+def stop(args):
+    _, ids = _split(args)
+    with _state(write=True) as state:
+        for c in state["containers"]:
+            if any(c["Id"].startswith(i) for i in ids):
+                c["State"] = "exited"
+
+
+def rm(args):
+    _, ids = _split(args)
+    with _state(write=True) as state:
+        state["containers"] = [
+            c for c in state["containers"] if not any(c["Id"].startswith(i) for i in ids)
+        ]
+
+
+def _resource(kind: str, args):
+    sub, rest = args[0], args[1:]
+    options, positional = _split(rest)
+    write = sub in ("create", "rm")
+    with _state(write=write) as state:
+        items = state[kind]
+        if sub == "ls":
+            filters = _filters(options)
+            _emit(
+                {
+                    "ID": hashlib.sha256(name.encode()).hexdigest()[:12],
+                    "Name": name,
+                    "Labels": _label_string(labels),
+                }
+                for name, labels in items.items()
+                if _matches(labels, filters.get("label", []))
+            )
+        elif sub == "inspect":
+            if positional[0] not in items:
+                sys.exit(f"Error: No such {kind[:-1]}: {positional[0]}")
+            _emit([{"Name": positional[0], "Labels": items[positional[0]]}])
+        elif sub == "create":
+            labels = dict(v.split("=", 1) for v in options.get("--label", []))
+            items[positional[0]] = labels
+        elif sub == "rm":
+            by_id = {hashlib.sha256(n.encode()).hexdigest()[:12]: n for n in items}
+            for ref in positional:
+                items.pop(by_id.get(ref, ref), None)
+
+
+def image(args):
+    options, _ = _split(args[1:])
+    filters = _filters(options)
+    with _state(write=False) as state:
+        _emit(
+            {
+                "ID": hashlib.sha256(tag.encode()).hexdigest()[:12],
+                "Repository": tag.rsplit(":", 1)[0],
+                "Tag": tag.rsplit(":", 1)[1],
+            }
+            for tag, labels in state["images"].items()
+            if _matches(labels, filters.get("label", []))
+            and (
+                "reference" not in filters
+                or any(fnmatch.fnmatch(tag.rsplit(":", 1)[0], r) for r in filters["reference"])
+            )
+        )
+
+
+def _image_ref(image: str) -> str:
+    return image if ":" in image.rsplit("/", 1)[-1] else f"{image}:latest"
+
+
+def pull(args):
+    _, refs = _split(args)
+    time.sleep(float(os.environ.get("DTOP_FAKE_PULL_LATENCY", 0)))
+    with _state(write=True) as state:
+        state["images"].setdefault(refs[0], {})
+    print(refs[0])
+
+
+def system(args):
+    with _state(write=False) as state:
+        _emit(
+            [
+                {
+                    "Containers": [{"ID": c["Id"], "Size": "4kB"} for c in state["containers"]],
+                    "Volumes": [{"Name": n, "Size": "1MB"} for n in state["volumes"]],
+                }
+            ]
+        )
+
+
+def compose(args):
+    import yaml
+
+    options, positional = _split(args)
+    sub, services = positional[0], positional[1:]
+    if sub not in ("up", "build"):
+        return
+    with open(options["-f"][0]) as f:
+        data = yaml.safe_load(f) or {}
+
+    defined = data.get("services") or {}
+    services = services or list(defined)
+    compose_project = (options.get("-p") or [data.get("name") or "tmp"])[0]
+    if sub == "build":
+        time.sleep(float(os.environ.get("DTOP_FAKE_COMPOSE_LATENCY", 0)) * len(services))
+        with _state(write=True) as state:
+            for name in services:
+                build = defined[name].get("build") or {}
+                tag = defined[name].get("image") or f"{compose_project}-{name}:latest"
+                state["images"][tag if ":" in tag else f"{tag}:latest"] = build.get("labels") or {}
+        return
+    networks = [
+        (cfg or {}).get("name", key) for key, cfg in (data.get("networks") or {}).items()
+    ] or ["default"]
+    volumes = {key: (cfg or {}).get("name", key) for key, cfg in (data.get("volumes") or {}).items()}
+
+    # Like compose's default pull policy, fetch missing images one by one first.
+    with _state(write=False) as state:
+        missing = {
+            _image_ref(defined[name]["image"])
+            for name in services
+            if "build" not in defined[name] and defined[name].get("image")
+        } - set(state["images"])
+    time.sleep(float(os.environ.get("DTOP_FAKE_PULL_LATENCY", 0)) * len(missing))
+    time.sleep(float(os.environ.get("DTOP_FAKE_COMPOSE_LATENCY", 0)) * len(services))
+    with _state(write=True) as state:
+        for ref in missing:
+            state["images"].setdefault(ref, {})
+        for name in services:
+            cfg = defined[name]
+            labels = cfg.get("labels") or {}
+            if isinstance(labels, list):
+                labels = dict(label.split("=", 1) for label in labels)
+            # Compose names containers after the compose project, not the
+            # dtop project in the labels.
+            container_name = f"{compose_project}-{name}-1"
+            scale = dict(v.split("=", 1) for v in options.get("--scale", []))
+            if name in scale and "--no-recreate" in options:
+                # Add a replica next to the existing containers.
+                taken = {c["Name"] for c in state["containers"]}
+                index = next(
+                    i for i in range(1, 1000) if f"{compose_project}-{name}-{i}" not in taken
+                )
+                container_name = f"{compose_project}-{name}-{index}"
+            mounts = [
+                volumes[v.split(":", 1)[0]]
+                for v in cfg.get("volumes") or []
+                if isinstance(v, str) and v.split(":", 1)[0] in volumes
+            ]
+            # A one-shot service (command: exit N) has already finished with N.
+            one_shot = re.fullmatch(r"exit (\d+)", str(cfg.get("command") or ""))
+            state["containers"] = [c for c in state["containers"] if c["Name"] != container_name]
+            state["containers"].append(
+                {
+                    "Id": hashlib.sha256(f"{container_name}{time.time_ns()}".encode()).hexdigest(),
+                    "Name": container_name,
+                    "Image": cfg.get("image") or f"{compose_project}-{name}:latest",
+                    "State": "exited" if one_shot else "running",
+                    "ExitCode": int(one_shot.group(1)) if one_shot else 0,
+                    "Labels": {
+                        **labels,
+                        "com.docker.compose.service": name,
+                        "com.docker.compose.project": compose_project,
+                    },
+                    "Networks": networks,
+                    "Mounts": mounts,
+                }
+            )
+
+
+COMMANDS = {
+    "ps": ps,
+    "inspect": inspect,
+    "events": events,
+    "stats": stats,
+    "stop": stop,
+    "rm": rm,
+    "network": lambda args: _resource("networks", args),
+    "volume": lambda args: _resource("volumes", args),
+    "image": image,
+    "pull": pull,
+    "system": system,
+    "compose": compose,
+    "version": lambda args: print("24.0.0"),
+}
+
+
+def main() -> int:
+    argv = sys.argv[1:]
+    if os.environ.get("DTOP_FAKE_LOG"):
+        with open(os.environ["DTOP_FAKE_LOG"], "a") as log:
+            log.write(json.dumps(argv) + "\n")
+    time.sleep(float(os.environ.get("DTOP_FAKE_LATENCY", 0)))
+
+    pattern = os.environ.get("DTOP_FAKE_FAIL")
+    if pattern and re.search(pattern, " ".join(argv)):
+        print(f"fake docker: injected failure for {' '.join(argv)}", file=sys.stderr)
+        return 1
+    if not argv or argv[0] not in COMMANDS:
+        print(f"fake docker: unsupported command {argv[:1]}", file=sys.stderr)
+        return 1
+    COMMANDS[argv[0]](argv[1:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Measure `dtop` startup cost per subcommand.
+
+For every subcommand this records the `python -X importtime` cumulative cost
+of importing docktapus.main and loading that command, the heaviest modules
+it pulls in, and the best-of-N wall time of the same import in a fresh
+interpreter.  Results are written as JSON so they can be diffed or compared
+against a saved baseline:
+
+    python benchmarks/startup.py --output startup.json
+    python benchmarks/startup.py --baseline startup.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    return env
+
+
+def _snippet(command: str | None) -> str:
+    if command is None:
+        return "import docktapus.main"
+    return f"import docktapus.main as m; m.load_command({command!r})"
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) rows from -X importtime output.
+
+    Module names keep their leading indentation, which marks nesting depth.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative)))
+    return rows
+
+
+def measure(command: str | None, repeat: int) -> dict:
+    env = _env()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _snippet(command)],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    rows = _parse_importtime(result.stderr)
+    top_level = [r for r in rows if not r[0].startswith("  ")]
+    heaviest = sorted(rows, key=lambda r: r[1], reverse=True)[:10]
+
+    wall = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", _snippet(command)], env=env, check=True)
+        wall.append(time.perf_counter() - start)
+
+    return {
+        "command": command or "<main>",
+        "import_us": sum(r[2] for r in top_level),
+        "modules": len(rows),
+        "wall_ms": round(min(wall) * 1000, 2),
+        "heaviest_self_us": {r[0].strip(): r[1] for r in heaviest},
+    }
+
+
+def main() -> int:
+    sys.path.insert(0, str(SRC))
+    from docktapus.main import COMMANDS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("commands", nargs="*", help="Subcommands to measure (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Wall-time samples per command")
+    parser.add_argument("--output", type=Path, help="Write JSON results to this file")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous JSON result")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="Allowed fractional import-time growth over the baseline",
+    )
+    args = parser.parse_args()
+
+    names = args.commands or [n for n, (_, _, _, hidden) in COMMANDS.items() if not hidden]
+    results = [measure(None, args.repeat)] + [measure(n, args.repeat) for n in names]
+
+    report = json.dumps({"python": sys.version.split()[0], "results": results}, indent=2)
+    if args.output:
+        args.output.write_text(report + "\n")
+    else:
+        print(report)
+
+    for r in results:
+        print(
+            f"{r['command']:<8} {r['import_us'] / 1000:>8.1f} ms import"
+            f"  {r['wall_ms']:>8.1f} ms wall  {r['modules']:>4} modules",
+            file=sys.stderr,
+        )
+
+    if args.baseline:
+        baseline = {r["command"]: r for r in json.loads(args.baseline.read_text())["results"]}
+        regressed = [
+            r["command"]
+            for r in results
+            if r["command"] in baseline
+            and r["import_us"] > baseline[r["command"]]["import_us"] * (1 + args.tolerance)
+        ]
+        if regressed:
+            print(f"Startup regression in: {', '.join(regressed)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+import sys
+
+
+def run():
+    """Console entry point: serve `dtop ls` from a running daemon, else run the full CLI."""
+    # Checked before anything heavy is imported; typer alone costs more than
+    # the whole daemon round trip.
+    if len(sys.argv) > 1 and sys.argv[1] in ("ls", "ps"):
+        from docktapus.commands import daemon
+
+        code = daemon.try_ls(sys.argv[2:])
+        if code is not None:
+            sys.exit(code)
+
+    from docktapus.main import app
+
+    app()
+
+
+if __name__ == "__main__":
+    run()
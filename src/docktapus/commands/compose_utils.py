@@ -1,23 +1,162 @@
-import copy
-import subprocess
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
 
 import typer
 
+from docktapus.commands import profiler
+from docktapus.commands.docker_api import DockerError, get_client
+
+MAX_CREATE_WORKERS = 8
+CONFIG_HASH_LABEL = "dtop.config-hash"
+# Temp compose files handed to docker compose; leftovers are removed by dtop gc.
+TEMP_COMPOSE_PREFIX = "dtop-compose-"
+
+_ENV_REF = re.compile(r"\$\{?([A-Za-z_][A-Za-z0-9_]*)")
+_TOP_LEVEL_RESOURCES = ("networks", "volumes", "configs", "secrets")
+
+# Serialises the list-then-create in ensure_networks/ensure_volumes, so
+# projects brought up concurrently never both try to create a shared
+# network or volume.
+_RESOURCE_LOCK = threading.Lock()
+
+# A compose transform takes a compose dict and returns a new one.  Transforms
+# never mutate their input: they copy only the nodes they change and share
+# every other subtree with it, so the parsed base compose can be reused by
+# any number of pipelines without being cloned.
+Transform = Callable[[dict], dict]
+
+
+def pipeline(*steps: Transform) -> Transform:
+    """Chain compose transforms left to right into a single transform."""
+
+    def run(compose_data: dict) -> dict:
+        for step in steps:
+            compose_data = step(compose_data)
+        return compose_data
+
+    return run
+
+
+def select_services(compose_data: dict, names: list[str]) -> dict:
+    """Return compose_data restricted to the named services."""
+    services = compose_data.get("services") or {}
+    return {**compose_data, "services": {n: services[n] for n in names}}
 
-def _network_exists(name: str) -> bool:
-    result = subprocess.run(
-        ["docker", "network", "inspect", name],
-        capture_output=True, text=True,
-    )
-    return result.returncode == 0
 
+def drop_foreign_depends_on(compose_data: dict) -> dict:
+    """Return compose_data without depends_on entries naming services outside this file.
 
-def _volume_exists(name: str) -> bool:
-    result = subprocess.run(
-        ["docker", "volume", "inspect", name],
-        capture_output=True, text=True,
+    Ordering across the prod and dev files is handled by docktapus itself
+    (see scheduler.py), so cross-file dependencies only need stripping for
+    compose to accept the file.
+    """
+    services = compose_data.get("services") or {}
+    trimmed = {}
+    for name, svc_cfg in services.items():
+        deps = (svc_cfg or {}).get("depends_on")
+        if deps:
+            if isinstance(deps, list):
+                kept = [d for d in deps if d in services]
+            else:
+                kept = {d: c for d, c in deps.items() if d in services}
+            if len(kept) != len(deps):
+                svc_cfg = {k: v for k, v in svc_cfg.items() if k != "depends_on"}
+                if kept:
+                    svc_cfg["depends_on"] = kept
+        trimmed[name] = svc_cfg
+    return {**compose_data, "services": trimmed}
+
+
+def _env_files(svc_cfg: dict, base_dir: Path) -> list[Path]:
+    env_file = svc_cfg.get("env_file") or []
+    if isinstance(env_file, (str, dict)):
+        env_file = [env_file]
+    paths = []
+    for entry in env_file:
+        path = entry.get("path") if isinstance(entry, dict) else entry
+        if path:
+            paths.append(base_dir / Path(path).expanduser())
+    return paths
+
+
+def service_config_hash(svc_cfg: dict, compose_data: dict, base_dir: Path) -> str:
+    """Hash everything that determines how a service's container is created.
+
+    Covers the service definition itself (labels included, minus the hash
+    label), the top-level networks/volumes/configs/secrets it can refer to,
+    the current values of any ${VAR} it interpolates and the contents of its
+    env_files (resolved against base_dir, the compose file's directory).
+    """
+    labels = svc_cfg.get("labels") or {}
+    if CONFIG_HASH_LABEL in labels:
+        labels = {k: v for k, v in labels.items() if k != CONFIG_HASH_LABEL}
+        svc_cfg = {**svc_cfg, "labels": labels}
+    definition = json.dumps(
+        {
+            "service": svc_cfg,
+            **{key: compose_data.get(key) for key in _TOP_LEVEL_RESOURCES},
+        },
+        sort_keys=True,
+        default=str,
     )
-    return result.returncode == 0
+    h = hashlib.sha256(definition.encode())
+    for name in sorted(set(_ENV_REF.findall(definition))):
+        h.update(f"\0{name}={os.environ.get(name)}".encode())
+    for path in _env_files(svc_cfg, base_dir):
+        try:
+            h.update(b"\0" + path.read_bytes())
+        except OSError:
+            h.update(f"\0missing:{path}".encode())
+    return h.hexdigest()[:16]
+
+
+def stamp_config_hash(compose_data: dict, base_dir: Path) -> dict:
+    """Return compose_data with a dtop.config-hash label on every service.
+
+    Run after any transform that changes service definitions, so the hash
+    reflects what compose will actually be asked to create.
+    """
+    services = {}
+    for svc_name, svc_cfg in compose_data.get("services", {}).items():
+        digest = service_config_hash(svc_cfg, compose_data, base_dir)
+        labels = {**svc_cfg.get("labels", {}), CONFIG_HASH_LABEL: digest}
+        services[svc_name] = {**svc_cfg, "labels": labels}
+    return {**compose_data, "services": services}
+
+
+def compose_project_name(project_name: str) -> str:
+    """Return the docker compose project a dtop project's services run under.
+
+    Every compose invocation passes it with -p, so each dtop project gets
+    a compose project (and container names) of its own, whatever the
+    compose file or COMPOSE_PROJECT_NAME say.  Normalised to the characters
+    compose accepts.
+    """
+    return re.sub(r"[^a-z0-9_-]", "", project_name.lower()).lstrip("_-") or "dtop"
+
+
+def _docker_name(key: str, cfg) -> str:
+    """Return the Docker-level name for a top-level network/volume entry."""
+    if isinstance(cfg, dict) and cfg.get("name"):
+        return cfg["name"]
+    return key
+
+
+def _create_concurrently(create, names: list[str], project_name: str):
+    """Run create(name, labels) for every name, in parallel, re-raising the first failure."""
+    if not names:
+        return
+    labels = {"dtop.project": project_name}
+    workers = min(MAX_CREATE_WORKERS, len(names))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(create, name, labels) for name in names]:
+            future.result()
 
 
 def ensure_networks(compose_data: dict, project_name: str) -> dict:
@@ -28,33 +167,39 @@ def ensure_networks(compose_data: dict, project_name: str) -> dict:
     dtop.project label so it can be cleaned up later.  Either way the
     compose entry is marked external so both prod and dev runs share
     the same Docker network.
+
+    Existing networks are fetched in a single listing call and any missing
+    ones are created concurrently.  The whole check-and-create runs under a
+    lock, so concurrent projects sharing a network create it only once.
     """
-    data = copy.deepcopy(compose_data)
-    networks = data.get("networks")
+    networks = compose_data.get("networks")
     if not networks:
-        return data
+        return compose_data
 
+    with profiler.phase("ensure networks"), _RESOURCE_LOCK:
+        return _ensure_networks(compose_data, networks, project_name)
+
+
+def _ensure_networks(compose_data: dict, networks: dict, project_name: str) -> dict:
+    client = get_client()
+    existing = {net["Name"] for net in client.networks()}
+
+    missing = []
+    rewritten = {}
     for net_name, net_cfg in networks.items():
-        if isinstance(net_cfg, dict) and net_cfg.get("name"):
-            docker_name = net_cfg["name"]
-        else:
-            docker_name = net_name
+        docker_name = _docker_name(net_name, net_cfg)
 
-        if _network_exists(docker_name):
+        if docker_name in existing:
             typer.echo(f"  ↳ network '{docker_name}' already exists, joining")
         else:
             typer.echo(f"  ↳ creating network '{docker_name}'")
-            cmd = [
-                "docker", "network", "create",
-                "--driver", "bridge",
-                "--label", f"dtop.project={project_name}",
-                docker_name,
-            ]
-            subprocess.run(cmd, check=True, capture_output=True)
+            missing.append(docker_name)
+            existing.add(docker_name)
 
-        data["networks"][net_name] = {"name": docker_name, "external": True}
+        rewritten[net_name] = {"name": docker_name, "external": True}
 
-    return data
+    _create_concurrently(client.create_network, missing, project_name)
+    return {**compose_data, "networks": rewritten}
 
 
 def ensure_volumes(compose_data: dict, project_name: str) -> dict:
@@ -62,65 +207,57 @@ def ensure_volumes(compose_data: dict, project_name: str) -> dict:
 
     Same pattern as ensure_networks but for Docker volumes.
     """
-    data = copy.deepcopy(compose_data)
-    volumes = data.get("volumes")
+    volumes = compose_data.get("volumes")
     if not volumes:
-        return data
+        return compose_data
+
+    with profiler.phase("ensure volumes"), _RESOURCE_LOCK:
+        return _ensure_volumes(compose_data, volumes, project_name)
 
+
+def _ensure_volumes(compose_data: dict, volumes: dict, project_name: str) -> dict:
+    client = get_client()
+    existing = {vol["Name"] for vol in client.volumes()}
+
+    missing = []
+    rewritten = {}
     for vol_name, vol_cfg in volumes.items():
-        if isinstance(vol_cfg, dict) and vol_cfg.get("name"):
-            docker_name = vol_cfg["name"]
-        else:
-            docker_name = vol_name
+        docker_name = _docker_name(vol_name, vol_cfg)
 
-        if _volume_exists(docker_name):
+        if docker_name in existing:
             typer.echo(f"  ↳ volume '{docker_name}' already exists, joining")
         else:
             typer.echo(f"  ↳ creating volume '{docker_name}'")
-            cmd = [
-                "docker", "volume", "create",
-                "--label", f"dtop.project={project_name}",
-                docker_name,
-            ]
-            subprocess.run(cmd, check=True, capture_output=True)
+            missing.append(docker_name)
+            existing.add(docker_name)
 
-        data["volumes"][vol_name] = {"name": docker_name, "external": True}
+        rewritten[vol_name] = {"name": docker_name, "external": True}
 
-    return data
+    _create_concurrently(client.create_volume, missing, project_name)
+    return {**compose_data, "volumes": rewritten}
 
 
 def prepare_compose(compose_data: dict, project_name: str) -> dict:
     """Ensure shared networks and volumes exist, returning a modified compose dict."""
     data = ensure_networks(compose_data, project_name)
-    data = ensure_volumes(data, project_name)
-    return data
+    return ensure_volumes(data, project_name)
 
 
 def cleanup_networks(project_name: str):
     """Remove Docker networks labelled with dtop.project=<project_name>."""
-    result = subprocess.run(
-        [
-            "docker", "network", "ls",
-            "--filter", f"label=dtop.project={project_name}",
-            "--format", "{{.ID}}",
-        ],
-        capture_output=True, text=True,
-    )
-    network_ids = [nid for nid in result.stdout.strip().splitlines() if nid]
-    for nid in network_ids:
-        subprocess.run(["docker", "network", "rm", nid], capture_output=True)
+    client = get_client()
+    nets = client.networks({"label": [f"dtop.project={project_name}"]})
+    try:
+        client.remove_networks([net["ID"] for net in nets])
+    except DockerError:
+        pass
 
 
 def cleanup_volumes(project_name: str):
     """Remove Docker volumes labelled with dtop.project=<project_name>."""
-    result = subprocess.run(
-        [
-            "docker", "volume", "ls",
-            "--filter", f"label=dtop.project={project_name}",
-            "--format", "{{.Name}}",
-        ],
-        capture_output=True, text=True,
-    )
-    volume_names = [v for v in result.stdout.strip().splitlines() if v]
-    for v in volume_names:
-        subprocess.run(["docker", "volume", "rm", v], capture_output=True)
+    client = get_client()
+    vols = client.volumes({"label": [f"dtop.project={project_name}"]})
+    try:
+        client.remove_volumes([vol["Name"] for vol in vols])
+    except DockerError:
+        pass
@@ -0,0 +1,97 @@
+import json
+import os
+import socket
+import sys
+
+# Client side of the optional `dtop serve` daemon.  Only the standard library is
+# imported here, so the `dtop ls` fast path can get its output from a running
+# daemon without loading typer, yaml or the Docker backends.  Every helper
+# returns None when no daemon can answer, and the caller queries Docker itself.
+
+# Seconds to wait for a daemon before giving up and falling back.
+TIMEOUT = 5.0
+FORMATS = ("table", "json", "ndjson")
+
+
+def socket_path() -> str:
+    """Where the daemon listens: DTOP_DAEMON_SOCKET, else the runtime or cache dir."""
+    if os.environ.get("DTOP_DAEMON_SOCKET"):
+        return os.environ["DTOP_DAEMON_SOCKET"]
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "docktapus.sock")
+    cache = os.environ.get("DTOP_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "docktapus"
+    )
+    return os.path.join(cache, "dtop.sock")
+
+
+def request(payload: dict, path: str | None = None) -> dict | None:
+    """Send one request to the daemon and return its reply, or None if it can't answer.
+
+    Set DTOP_NO_DAEMON=1 to always bypass the daemon.
+    """
+    if os.environ.get("DTOP_NO_DAEMON"):
+        return None
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    payload = {**payload, "docker_host": os.environ.get("DOCKER_HOST", "")}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(path)
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+        reply = json.loads(b"".join(chunks))
+    except (OSError, ValueError):
+        return None
+    return reply if reply.get("ok") else None
+
+
+def containers(
+    project_name: str | None = None, all: bool = True, ids: list[str] | None = None
+) -> list[dict] | None:
+    """Container rows from the daemon's live inventory, shaped like the backends' rows."""
+    reply = request({"op": "containers", "project": project_name, "all": all, "ids": ids})
+    return None if reply is None else reply["containers"]
+
+
+def _parse_ls(args: list[str]) -> tuple[str | None, str] | None:
+    """Parse `ls` arguments the fast path can serve, or return None for anything else."""
+    project_name = None
+    output_format = "table"
+    it = iter(args)
+    for arg in it:
+        if arg in ("--format", "-f"):
+            output_format = next(it, None)
+        elif arg.startswith("--format="):
+            output_format = arg.split("=", 1)[1]
+        elif arg.startswith("-") or project_name is not None:
+            return None
+        else:
+            project_name = arg
+    if output_format not in FORMATS:
+        return None
+    return project_name, output_format
+
+
+def try_ls(args: list[str]) -> int | None:
+    """Print `dtop ls` output rendered by the daemon; None means run the real command."""
+    parsed = _parse_ls(args)
+    if parsed is None:
+        return None
+    project_name, output_format = parsed
+    reply = request({"op": "ls", "project": project_name, "format": output_format})
+    if reply is None:
+        return None
+    sys.stdout.write(reply["output"])
+    sys.stdout.flush()
+    return 0
@@ -0,0 +1,806 @@
+import http.client
+import json
+import os
+import queue
+import re
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from urllib.parse import quote, urlencode, urlsplit
+
+from docktapus.commands import profiler
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+MAX_WORKERS = 8
+# Default for DockerClient._request's timeout: keep the client's own.
+_CLIENT_TIMEOUT = object()
+
+_LABEL_SEPARATOR = re.compile(r",(?=[\w.\-/]+=)")
+
+
+class DockerError(Exception):
+    """Raised when a Docker query or mutation fails, whichever backend ran it."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a unix domain socket instead of TCP."""
+
+    def __init__(self, socket_path: str, timeout: float | None = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def _set_timeout(conn: http.client.HTTPConnection, timeout: float | None):
+    """Change a (possibly already connected) connection's socket timeout."""
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+
+
+def _format_ports(ports: list[dict]) -> str:
+    """Render Engine API port bindings the way `docker ps` prints them."""
+    parts = []
+    for p in sorted(ports, key=lambda p: (p.get("PrivatePort", 0), p.get("IP", ""))):
+        private = f"{p.get('PrivatePort')}/{p.get('Type', 'tcp')}"
+        if p.get("PublicPort"):
+            parts.append(f"{p.get('IP', '')}:{p['PublicPort']}->{private}")
+        else:
+            parts.append(private)
+    return ", ".join(dict.fromkeys(parts))
+
+
+def _parse_label_string(labels_str: str) -> dict[str, str]:
+    """Split the comma-joined Labels field printed by `docker ps`.
+
+    Only commas followed by something shaped like a label key start a new
+    label, so values that themselves contain commas survive intact.
+    """
+    labels = {}
+    for part in _LABEL_SEPARATOR.split(labels_str):
+        key, sep, value = part.strip().partition("=")
+        if sep:
+            labels[key] = value
+    return labels
+
+
+_SIZE = re.compile(r"([\d.]+)\s*([kKMGTP]?)(i?)B")
+_SIZE_UNITS = {"": 1, "k": 1e3, "K": 1e3, "M": 1e6, "G": 1e9, "T": 1e12, "P": 1e15}
+_SIZE_EXPONENTS = {"": 0, "k": 1, "K": 1, "M": 2, "G": 3, "T": 4, "P": 5}
+
+
+def _parse_size(text: str) -> int:
+    """Parse the leading size the docker CLI prints ("1.2MB (virtual 3GB)") as bytes."""
+    match = _SIZE.match(text.strip())
+    if not match:
+        return 0
+    if match.group(3):
+        return int(float(match.group(1)) * 1024 ** _SIZE_EXPONENTS[match.group(2)])
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _format_size(size: float) -> str:
+    """Render a byte count in decimal units, as the docker CLI prints disk usage ("1.2 MB")."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1000:
+            break
+        size /= 1000
+    else:
+        unit = "TB"
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def _normalise_event(event: dict) -> dict:
+    """Flatten an event from either backend to {Type, Action, ID, Attributes}."""
+    actor = event.get("Actor") or {}
+    return {
+        "Type": event.get("Type", ""),
+        "Action": event.get("Action") or event.get("status", ""),
+        "ID": (actor.get("ID") or event.get("id", ""))[:12],
+        "Attributes": actor.get("Attributes") or {},
+    }
+
+
+def _normalise_stats(raw: dict) -> dict | None:
+    """Reduce an Engine API stats frame to {ID, CPU, Memory, MemoryLimit}, as `docker stats` does.
+
+    CPU is a percentage of one core; Memory excludes reclaimable page cache.
+    Returns None for a frame without a previous reading to measure CPU against.
+    """
+    cpu = raw.get("cpu_stats") or {}
+    previous = raw.get("precpu_stats") or {}
+    if not previous.get("system_cpu_usage"):
+        return None
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (
+        previous.get("cpu_usage") or {}
+    ).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - previous["system_cpu_usage"]
+    online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    memory = raw.get("memory_stats") or {}
+    # cgroup v2 reports inactive_file, v1 total_inactive_file.
+    detail = memory.get("stats") or {}
+    cache = detail.get("inactive_file", detail.get("total_inactive_file", 0))
+    return {
+        "ID": raw.get("id", "")[:12],
+        "CPU": cpu_delta / system_delta * online * 100 if cpu_delta > 0 and system_delta > 0 else 0.0,
+        "Memory": max(memory.get("usage", 0) - cache, 0),
+        "MemoryLimit": memory.get("limit", 0),
+    }
+
+
+def _published_host() -> str:
+    """Return where ports published on all interfaces can be reached from here."""
+    url = urlsplit(os.environ.get("DOCKER_HOST") or "")
+    if url.scheme in ("tcp", "http", "ssh") and url.hostname:
+        return url.hostname
+    return "127.0.0.1"
+
+
+def _normalise_inspect(raw: dict) -> dict:
+    """Reduce a container inspect result to its state, health and reachable TCP addresses.
+
+    Health is None for containers without a healthcheck, and ExitCode only
+    means something once the container has exited.  TCPAddresses holds
+    (host, port) pairs to probe: the published ports on the Docker host if
+    there are any, since container IPs can't be routed to from outside the
+    daemon's machine (Docker Desktop's VM, a remote daemon), and otherwise
+    each exposed port on each container IP.
+    """
+    state = raw.get("State") or {}
+    settings = raw.get("NetworkSettings") or {}
+    published = settings.get("Ports") or {}
+    addresses = []
+    for spec, bindings in sorted(published.items()):
+        for binding in bindings or []:
+            host_ip = binding.get("HostIp") or ""
+            host_ip = _published_host() if host_ip in ("", "0.0.0.0", "::") else host_ip
+            if spec.endswith("/tcp") and binding.get("HostPort"):
+                addresses.append((host_ip, int(binding["HostPort"])))
+    if not addresses:
+        exposed = set((raw.get("Config") or {}).get("ExposedPorts") or {}) | set(published)
+        ports = sorted(int(p.split("/")[0]) for p in exposed if p.endswith("/tcp"))
+        networks = (settings.get("Networks") or {}).values()
+        ips = [n["IPAddress"] for n in networks if n.get("IPAddress")]
+        addresses = [(ip, port) for ip in ips for port in ports]
+    return {
+        "ID": raw.get("Id", "")[:12],
+        "Name": raw.get("Name", "").lstrip("/"),
+        "State": state.get("Status", ""),
+        "Health": (state.get("Health") or {}).get("Status"),
+        "ExitCode": state.get("ExitCode", 0),
+        "TCPAddresses": addresses,
+    }
+
+
+def _filter_args(filters: dict[str, list[str]] | None) -> list[str]:
+    args = []
+    for key, values in (filters or {}).items():
+        for value in values:
+            args.extend(["--filter", f"{key}={value}"])
+    return args
+
+
+class DockerClient:
+    """Minimal Docker Engine API client over kept-alive connections.
+
+    Talks HTTP to the daemon socket named by DOCKER_HOST (unix:// or tcp://),
+    defaulting to /var/run/docker.sock.  Sequential callers reuse a single
+    connection; concurrent callers each borrow one from a small idle pool.
+    Container rows are normalised to the same shape DockerCLI returns so
+    callers don't care which backend is used.
+    """
+
+    def __init__(self, host: str | None = None, timeout: float | None = 60):
+        host = host or os.environ.get("DOCKER_HOST") or f"unix://{DEFAULT_SOCKET}"
+        url = urlsplit(host)
+        if url.scheme == "unix":
+            self._factory = lambda timeout=timeout: _UnixHTTPConnection(
+                url.path, timeout=timeout
+            )
+        elif url.scheme in ("tcp", "http"):
+            self._factory = lambda timeout=timeout: http.client.HTTPConnection(
+                url.hostname, url.port or 2375, timeout=timeout
+            )
+        else:
+            raise DockerError(f"Unsupported DOCKER_HOST: {host}")
+        self.host = host
+        self.timeout = timeout
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """Return an idle connection or a new one, and whether it was reused."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._factory(), False
+
+    def _release(self, conn: http.client.HTTPConnection):
+        with self._lock:
+            self._idle.append(conn)
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        body=None,
+        timeout: float | None | object = _CLIENT_TIMEOUT,
+    ):
+        """Send one request and return (status, decoded JSON body or None).
+
+        ``timeout`` overrides the client's read timeout (None: wait forever)
+        for requests the daemon is expected to hold open, such as a stop with
+        a long grace period.  If a reused keep-alive connection turns out to
+        have been dropped, the request is re-sent once on a new one; any
+        other connection error propagates as DockerError.
+        """
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        headers = {"Host": "docker"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        started = time.perf_counter()
+        while True:
+            conn, reused = self._acquire()
+            if timeout is not _CLIENT_TIMEOUT:
+                _set_timeout(conn, timeout)
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if not reused:
+                    raise DockerError(f"Docker daemon at {self.host} closed the connection")
+            except OSError as e:
+                conn.close()
+                raise DockerError(f"Cannot connect to Docker daemon at {self.host}: {e}")
+        if timeout is not _CLIENT_TIMEOUT:
+            _set_timeout(conn, self.timeout)
+        self._release(conn)
+        profiler.record(
+            f"{method} {path.partition('?')[0]}",
+            "docker-api",
+            started,
+            time.perf_counter() - started,
+            status=resp.status,
+        )
+
+        data = None
+        if raw and resp.getheader("Content-Type", "").startswith("application/json"):
+            data = json.loads(raw)
+        if resp.status >= 400:
+            message = data.get("message") if isinstance(data, dict) else raw.decode(errors="replace")
+            raise DockerError(message or f"{method} {path} failed", status=resp.status)
+        return resp.status, data
+
+    def ping(self) -> bool:
+        try:
+            status, _ = self._request("GET", "/_ping")
+        except DockerError:
+            return False
+        return status == 200
+
+    # Containers
+
+    def containers(self, filters: dict[str, list[str]] | None = None, all: bool = True) -> list[dict]:
+        params = {"all": "1" if all else "0"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        _, rows = self._request("GET", "/containers/json", params)
+        return [
+            {
+                "ID": row["Id"][:12],
+                "Names": ",".join(n.lstrip("/") for n in row.get("Names") or []),
+                "Image": row.get("Image", ""),
+                "State": row.get("State", ""),
+                "Status": row.get("Status", ""),
+                "Ports": _format_ports(row.get("Ports") or []),
+                "Labels": row.get("Labels") or {},
+                "Networks": list(((row.get("NetworkSettings") or {}).get("Networks") or {})),
+                "Mounts": [
+                    m["Name"] for m in row.get("Mounts") or [] if m.get("Type") == "volume"
+                ],
+            }
+            for row in rows or []
+        ]
+
+    def _each(self, func, items: list[str]):
+        """Apply func to every item concurrently, like `docker stop a b c` does.
+
+        Every item is attempted; failures are raised together as one
+        DockerError afterwards.
+        """
+        if len(items) <= 1:
+            for item in items:
+                func(item)
+            return
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(items))) as pool:
+            for future in [pool.submit(func, item) for item in items]:
+                try:
+                    future.result()
+                except DockerError as e:
+                    errors.append(e)
+        if errors:
+            raise DockerError("; ".join(map(str, errors)), status=errors[0].status)
+
+    def inspect_containers(self, ids: list[str]) -> list[dict]:
+        """Inspect containers concurrently; see _normalise_inspect for the shape."""
+
+        def inspect(cid: str) -> dict:
+            return _normalise_inspect(self._request("GET", f"/containers/{quote(cid)}/json")[1])
+
+        if len(ids) <= 1:
+            return [inspect(cid) for cid in ids]
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(ids))) as pool:
+            return list(pool.map(inspect, ids))
+
+    def stop_containers(self, ids: list[str], timeout: int | None = None):
+        """Stop containers, killing them after ``timeout`` seconds (default: their own)."""
+        params = {"t": str(timeout)} if timeout is not None else None
+        # Leave the daemon time to kill the container before giving up on it.
+        # Its own stop timeout (compose's stop_grace_period) isn't known
+        # here, so without one the daemon is waited on indefinitely.
+        read_timeout = None
+        if timeout is not None and self.timeout is not None:
+            read_timeout = max(self.timeout, timeout + 30)
+
+        # 304 means already stopped, which is fine.
+        self._each(
+            lambda cid: self._request(
+                "POST", f"/containers/{quote(cid)}/stop", params, timeout=read_timeout
+            ),
+            ids,
+        )
+
+    def remove_containers(self, ids: list[str]):
+        self._each(lambda cid: self._request("DELETE", f"/containers/{quote(cid)}"), ids)
+
+    def events(
+        self,
+        filters: dict[str, list[str]] | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> Iterator[dict]:
+        """Yield Docker events as they happen, until the caller stops iterating.
+
+        Uses its own connection without a read timeout, since the stream can
+        sit idle indefinitely.  ``since`` (a unix timestamp) replays events
+        from that point first; with ``until`` the stream ends at that time
+        instead of staying open.
+        """
+        params = {}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        if since is not None:
+            params["since"] = str(since)
+        if until is not None:
+            params["until"] = str(until)
+        path = f"/events?{urlencode(params)}" if params else "/events"
+        conn = self._factory(None)
+        try:
+            conn.request("GET", path, headers={"Host": "docker"})
+            resp = conn.getresponse()
+            if resp.status >= 400:
+                raise DockerError(resp.read().decode(errors="replace"), status=resp.status)
+            for line in resp:
+                if line.strip():
+                    yield _normalise_event(json.loads(line))
+        except OSError as e:
+            raise DockerError(f"Lost event stream from {self.host}: {e}")
+        finally:
+            conn.close()
+
+    def stats(self, ids: list[str]) -> Iterator[dict]:
+        """Yield resource samples as Docker streams them, about one per container per second.
+
+        Each container is streamed over its own connection; see
+        _normalise_stats for the shape.  The iterator ends once every
+        container has stopped, or when the caller stops iterating.
+        """
+        samples: queue.Queue = queue.Queue()
+        conns = []
+        done = threading.Event()
+
+        def pump(cid: str):
+            conn = self._factory(None)
+            conns.append(conn)
+            try:
+                conn.request("GET", f"/containers/{quote(cid)}/stats?stream=1", headers={"Host": "docker"})
+                resp = conn.getresponse()
+                # 404: the container went away before its stream started.
+                if resp.status >= 400 and resp.status != 404:
+                    samples.put(DockerError(resp.read().decode(errors="replace"), status=resp.status))
+                elif resp.status < 400:
+                    for line in resp:
+                        sample = _normalise_stats(json.loads(line)) if line.strip() else None
+                        if sample is not None:
+                            samples.put(sample)
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                # Shutting the stream down mid-read surfaces as any of these.
+                if not done.is_set():
+                    samples.put(DockerError(f"Lost stats stream from {self.host}: {e}"))
+            finally:
+                conn.close()
+                samples.put(None)
+
+        for cid in ids:
+            threading.Thread(target=pump, args=(cid,), daemon=True).start()
+        try:
+            streaming = len(ids)
+            while streaming:
+                item = samples.get()
+                if item is None:
+                    streaming -= 1
+                elif isinstance(item, DockerError):
+                    raise item
+                else:
+                    yield item
+        finally:
+            done.set()
+            # Wake any thread blocked reading; each closes its own connection.
+            for sock in [conn.sock for conn in conns]:
+                if sock is not None:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+    # Networks
+
+    def network_exists(self, name: str) -> bool:
+        try:
+            self._request("GET", f"/networks/{quote(name, safe='')}")
+        except DockerError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def networks(self, filters: dict[str, list[str]] | None = None) -> list[dict]:
+        params = {"filters": json.dumps(filters)} if filters else None
+        _, rows = self._request("GET", "/networks", params)
+        return [
+            {"ID": row["Id"][:12], "Name": row["Name"], "Labels": row.get("Labels") or {}}
+            for row in rows or []
+        ]
+
+    def create_network(self, name: str, labels: dict[str, str], driver: str = "bridge"):
+        self._request(
+            "POST",
+            "/networks/create",
+            body={"Name": name, "Driver": driver, "Labels": labels, "CheckDuplicate": True},
+        )
+
+    def remove_network(self, network_id: str):
+        self._request("DELETE", f"/networks/{quote(network_id, safe='')}")
+
+    def remove_networks(self, ids: list[str]):
+        self._each(self.remove_network, ids)
+
+    # Volumes
+
+    def volume_exists(self, name: str) -> bool:
+        try:
+            self._request("GET", f"/volumes/{quote(name, safe='')}")
+        except DockerError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def volumes(self, filters: dict[str, list[str]] | None = None) -> list[dict]:
+        params = {"filters": json.dumps(filters)} if filters else None
+        _, data = self._request("GET", "/volumes", params)
+        return [
+            {"Name": row["Name"], "Labels": row.get("Labels") or {}}
+            for row in (data or {}).get("Volumes") or []
+        ]
+
+    def create_volume(self, name: str, labels: dict[str, str]):
+        self._request("POST", "/volumes/create", body={"Name": name, "Labels": labels})
+
+    def remove_volume(self, name: str):
+        self._request("DELETE", f"/volumes/{quote(name, safe='')}")
+
+    def remove_volumes(self, names: list[str]):
+        self._each(self.remove_volume, names)
+
+    # Images
+
+    def images(self, filters: dict[str, list[str]] | None = None) -> list[dict]:
+        """Return [{"ID": ..., "Tags": ["repo:tag", ...], "Digests": ["repo@sha256:...", ...]}]."""
+        params = {"filters": json.dumps(filters)} if filters else None
+        _, rows = self._request("GET", "/images/json", params)
+        return [
+            {
+                "ID": row["Id"].split(":")[-1][:12],
+                "Tags": [t for t in row.get("RepoTags") or [] if t != "<none>:<none>"],
+                "Digests": [d for d in row.get("RepoDigests") or [] if d != "<none>@<none>"],
+            }
+            for row in rows or []
+        ]
+
+    # Disk usage
+
+    def disk_usage(self) -> dict[str, dict[str, int]]:
+        """Return {"Containers": {id: writable layer bytes}, "Volumes": {name: bytes}}."""
+        _, df = self._request("GET", "/system/df")
+        df = df or {}
+        return {
+            "Containers": {
+                c["Id"][:12]: max(c.get("SizeRw") or 0, 0) for c in df.get("Containers") or []
+            },
+            "Volumes": {
+                v["Name"]: max((v.get("UsageData") or {}).get("Size", 0), 0)
+                for v in df.get("Volumes") or []
+            },
+        }
+
+
+class DockerCLI:
+    """Fallback backend that shells out to the `docker` CLI.
+
+    Exposes the same methods as DockerClient and returns the same shapes.
+    """
+
+    host = "docker CLI"
+
+    def _run(self, args: list[str]) -> subprocess.CompletedProcess:
+        result = profiler.run(["docker", *args], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise DockerError(result.stderr.strip() or f"docker {args[0]} failed")
+        return result
+
+    def close(self):
+        pass
+
+    def ping(self) -> bool:
+        try:
+            self._run(["version", "--format", "{{.Server.Version}}"])
+        except (DockerError, OSError):
+            return False
+        return True
+
+    def containers(self, filters: dict[str, list[str]] | None = None, all: bool = True) -> list[dict]:
+        args = [
+            "ps",
+            *(["-a"] if all else []),
+            "--no-trunc",
+            *_filter_args(filters),
+            "--format",
+            "{{json .}}",
+        ]
+        rows = []
+        for line in self._run(args).stdout.splitlines():
+            if not line:
+                continue
+            row = json.loads(line)
+            rows.append(
+                {
+                    "ID": row.get("ID", "")[:12],
+                    "Names": row.get("Names", ""),
+                    "Image": row.get("Image", ""),
+                    "State": row.get("State", ""),
+                    "Status": row.get("Status", ""),
+                    "Ports": row.get("Ports", ""),
+                    "Labels": _parse_label_string(row.get("Labels", "")),
+                    "Networks": [n for n in row.get("Networks", "").split(",") if n],
+                    # Bind mounts show up as host paths; only named volumes matter.
+                    "Mounts": [
+                        m for m in row.get("Mounts", "").split(",") if m and "/" not in m
+                    ],
+                }
+            )
+        return rows
+
+    def inspect_containers(self, ids: list[str]) -> list[dict]:
+        if not ids:
+            return []
+        raw = json.loads(self._run(["inspect", "--type", "container", *ids]).stdout or "[]")
+        return [_normalise_inspect(row) for row in raw]
+
+    def stop_containers(self, ids: list[str], timeout: int | None = None):
+        if ids:
+            self._run(["stop", *(["-t", str(timeout)] if timeout is not None else []), *ids])
+
+    def remove_containers(self, ids: list[str]):
+        if ids:
+            self._run(["rm", *ids])
+
+    def events(
+        self,
+        filters: dict[str, list[str]] | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> Iterator[dict]:
+        args = ["docker", "events", *_filter_args(filters), "--format", "{{json .}}"]
+        if since is not None:
+            args[2:2] = ["--since", str(since)]
+        if until is not None:
+            args[2:2] = ["--until", str(until)]
+        proc = profiler.TracedPopen(args, stdout=subprocess.PIPE, text=True)
+        try:
+            for line in proc.stdout:
+                if line.strip():
+                    yield _normalise_event(json.loads(line))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    def stats(self, ids: list[str]) -> Iterator[dict]:
+        if not ids:
+            return
+        args = ["docker", "stats", "--no-trunc", "--format", "{{json .}}", *ids]
+        proc = profiler.TracedPopen(args, stdout=subprocess.PIPE, text=True)
+        try:
+            for line in proc.stdout:
+                # Each refresh starts with terminal control codes; the JSON follows.
+                _, brace, rest = line.partition("{")
+                if not brace:
+                    continue
+                row = json.loads(brace + rest)
+                used, _, limit = row.get("MemUsage", "").partition("/")
+                try:
+                    cpu = float(row.get("CPUPerc", "").rstrip("%"))
+                except ValueError:
+                    continue  # "--" while a container is stopped
+                yield {
+                    "ID": row.get("ID", "")[:12],
+                    "CPU": cpu,
+                    "Memory": _parse_size(used),
+                    "MemoryLimit": _parse_size(limit),
+                }
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    def network_exists(self, name: str) -> bool:
+        result = profiler.run(
+            ["docker", "network", "inspect", name], capture_output=True, text=True
+        )
+        return result.returncode == 0
+
+    def networks(self, filters: dict[str, list[str]] | None = None) -> list[dict]:
+        args = ["network", "ls", *_filter_args(filters), "--format", "{{json .}}"]
+        rows = []
+        for line in self._run(args).stdout.splitlines():
+            if line:
+                row = json.loads(line)
+                rows.append(
+                    {
+                        "ID": row.get("ID", ""),
+                        "Name": row.get("Name", ""),
+                        "Labels": _parse_label_string(row.get("Labels", "")),
+                    }
+                )
+        return rows
+
+    def create_network(self, name: str, labels: dict[str, str], driver: str = "bridge"):
+        label_args = [a for k, v in labels.items() for a in ("--label", f"{k}={v}")]
+        self._run(["network", "create", "--driver", driver, *label_args, name])
+
+    def remove_network(self, network_id: str):
+        self._run(["network", "rm", network_id])
+
+    def remove_networks(self, ids: list[str]):
+        if ids:
+            self._run(["network", "rm", *ids])
+
+    def volume_exists(self, name: str) -> bool:
+        result = profiler.run(
+            ["docker", "volume", "inspect", name], capture_output=True, text=True
+        )
+        return result.returncode == 0
+
+    def volumes(self, filters: dict[str, list[str]] | None = None) -> list[dict]:
+        args = ["volume", "ls", *_filter_args(filters), "--format", "{{json .}}"]
+        rows = []
+        for line in self._run(args).stdout.splitlines():
+            if line:
+                row = json.loads(line)
+                rows.append(
+                    {
+                        "Name": row.get("Name", ""),
+                        "Labels": _parse_label_string(row.get("Labels", "")),
+                    }
+                )
+        return rows
+
+    def create_volume(self, name: str, labels: dict[str, str]):
+        label_args = [a for k, v in labels.items() for a in ("--label", f"{k}={v}")]
+        self._run(["volume", "create", *label_args, name])
+
+    def remove_volume(self, name: str):
+        self._run(["volume", "rm", name])
+
+    def remove_volumes(self, names: list[str]):
+        if names:
+            self._run(["volume", "rm", *names])
+
+    def images(self, filters: dict[str, list[str]] | None = None) -> list[dict]:
+        args = ["image", "ls", "--digests", *_filter_args(filters), "--format", "{{json .}}"]
+        by_id: dict[str, dict] = {}
+        for line in self._run(args).stdout.splitlines():
+            if line:
+                row = json.loads(line)
+                image_id = row.get("ID", "")[:12]
+                image = by_id.setdefault(image_id, {"ID": image_id, "Tags": [], "Digests": []})
+                repo = row.get("Repository", "<none>")
+                if repo == "<none>":
+                    continue
+                tag = f"{repo}:{row.get('Tag', '<none>')}"
+                if not tag.endswith(":<none>") and tag not in image["Tags"]:
+                    image["Tags"].append(tag)
+                digest = f"{repo}@{row.get('Digest', '<none>')}"
+                if not digest.endswith("@<none>") and digest not in image["Digests"]:
+                    image["Digests"].append(digest)
+        return list(by_id.values())
+
+    def disk_usage(self) -> dict[str, dict[str, int]]:
+        df = json.loads(self._run(["system", "df", "-v", "--format", "{{json .}}"]).stdout or "{}")
+        return {
+            "Containers": {
+                c.get("ID", "")[:12]: _parse_size(c.get("Size", ""))
+                for c in df.get("Containers") or []
+            },
+            "Volumes": {
+                v.get("Name", ""): _parse_size(v.get("Size", ""))
+                for v in df.get("Volumes") or []
+            },
+        }
+
+
+_client: DockerClient | DockerCLI | None = None
+
+
+def get_client() -> DockerClient | DockerCLI:
+    """Return the shared Docker backend for this invocation.
+
+    Prefers the Engine API over DOCKER_HOST (or the default socket) and falls
+    back to the `docker` CLI when the daemon socket is unreachable.  Set
+    DTOP_DOCKER_BACKEND=cli or =api to force one or the other.
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    backend = os.environ.get("DTOP_DOCKER_BACKEND", "").lower()
+    if backend == "cli":
+        _client = DockerCLI()
+    elif backend == "api":
+        _client = DockerClient()
+    else:
+        try:
+            client = DockerClient()
+        except DockerError:
+            client = None
+        if client is None or not client.ping():
+            client = DockerCLI()
+        _client = client
+    return _client
@@ -1,32 +1,162 @@
-import json
-import subprocess
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import typer
 
+from docktapus.commands import profiler
 from docktapus.commands.compose_utils import cleanup_networks, cleanup_volumes
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.fleet import current_prefix, prefixed_output, run_projects
+from docktapus.commands.inventory import Container, Inventory
+from docktapus.commands.registry import Registry, open_registry
+from docktapus.commands.scheduler import Node, depends_on, shutdown_tiers
+from docktapus.commands.yaml_cache import load_yaml
 
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(h|ms|us|m|s)")
+_DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 1e-3, "us": 1e-6}
 
-def _get_containers_by_project(project_name: str) -> list[str]:
-    """Return container IDs labelled with dtop.project=<project_name>."""
-    result = subprocess.run(
-        [
-            "docker",
-            "ps",
-            "-a",
-            "--filter",
-            f"label=dtop.project={project_name}",
-            "--format",
-            "{{.ID}}",
-        ],
-        capture_output=True,
-        text=True,
+
+def _grace_seconds(value) -> int | None:
+    """Convert a compose stop_grace_period ("10s", "1m30s", ...) to whole seconds.
+
+    Returns None when unset or unparseable, leaving the container's own
+    stop timeout in charge.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return math.ceil(value)
+    text = str(value).strip()
+    parts = _DURATION.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        return None
+    return math.ceil(sum(float(n) * _DURATION_UNITS[u] for n, u in parts))
+
+
+def _load_composes(registry: Registry | None, project_name: str) -> dict[str, dict]:
+    """Return {env: compose dict} for a registered project, or {} if unknown."""
+    project = registry.get(project_name) if registry is not None else None
+    composes = {}
+    for env, path in ((project or {}).get("compose") or {}).items():
+        try:
+            composes[env] = load_yaml(path) or {}
+        except OSError:
+            pass
+    return composes
+
+
+def _shutdown_graph(
+    containers: list[Container], composes: dict[str, dict]
+) -> tuple[dict[Node, set[Node]], dict[Node, list[Container]]]:
+    """Build the depends_on graph between the services these containers belong to.
+
+    A dependency resolves to whichever env the named service is running in,
+    like build_service_graph does when starting.  Containers of unknown
+    services (or unregistered projects) get no edges.
+    """
+    by_node: dict[Node, list[Container]] = {}
+    owner: dict[str, str] = {}
+    for c in containers:
+        by_node.setdefault((c.env, c.service), []).append(c)
+        owner.setdefault(c.service, c.env)
+
+    graph: dict[Node, set[Node]] = {}
+    for env, name in by_node:
+        svc_cfg = ((composes.get(env) or {}).get("services") or {}).get(name)
+        graph[(env, name)] = {
+            (owner[dep], dep) for dep in depends_on(svc_cfg) if dep in owner
+        }
+    return graph, by_node
+
+
+def _stop_in_tiers(containers: list[Container], composes: dict[str, dict]):
+    """Stop running containers in reverse dependency order, one tier at a time.
+
+    Every tier is stopped in parallel, grouped by the stop_grace_period of
+    each service so a slow service only delays its own tier.
+    """
+    graph, by_node = _shutdown_graph([c for c in containers if c.running], composes)
+    client = get_client()
+    prefix = current_prefix()
+
+    def stop(ids: list[str], timeout: int | None):
+        with prefixed_output(prefix):
+            client.stop_containers(ids, timeout=timeout)
+
+    for tier in shutdown_tiers(graph):
+        groups: dict[int | None, list[str]] = {}
+        for env, name in tier:
+            svc_cfg = ((composes.get(env) or {}).get("services") or {}).get(name) or {}
+            grace = _grace_seconds(svc_cfg.get("stop_grace_period"))
+            groups.setdefault(grace, []).extend(c.id for c in by_node[(env, name)])
+        names = [name or "?" for _, name in tier]
+        typer.echo(f"  ↳ stopping {', '.join(names)}")
+        with profiler.phase("stop tier", services=names):
+            if len(groups) == 1:
+                [(grace, ids)] = groups.items()
+                stop(ids, grace)
+                continue
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                for future in [pool.submit(stop, ids, grace) for grace, ids in groups.items()]:
+                    future.result()
+
+
+def _down_project(
+    project_name: str,
+    containers: list[Container],
+    composes: dict[str, dict],
+    remove_networks: bool | None,
+    remove_volumes: bool | None,
+):
+    """Stop one project's containers, then its networks/volumes (None means ask)."""
+    if not containers:
+        typer.echo(f"No running containers found for project '{project_name}'")
+        raise typer.Exit()
+
+    typer.echo(
+        f"Stopping {len(containers)} container(s) for project '{project_name}'..."
     )
-    return [cid for cid in result.stdout.strip().splitlines() if cid]
+
+    try:
+        # Stop containers, dependents first
+        _stop_in_tiers(containers, composes)
+
+        # Remove containers in one batch
+        with profiler.phase("remove containers"):
+            get_client().remove_containers([c.id for c in containers])
+
+        removed = ["Containers"]
+
+        # Determine whether to remove networks
+        if remove_networks is None:
+            remove_networks = typer.confirm("Remove project networks?", default=False)
+
+        if remove_networks:
+            cleanup_networks(project_name)
+            removed.append("networks")
+
+        # Determine whether to remove volumes
+        if remove_volumes is None:
+            remove_volumes = typer.confirm("Remove project volumes?", default=False)
+
+        if remove_volumes:
+            cleanup_volumes(project_name)
+            removed.append("volumes")
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+
+    typer.echo(f"{', '.join(removed)} removed")
 
 
 def down(
-    project_name: str = typer.Argument(
-        None, help="Project to stop (defaults to current folder name)"
+    project_names: list[str] = typer.Argument(
+        None, help="Projects to stop (defaults to current folder name)"
+    ),
+    all_projects: bool = typer.Option(
+        False, "--all-projects", help="Stop every project that has containers"
     ),
     remove_networks: bool = typer.Option(
         False,
@@ -45,6 +175,12 @@ def down(
         "--all",
         help="Remove everything (networks and volumes) without prompting",
     ),
+    config_path: Path = typer.Option(
+        None, "-conf", "--config-file-path", help="Path to .dtop.yml config file"
+    ),
+    jobs: int = typer.Option(
+        4, "--jobs", "-j", min=1, help="Maximum projects to stop concurrently"
+    ),
 ):
     """
     Stop and remove Docker containers for a Docktapus project.
@@ -54,56 +190,75 @@ def down(
     remove networks and volumes.  Use --remove-networks, --remove-volumes,
     or --all to skip the prompts.
 
+    Containers are stopped in reverse dependency order, using depends_on
+    from the project's compose files: each tier of services is stopped in
+    parallel, with each service given its stop_grace_period, before the
+    services they depend on.  All containers are then removed in one batch.
+
+    Several projects (or --all-projects) are stopped concurrently, up to
+    --jobs at a time, with each output line prefixed by its project name.
+    The network/volume prompts are then asked once for all of them, and
+    the exit status is non-zero if any project failed.
+
     Usage:
-      dtop down [PROJECT_NAME] [OPTIONS]
+      dtop down [PROJECT_NAME...] [OPTIONS]
 
     Examples:
       dtop down myproj
       dtop down myproj --all
       dtop down myproj --remove-networks
       dtop down
+      dtop down proj1 proj2 --all
+      dtop down --all-projects
     """
-    from pathlib import Path
-
-    if not project_name:
-        project_name = Path.cwd().name
+    remove_networks = True if all_ or remove_networks else None
+    remove_volumes = True if all_ or remove_volumes else None
+    registry = open_registry(config_path)
 
-    container_ids = _get_containers_by_project(project_name)
-
-    if not container_ids:
-        typer.echo(f"No running containers found for project '{project_name}'")
-        raise typer.Exit()
-
-    typer.echo(
-        f"Stopping {len(container_ids)} container(s) for project '{project_name}'..."
-    )
-
-    # Stop containers
-    subprocess.run(["docker", "stop", *container_ids], check=True)
-
-    # Remove containers
-    subprocess.run(["docker", "rm", *container_ids], check=True)
-
-    removed = ["Containers"]
-
-    # Determine whether to remove networks
-    should_remove_networks = all_ or remove_networks
-    if not should_remove_networks:
-        should_remove_networks = typer.confirm(
-            "Remove project networks?", default=False
+    if not all_projects and len(project_names or []) <= 1:
+        project_name = project_names[0] if project_names else Path.cwd().name
+        try:
+            containers = Inventory.load(project_name).containers
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+        _down_project(
+            project_name,
+            containers,
+            _load_composes(registry, project_name),
+            remove_networks,
+            remove_volumes,
         )
+        return
 
-    if should_remove_networks:
-        cleanup_networks(project_name)
-        removed.append("networks")
+    # One query covers every project.
+    try:
+        inventory = Inventory.load()
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    if all_projects:
+        project_names = sorted(inventory.by_project)
+        if not project_names:
+            typer.echo("No Docktapus-managed containers found")
+            raise typer.Exit()
 
-    # Determine whether to remove volumes
-    should_remove_volumes = all_ or remove_volumes
-    if not should_remove_volumes:
-        should_remove_volumes = typer.confirm("Remove project volumes?", default=False)
+    # Ask once up front rather than from several projects at the same time.
+    if any(inventory.project(name) for name in project_names):
+        if remove_networks is None:
+            remove_networks = typer.confirm("Remove project networks?", default=False)
+        if remove_volumes is None:
+            remove_volumes = typer.confirm("Remove project volumes?", default=False)
 
-    if should_remove_volumes:
-        cleanup_volumes(project_name)
-        removed.append("volumes")
+    def run(project_name: str):
+        _down_project(
+            project_name,
+            inventory.project(project_name),
+            _load_composes(registry, project_name),
+            remove_networks,
+            remove_volumes,
+        )
 
-    typer.echo(f"{', '.join(removed)} removed")
+    code = run_projects(project_names, run, jobs)
+    if code:
+        raise typer.Exit(code=code)
@@ -0,0 +1,185 @@
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator
+
+import click
+import typer
+
+from docktapus.commands import profiler
+
+# Lines of a failed command's output shown before giving up.
+FAILED_OUTPUT_TAIL = 20
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def current_prefix() -> str | None:
+    """Return the output prefix of the calling thread, if any."""
+    return getattr(_local, "prefix", None)
+
+
+class _PrefixedStream:
+    """Proxy for sys.stdout that prefixes every line written from a prefixed thread.
+
+    Partial lines are buffered per thread, so output from concurrently
+    running projects is interleaved line by line rather than mid-line.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, s):
+        prefix = current_prefix()
+        if prefix is None or not isinstance(s, str):
+            return self._stream.write(s)
+        *lines, _local.pending = (_local.pending + s).split("\n")
+        if lines:
+            with _write_lock:
+                self._stream.write("".join(f"{prefix}{line}\n" for line in lines))
+        return len(s)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+@contextmanager
+def prefixed_output(prefix: str | None) -> Iterator[None]:
+    """Prefix every line this thread prints (and its subprocesses' output) with prefix.
+
+    A None prefix leaves output alone, so worker threads can simply adopt
+    their parent's current_prefix().
+    """
+    if prefix is None:
+        yield
+        return
+    _local.prefix, _local.pending = prefix, ""
+    try:
+        yield
+    finally:
+        if _local.pending:
+            sys.stdout.write("\n")
+        _local.prefix = None
+
+
+class _RelayedPopen(profiler.TracedPopen):
+    """Popen whose merged stdout/stderr is echoed line by line under a prefix."""
+
+    def __init__(self, cmd: list[str], prefix: str):
+        super().__init__(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace"
+        )
+        self._relay = threading.Thread(target=self._pump, args=(prefix,), daemon=True)
+        self._relay.start()
+
+    def _pump(self, prefix: str):
+        with prefixed_output(prefix):
+            for line in self.stdout:
+                typer.echo(line.rstrip("\n"))
+
+    def wait(self, timeout=None):
+        returncode = super().wait(timeout)
+        # Don't report the process as finished before all its output is shown.
+        self._relay.join()
+        return returncode
+
+
+def popen(cmd: list[str]) -> subprocess.Popen:
+    """Start cmd, relaying its output through the caller's output prefix if one is set.
+
+    Without a prefix the child inherits stdout/stderr as usual.
+    """
+    prefix = current_prefix()
+    if prefix is None:
+        return profiler.TracedPopen(cmd)
+    return _RelayedPopen(cmd, prefix)
+
+
+def run_projects(
+    project_names: list[str], func: Callable[[str], None], jobs: int
+) -> int:
+    """Run func(project_name) for every project, up to jobs at a time.
+
+    Each project's output is prefixed with "[name] ".  A project that raises
+    typer.Exit or fails outright doesn't stop the others.  Returns the
+    aggregated exit status: 0 if every project succeeded, otherwise the
+    first non-zero status in project order.
+    """
+    width = max(len(name) for name in project_names)
+
+    def run(name: str) -> int:
+        with prefixed_output(f"[{name:<{width}}] "):
+            try:
+                func(name)
+            except typer.Exit as e:
+                return e.exit_code
+            except click.exceptions.Abort:
+                typer.echo("❌ Aborted")
+                return 1
+            except Exception as e:
+                typer.echo(f"❌ {type(e).__name__}: {e}")
+                return 1
+        return 0
+
+    stdout = sys.stdout
+    sys.stdout = _PrefixedStream(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(project_names))) as pool:
+            codes = dict(zip(project_names, pool.map(run, project_names)))
+    finally:
+        sys.stdout = stdout
+
+    failed = [name for name, code in codes.items() if code]
+    if failed:
+        typer.echo(f"❌ {len(failed)} of {len(codes)} project(s) failed: {', '.join(failed)}")
+        return codes[failed[0]]
+    typer.echo(f"✅ {len(codes)} project(s) done")
+    return 0
+
+
+def run_commands(
+    commands: dict[str, list[str]],
+    doing: str,
+    done: str,
+    jobs: int,
+    slots: threading.BoundedSemaphore | None = None,
+):
+    """Run {name: command} concurrently, up to `jobs` at a time, each holding one of ``slots``.
+
+    One line is printed per finished command, e.g. "✅ built api (1.2s)"
+    for done="built", and a failed one is followed by the tail of its
+    output under "❌ building api failed" for doing="building".  Every
+    command runs to completion; if any failed, the first failure is raised
+    as CalledProcessError after all of them are reported.
+    """
+    slots = slots or nullcontext()
+
+    def run_one(name: str):
+        with slots:
+            start = time.monotonic()
+            result = profiler.run(commands[name], capture_output=True, text=True)
+        return name, result, time.monotonic() - start
+
+    failure = None
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(commands)))) as pool:
+        futures = [pool.submit(run_one, name) for name in commands]
+        for finished, future in enumerate(as_completed(futures), 1):
+            name, result, elapsed = future.result()
+            progress = f"[{finished}/{len(commands)}]"
+            if result.returncode == 0:
+                typer.echo(f"  ✅ {done} {name} ({elapsed:.1f}s) {progress}")
+                continue
+            typer.echo(f"  ❌ {doing} {name} failed {progress}:")
+            output = (result.stdout + result.stderr).rstrip().splitlines()
+            for line in output[-FAILED_OUTPUT_TAIL:]:
+                typer.echo(f"     {line}")
+            failure = failure or subprocess.CalledProcessError(result.returncode, result.args)
+    if failure is not None:
+        raise failure
@@ -0,0 +1,191 @@
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import typer
+
+from docktapus.commands import profiler
+from docktapus.commands.compose_utils import TEMP_COMPOSE_PREFIX
+from docktapus.commands.docker_api import DockerError, _format_size, get_client
+from docktapus.commands.inventory import PROJECT_LABEL, Container
+
+# States of containers that are no longer doing anything.
+DEAD_STATES = ("created", "exited", "dead")
+# Temp compose files younger than this may still belong to a running dtop.
+TEMP_COMPOSE_MAX_AGE = 3600
+
+
+def _stale_temp_composes() -> dict[Path, int]:
+    """Return {path: size} for temp compose files older than TEMP_COMPOSE_MAX_AGE."""
+    cutoff = time.time() - TEMP_COMPOSE_MAX_AGE
+    stale = {}
+    for path in Path(tempfile.gettempdir()).glob(f"{TEMP_COMPOSE_PREFIX}*.yml"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if st.st_mtime < cutoff:
+            stale[path] = st.st_size
+    return stale
+
+
+def _report(title: str, rows: list[tuple[str, str, int | None]]):
+    if not rows:
+        return
+    typer.echo(f"{title} ({len(rows)}):")
+    width = max(len(name) for name, _, _ in rows)
+    for name, project, size in rows:
+        line = f"  {name:<{width}}"
+        if project:
+            line += f"  [{project}]"
+        if size is not None:
+            line += f"  {_format_size(size)}"
+        typer.echo(line)
+
+
+def gc(
+    project_name: str = typer.Argument(
+        None, help="Only collect this project's resources (defaults to all projects)"
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", "-n", help="Only report what would be removed"
+    ),
+    volumes: bool = typer.Option(
+        False, "--volumes", help="Also remove unused project volumes (deletes their data)"
+    ),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Don't ask for confirmation"),
+):
+    """
+    Remove orphaned Docktapus resources across all projects.
+
+    Finds dtop.project-labelled containers that are no longer running,
+    project networks (and, with --volumes, project volumes) that no
+    remaining container uses, and temp compose files left behind by
+    interrupted runs.  Everything is found with a few bulk queries and
+    removed with batched, concurrent deletes, and the disk space
+    reclaimed is reported.
+
+    Usage:
+      dtop gc [PROJECT_NAME] [OPTIONS]
+
+    Examples:
+      dtop gc --dry-run
+      dtop gc --volumes
+      dtop gc myproj -y
+    """
+    client = get_client()
+    label = f"{PROJECT_LABEL}={project_name}" if project_name else PROJECT_LABEL
+
+    # Every container (labelled or not) is fetched, since any of them may
+    # still be using a project network or volume.
+    with profiler.phase("find orphans"), ThreadPoolExecutor(max_workers=3) as pool:
+        rows = pool.submit(client.containers)
+        nets = pool.submit(client.networks, {"label": [label]})
+        vols = pool.submit(client.volumes, {"label": [label]}) if volumes else None
+        try:
+            containers = [Container.from_row(row) for row in rows.result()]
+            networks = nets.result()
+            project_volumes = vols.result() if vols else []
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+
+    dead = [
+        c
+        for c in containers
+        if c.project
+        and (project_name is None or c.project == project_name)
+        and c.state in DEAD_STATES
+    ]
+    dead_ids = {c.id for c in dead}
+    kept = [c for c in containers if c.id not in dead_ids]
+    used_networks = {name for c in kept for name in c.networks}
+    used_volumes = {name for c in kept for name in c.mounts}
+
+    unused_networks = [n for n in networks if n["Name"] not in used_networks]
+    unused_volumes = [v for v in project_volumes if v["Name"] not in used_volumes]
+    temp_files = _stale_temp_composes() if project_name is None else {}
+
+    if not (dead or unused_networks or unused_volumes or temp_files):
+        typer.echo("Nothing to clean up")
+        raise typer.Exit()
+
+    usage = {"Containers": {}, "Volumes": {}}
+    if dead or unused_volumes:
+        try:
+            usage = client.disk_usage()
+        except DockerError:
+            pass
+    container_sizes = {c.id: usage["Containers"].get(c.id, 0) for c in dead}
+    volume_sizes = {v["Name"]: usage["Volumes"].get(v["Name"], 0) for v in unused_volumes}
+
+    _report(
+        "Stopped containers",
+        [(c.name, c.project, container_sizes[c.id]) for c in dead],
+    )
+    _report(
+        "Unused networks",
+        [(n["Name"], n["Labels"].get(PROJECT_LABEL, ""), None) for n in unused_networks],
+    )
+    _report(
+        "Unused volumes",
+        [
+            (v["Name"], v["Labels"].get(PROJECT_LABEL, ""), volume_sizes[v["Name"]])
+            for v in unused_volumes
+        ],
+    )
+    _report(
+        "Leftover temp compose files",
+        [(str(path), "", size) for path, size in temp_files.items()],
+    )
+
+    total = sum(container_sizes.values()) + sum(volume_sizes.values()) + sum(temp_files.values())
+    if dry_run:
+        typer.echo(f"Dry run: would reclaim {_format_size(total)}")
+        return
+
+    if not yes:
+        typer.confirm("Remove these resources?", abort=True)
+
+    failed = []
+    reclaimed = 0
+
+    # Containers first, so the networks and volumes they held are free.
+    if dead:
+        try:
+            client.remove_containers([c.id for c in dead])
+            reclaimed += sum(container_sizes.values())
+        except DockerError as e:
+            failed.append(f"containers: {e}")
+
+    def remove_networks():
+        client.remove_networks([n["ID"] for n in unused_networks])
+
+    def remove_volumes():
+        client.remove_volumes([v["Name"] for v in unused_volumes])
+        return sum(volume_sizes.values())
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        steps = {}
+        if unused_networks:
+            steps["networks"] = pool.submit(remove_networks)
+        if unused_volumes:
+            steps["volumes"] = pool.submit(remove_volumes)
+        for path, size in temp_files.items():
+            try:
+                path.unlink()
+                reclaimed += size
+            except OSError as e:
+                failed.append(f"{path}: {e}")
+        for kind, future in steps.items():
+            try:
+                reclaimed += future.result() or 0
+            except DockerError as e:
+                failed.append(f"{kind}: {e}")
+
+    typer.echo(f"Reclaimed {_format_size(reclaimed)}")
+    if failed:
+        for failure in failed:
+            typer.echo(f"❌ Could not remove {failure}")
+        raise typer.Exit(code=1)
@@ -1,9 +1,8 @@
 from pathlib import Path
 from datetime import datetime, timezone
-import yaml
 import typer
 
-OCT_CONFIG = Path.home() / ".dtop.yml"
+from docktapus.commands.registry import open_registry
 
 
 def init(
@@ -26,12 +25,11 @@ def init(
     your production and development docker-compose files. No containers
     are started and no Docker commands are run.
 
-    A single .oct.yml file can contain multiple projects.
+    Each project is stored in its own file under ~/.dtop.d/projects/, so
+    registering one project never rewrites the others.
     """
 
-    if not config_path.is_file():
-        typer.echo(f"Using default config path {OCT_CONFIG} ")
-        config_path = OCT_CONFIG
+    registry = open_registry(config_path)
     cwd = Path.cwd()
 
     dev_path = dev_compose_file.expanduser().resolve()
@@ -46,30 +44,21 @@ def init(
         typer.echo(f"❌ Prod compose not found: {prod_path}")
         raise typer.Exit(code=1)
 
-    # Load existing config or create a new one
-
-    if config_path.exists():
-        with config_path.open() as f:
-            config = yaml.safe_load(f) or {}
-    else:
-        config = {}
-
-    projects = config.setdefault("projects", {})
-
-    if project_name in projects and not force:
-        typer.echo(
-            f"❌ Project {project_name} already exists! Use --force to overwrite"
+    with registry.lock(project_name):
+        if registry.get(project_name) is not None and not force:
+            typer.echo(
+                f"❌ Project {project_name} already exists! Use --force to overwrite"
+            )
+            raise typer.Exit(code=1)
+
+        registry.put(
+            project_name,
+            {
+                "root": str(cwd.resolve()),
+                "compose": {"dev": str(dev_path), "prod": str(prod_path)},
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            },
         )
-        raise typer.Exit(code=1)
-
-    projects[project_name] = {
-        "root": str(cwd.resolve()),
-        "compose": {"dev": str(dev_path), "prod": str(prod_path)},
-        "created_at": datetime.now(timezone.utc).isoformat(),
-    }
-
-    with config_path.open("w") as f:
-        yaml.safe_dump(config, f, sort_keys=False)
 
     typer.echo("Project initialised")
     typer.echo(f"Project: {project_name}")
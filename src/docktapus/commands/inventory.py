@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+
+from docktapus.commands import daemon, profiler
+from docktapus.commands.docker_api import get_client
+
+PROJECT_LABEL = "dtop.project"
+ENV_LABEL = "dtop.env"
+SERVICE_LABEL = "com.docker.compose.service"
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+
+
+@dataclass(frozen=True, slots=True)
+class Container:
+    """One Docktapus-managed container, with its labels parsed once."""
+
+    id: str
+    name: str
+    image: str
+    state: str
+    status: str
+    ports: str
+    project: str
+    service: str
+    env: str
+    labels: dict[str, str] = field(repr=False)
+    networks: tuple[str, ...] = field(default=(), repr=False)
+    mounts: tuple[str, ...] = field(default=(), repr=False)
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Container":
+        """Build a Container from a row returned by the Docker backend."""
+        labels = row.get("Labels") or {}
+        return cls(
+            id=row.get("ID", ""),
+            name=row.get("Names", ""),
+            image=row.get("Image", ""),
+            state=row.get("State", ""),
+            status=row.get("Status", ""),
+            ports=row.get("Ports", ""),
+            project=labels.get(PROJECT_LABEL, ""),
+            service=labels.get(SERVICE_LABEL, ""),
+            env=labels.get(ENV_LABEL, ""),
+            labels=labels,
+            networks=tuple(row.get("Networks") or ()),
+            mounts=tuple(row.get("Mounts") or ()),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "image": self.image,
+            "state": self.state,
+            "status": self.status,
+            "ports": self.ports,
+            "project": self.project,
+            "service": self.service,
+            "env": self.env,
+            "labels": self.labels,
+            "networks": list(self.networks),
+            "mounts": list(self.mounts),
+        }
+
+
+class Inventory:
+    """Docktapus containers from a single query, indexed by project, service and env."""
+
+    __slots__ = ("containers", "by_project", "by_service", "by_env")
+
+    def __init__(self, containers: list[Container]):
+        self.containers = containers
+        self.by_project: dict[str, list[Container]] = {}
+        self.by_service: dict[tuple[str, str], list[Container]] = {}
+        self.by_env: dict[tuple[str, str], list[Container]] = {}
+        for c in containers:
+            self.by_project.setdefault(c.project, []).append(c)
+            self.by_service.setdefault((c.project, c.service), []).append(c)
+            self.by_env.setdefault((c.project, c.env), []).append(c)
+
+    @classmethod
+    def load(
+        cls, project_name: str | None = None, all: bool = True, ids: list[str] | None = None
+    ) -> "Inventory":
+        """Query Docker once for dtop-labelled containers, optionally narrowed down.
+
+        Asks a running `dtop serve` daemon first and only lists containers
+        through the Docker backend when there is none.
+        """
+        with profiler.phase("query containers"):
+            rows = daemon.containers(project_name, all=all, ids=ids)
+            if rows is None:
+                label = f"{PROJECT_LABEL}={project_name}" if project_name else PROJECT_LABEL
+                filters = {"label": [label]}
+                if ids:
+                    filters["id"] = list(ids)
+                rows = get_client().containers(filters, all=all)
+            return cls([Container.from_row(row) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.containers)
+
+    def project(self, project_name: str) -> list[Container]:
+        return self.by_project.get(project_name, [])
+
+    def service(self, project_name: str, service_name: str) -> list[Container]:
+        return self.by_service.get((project_name, service_name), [])
+
+    def env(self, project_name: str, env: str) -> list[Container]:
+        return self.by_env.get((project_name, env), [])
+
+    def running_env(self, project_name: str, service_name: str) -> str | None:
+        """Return the dtop.env of the service's first running container, or None."""
+        for c in self.service(project_name, service_name):
+            if c.running and c.env:
+                return c.env
+        return None
@@ -1,47 +1,180 @@
 import json
-import subprocess
-from pathlib import Path
+import queue
+import threading
+import time
+from enum import Enum
+from typing import Iterable, Iterator
 
 import typer
 
+from docktapus.commands import profiler
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.inventory import Container, Inventory
 
-def _get_containers(project_name: str | None = None) -> list[dict]:
-    """Return container details filtered by dtop labels."""
-    filter_args = ["--filter", "label=dtop.project"]
-    if project_name:
-        filter_args = ["--filter", f"label=dtop.project={project_name}"]
-
-    result = subprocess.run(
-        [
-            "docker",
-            "ps",
-            "-a",
-            *filter_args,
-            "--format",
-            "{{json .}}",
-        ],
-        capture_output=True,
-        text=True,
-    )
-    containers = []
-    for line in result.stdout.strip().splitlines():
-        if line:
-            containers.append(json.loads(line))
-    return containers
-
-
-def _get_label(labels_str: str, key: str) -> str:
-    """Extract a label value from the docker Labels string."""
-    for part in labels_str.split(","):
-        if part.strip().startswith(f"{key}="):
-            return part.strip().split("=", 1)[1]
-    return ""
+# Container events that can change a row; exec_* healthcheck noise is ignored.
+WATCH_ACTIONS = [
+    "create", "start", "restart", "die", "stop", "kill",
+    "pause", "unpause", "destroy", "rename", "oom", "health_status",
+]
+# Events arriving within this window are applied in one query and redraw.
+WATCH_DEBOUNCE = 0.1
+
+
+class OutputFormat(str, Enum):
+    table = "table"
+    json = "json"
+    ndjson = "ndjson"
+
+
+def _project_label(project_name: str | None) -> str:
+    return f"dtop.project={project_name}" if project_name else "dtop.project"
+
+
+def _sorted(containers: Iterable[Container]) -> list[Container]:
+    return sorted(containers, key=lambda c: (c.project, c.name))
+
+
+def _render(containers: Iterable[Container]) -> list[str]:
+    """Return the grouped-by-project table as a list of lines."""
+    # Group by project
+    projects: dict[str, list[Container]] = {}
+    for c in containers:
+        projects.setdefault(c.project, []).append(c)
+
+    # Column headers
+    hdr = f"{'CONTAINER ID':<15} {'SERVICE':<20} {'CONTAINER NAME':<30} {'IMAGE':<30} {'STATUS':<20} {'PORTS':<30} {'ENV':<6}"
+    sep = "-" * len(hdr)
+
+    lines = []
+    for proj_name in sorted(projects):
+        lines.extend(["", f"Project: {proj_name}", sep, hdr, sep])
+        for c in sorted(projects[proj_name], key=lambda x: x.name):
+            lines.append(
+                f"{c.id:<15} "
+                f"{c.service:<20} "
+                f"{c.name:<30} "
+                f"{c.image:<30} "
+                f"{c.status:<20} "
+                f"{c.ports:<30} "
+                f"{c.env:<6}"
+            )
+        lines.append("")
+    return lines
+
+
+def _output(
+    containers: list[Container], project_name: str | None, output_format: OutputFormat
+) -> Iterator[str]:
+    """Yield what `dtop ls` prints, one record or table line at a time."""
+    if output_format == OutputFormat.ndjson:
+        for c in containers:
+            yield json.dumps(c.to_dict()) + "\n"
+        return
+    if output_format == OutputFormat.json:
+        yield "["
+        for i, c in enumerate(containers):
+            yield ("," if i else "") + json.dumps(c.to_dict())
+        yield "]\n"
+        return
+
+    if not containers:
+        if project_name:
+            yield f"No containers found for project '{project_name}'\n"
+        else:
+            yield "No Docktapus-managed containers found\n"
+        return
+    for line in _render(containers):
+        yield line + "\n"
+
+
+def _redraw(previous: list[str], lines: list[str]) -> list[str]:
+    """Rewrite only the terminal lines that differ from what was drawn last time."""
+    out = [
+        f"\x1b[{i + 1};1H{line}\x1b[K"
+        for i, line in enumerate(lines)
+        if i >= len(previous) or previous[i] != line
+    ]
+    if len(lines) < len(previous):
+        out.append(f"\x1b[{len(lines) + 1};1H\x1b[J")
+    if out:
+        out.append(f"\x1b[{len(lines) + 1};1H")
+        typer.echo("".join(out), nl=False, color=True)
+    return lines
+
+
+def _watch(project_name: str | None):
+    """Redraw the table in place as Docker container events arrive.
+
+    Takes one full snapshot, then for each burst of events re-queries only
+    the containers those events touched.
+    """
+    client = get_client()
+    events: queue.Queue = queue.Queue()
+    since = int(time.time())
+
+    def pump():
+        try:
+            for event in client.events(
+                {
+                    "type": ["container"],
+                    "label": [_project_label(project_name)],
+                    "event": WATCH_ACTIONS,
+                },
+                since=since,
+            ):
+                events.put(event)
+        except DockerError as e:
+            events.put(e)
+
+    threading.Thread(target=pump, daemon=True).start()
+    rows = {c.id: c for c in Inventory.load(project_name).containers}
+
+    title = f"Watching {project_name or 'all projects'} (Ctrl-C to stop)"
+    empty = ["", "No Docktapus-managed containers found"]
+
+    typer.echo("\x1b[H\x1b[2J", nl=False, color=True)
+    drawn = _redraw([], [title, *(_render(rows.values()) or empty)])
+    try:
+        while True:
+            event = events.get()
+            touched = set()
+            deadline = time.monotonic() + WATCH_DEBOUNCE
+            while True:
+                if isinstance(event, DockerError):
+                    typer.echo(f"❌ {event}")
+                    raise typer.Exit(code=1)
+                if event["Action"].split(":")[0] in WATCH_ACTIONS:
+                    touched.add(event["ID"])
+                try:
+                    event = events.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if not touched:
+                continue
+
+            fresh = {
+                c.id: c for c in Inventory.load(project_name, ids=sorted(touched)).containers
+            }
+            for cid in touched:
+                if cid in fresh:
+                    rows[cid] = fresh[cid]
+                else:
+                    rows.pop(cid, None)
+            drawn = _redraw(drawn, [title, *(_render(rows.values()) or empty)])
+    except KeyboardInterrupt:
+        pass
 
 
 def ls(
     project_name: str = typer.Argument(
         None, help="Project to list (defaults to all projects)"
     ),
+    watch: bool = typer.Option(
+        False, "--watch", "-w", help="Keep the table on screen and update it live"
+    ),
+    output_format: OutputFormat = typer.Option(
+        OutputFormat.table, "--format", "-f", help="Output format: table, json or ndjson"
+    ),
 ):
     """
     List Docktapus-managed containers.
@@ -49,47 +182,38 @@ def ls(
     Shows all projects and their containers with status, ports, image,
     and whether each container is running in dev or prod mode.
 
+    With --watch the table stays on screen and is updated from the Docker
+    event stream, redrawing only the rows that changed.
+
+    --format json prints a JSON array and --format ndjson one JSON object
+    per line, each with id, name, image, state, status, ports, project,
+    service, env, labels, networks and mounts (named volumes).
+
     Usage:
-      dtop ls [PROJECT_NAME]
+      dtop ls [PROJECT_NAME] [OPTIONS]
 
     Examples:
       dtop ls
       dtop ls myproj
+      dtop ls --watch
+      dtop ls myproj --format ndjson
     """
-    containers = _get_containers(project_name)
+    if watch:
+        if output_format != OutputFormat.table:
+            typer.echo("❌ --watch only supports the table format")
+            raise typer.Exit(code=1)
+        try:
+            _watch(project_name)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+        return
 
-    if not containers:
-        if project_name:
-            typer.echo(f"No containers found for project '{project_name}'")
-        else:
-            typer.echo("No Docktapus-managed containers found")
-        raise typer.Exit()
-
-    # Group by project
-    projects: dict[str, list[dict]] = {}
-    for c in containers:
-        proj = _get_label(c.get("Labels", ""), "dtop.project")
-        projects.setdefault(proj, []).append(c)
-
-    # Column headers
-    hdr = f"{'CONTAINER ID':<15} {'SERVICE':<20} {'CONTAINER NAME':<30} {'IMAGE':<30} {'STATUS':<20} {'PORTS':<30} {'ENV':<6}"
-    sep = "-" * len(hdr)
-
-    for proj_name in sorted(projects):
-        typer.echo(f"\nProject: {proj_name}")
-        typer.echo(sep)
-        typer.echo(hdr)
-        typer.echo(sep)
-        for c in sorted(projects[proj_name], key=lambda x: x.get("Names", "")):
-            env = _get_label(c.get("Labels", ""), "dtop.env")
-            service = _get_label(c.get("Labels", ""), "com.docker.compose.service")
-            typer.echo(
-                f"{c.get('ID', ''):<15} "
-                f"{service:<20} "
-                f"{c.get('Names', ''):<30} "
-                f"{c.get('Image', ''):<30} "
-                f"{c.get('Status', ''):<20} "
-                f"{c.get('Ports', ''):<30} "
-                f"{env:<6}"
-            )
-        typer.echo("")
+    try:
+        containers = _sorted(Inventory.load(project_name).containers)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    with profiler.phase("render output"):
+        for chunk in _output(containers, project_name, output_format):
+            typer.echo(chunk, nl=False)
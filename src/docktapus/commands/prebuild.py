@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import re
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+
+import typer
+
+from docktapus.commands import profiler
+from docktapus.commands.compose_utils import (
+    _ENV_REF,
+    TEMP_COMPOSE_PREFIX,
+    compose_project_name,
+    drop_foreign_depends_on,
+    pipeline,
+    select_services,
+)
+from docktapus.commands.docker_api import get_client
+from docktapus.commands.fleet import run_commands
+from docktapus.commands.yaml_cache import dump_yaml
+
+BUILD_HASH_LABEL = "dtop.build-hash"
+MAX_HASH_WORKERS = 8
+
+_REMOTE_CONTEXT = re.compile(r"^([a-z][a-z0-9+.-]*://|git@)")
+_IMAGE_NAME_CHARS = re.compile(r"[^a-z0-9_.-]+")
+
+
+def _build_section(svc_cfg: dict) -> dict:
+    build_cfg = svc_cfg.get("build") or {}
+    return {"context": build_cfg} if isinstance(build_cfg, str) else build_cfg
+
+
+def _context_dir(build_cfg: dict, base_dir: Path) -> Path:
+    return (base_dir / Path(str(build_cfg.get("context") or ".")).expanduser()).resolve()
+
+
+def _ignore_patterns(context: Path) -> list[tuple[str, bool]]:
+    """Return .dockerignore entries as (pattern, is_exception) pairs, in file order."""
+    try:
+        lines = (context / ".dockerignore").read_text().splitlines()
+    except OSError:
+        return []
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        exception = line.startswith("!")
+        line = line.lstrip("!").strip().lstrip("/")
+        if line:
+            patterns.append((os.path.normpath(line), exception))
+    return patterns
+
+
+@lru_cache(maxsize=None)
+def _pattern_regex(pattern: str) -> re.Pattern:
+    """Translate a .dockerignore pattern to a regex the way Docker's patternmatcher does.
+
+    ``*`` and ``?`` stay within one path segment, as in Go's filepath.Match;
+    only ``**`` spans directories (``**/`` also matches no directory at all).
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "*" and pattern.startswith("**", i):
+            i += 2
+            if pattern.startswith("/", i):
+                i += 1
+            regex += ".*" if i >= len(pattern) else "(?:.*/)?"
+            continue
+        if ch == "*":
+            regex += "[^/]*"
+        elif ch == "?":
+            regex += "[^/]"
+        elif ch == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            regex += "[" + pattern[i + 1:end].replace("\\", "\\\\") + "]"
+            i = end
+        elif ch == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(ch)
+        i += 1
+    return re.compile(regex)
+
+
+def _matches(rel: str, pattern: str) -> bool:
+    """Match a path, or any directory above it, against a .dockerignore pattern."""
+    regex = _pattern_regex(pattern)
+    parts = rel.split("/")
+    return any(regex.fullmatch("/".join(parts[:i])) for i in range(1, len(parts) + 1))
+
+
+def _ignored(rel: str, patterns: list[tuple[str, bool]]) -> bool:
+    # As in Docker, the last matching pattern decides.
+    ignored = False
+    for pattern, exception in patterns:
+        if _matches(rel, pattern):
+            ignored = not exception
+    return ignored
+
+
+def _hash_tree(h, root: Path, patterns: list[tuple[str, bool]]):
+    """Feed every file Docker would send as build context into h, in a stable order."""
+    # Without exceptions an ignored directory can be skipped entirely.
+    prune = not any(exception for _, exception in patterns)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        if prune:
+            dirnames[:] = [d for d in dirnames if not _ignored(rel_dir + d, patterns)]
+        dirnames.sort()
+        # Symlinked directories aren't walked; their target is part of the content.
+        names = sorted(filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))])
+        for name in names:
+            rel = rel_dir + name
+            if _ignored(rel, patterns):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(path)
+                h.update(f"\0{rel}\0{st.st_mode & 0o111:o}\0".encode())
+                if stat.S_ISLNK(st.st_mode):
+                    h.update(os.readlink(path).encode())
+                else:
+                    with open(path, "rb") as f:
+                        for chunk in iter(lambda: f.read(1 << 20), b""):
+                            h.update(chunk)
+            except OSError:
+                h.update(f"\0unreadable:{rel}".encode())
+
+
+def _bare_args(build_cfg: dict) -> set[str]:
+    """Names of build args given without a value, which Compose takes from the environment."""
+    args = build_cfg.get("args") or {}
+    if isinstance(args, list):
+        return {a for a in args if "=" not in a}
+    return {name for name, value in args.items() if value is None}
+
+
+def build_hash(svc_cfg: dict, base_dir: Path) -> str | None:
+    """Hash everything that goes into a service's image, or None if it can't be hashed.
+
+    Covers the build section itself, the current values of the variables it
+    interpolates or passes through as bare build args, the Dockerfile and
+    every file in the build context (and local additional_contexts) that
+    .dockerignore doesn't exclude.  Remote (URL or git) contexts can't be
+    hashed locally.
+    """
+    build_cfg = _build_section(svc_cfg)
+    if _REMOTE_CONTEXT.match(str(build_cfg.get("context") or ".")):
+        return None
+    context = _context_dir(build_cfg, base_dir)
+
+    definition = json.dumps(build_cfg, sort_keys=True, default=str)
+    h = hashlib.sha256(definition.encode())
+    for name in sorted(set(_ENV_REF.findall(definition)) | _bare_args(build_cfg)):
+        h.update(f"\0{name}={os.environ.get(name)}".encode())
+
+    if "dockerfile_inline" not in build_cfg:
+        dockerfile = context / Path(build_cfg.get("dockerfile") or "Dockerfile").expanduser()
+        try:
+            h.update(b"\0" + dockerfile.read_bytes())
+        except OSError:
+            h.update(f"\0missing:{dockerfile}".encode())
+
+    _hash_tree(h, context, _ignore_patterns(context))
+
+    extra = build_cfg.get("additional_contexts") or {}
+    if isinstance(extra, list):
+        extra = dict(entry.split("=", 1) for entry in extra)
+    for name, source in sorted(extra.items()):
+        source = str(source)
+        if _REMOTE_CONTEXT.match(source) or source.startswith("service:"):
+            continue  # image, service and URL contexts are covered by the definition
+        path = (context / Path(source).expanduser()).resolve()
+        h.update(f"\0context:{name}".encode())
+        _hash_tree(h, path, _ignore_patterns(path))
+
+    return h.hexdigest()[:16]
+
+
+def image_tag(project_name: str, service_name: str, digest: str) -> str:
+    """Content-addressed tag for a pre-built image, e.g. dtop/myproj-api:3f2a..."""
+    name = _IMAGE_NAME_CHARS.sub("-", f"{project_name}-{service_name}".lower()).strip("-._")
+    return f"dtop/{name}:{digest}"
+
+
+def pin_images(compose_data: dict, images: dict[str, str], base_dir: Path) -> dict:
+    """Return compose_data with each named service pointed at its pre-built image.
+
+    The service's image becomes the content-addressed tag, so Compose uses
+    the pre-built image instead of building, and its config hash changes
+    whenever the image content does.  An image name the service already had
+    is kept as an extra build tag.  The build context is made absolute,
+    since the compose file is handed to Docker from a temp directory.
+    """
+    services = dict(compose_data.get("services") or {})
+    for name, tag in images.items():
+        svc_cfg = services[name]
+        build_cfg = _build_section(svc_cfg)
+        labels = build_cfg.get("labels") or {}
+        if isinstance(labels, list):
+            labels = dict(label.split("=", 1) for label in labels)
+        build_cfg = {
+            **build_cfg,
+            "context": str(_context_dir(build_cfg, base_dir)),
+            "labels": {**labels, BUILD_HASH_LABEL: tag.rsplit(":", 1)[1]},
+        }
+        tags = list(build_cfg.get("tags") or [])
+        if svc_cfg.get("image") and svc_cfg["image"] not in tags:
+            build_cfg["tags"] = [*tags, svc_cfg["image"]]
+        services[name] = {**svc_cfg, "image": tag, "build": build_cfg}
+    return {**compose_data, "services": services}
+
+
+def _build(compose_data: dict, services: list[str], project_name: str, jobs: int, slots):
+    """Run one `docker compose build` per service, up to `jobs` at a time (see run_commands).
+
+    Builds run in the same compose project as `up`, so services without a
+    content-addressed tag get the image name compose up will look for.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=TEMP_COMPOSE_PREFIX, suffix=".yml")
+    try:
+        with os.fdopen(fd, "w") as f:
+            dump_yaml(compose_data, f)
+        typer.echo(f"  ↳ building {', '.join(services)}")
+        compose = ["docker", "compose", "-p", compose_project_name(project_name), "-f", tmp]
+        commands = {name: [*compose, "build", "--quiet", name] for name in services}
+        run_commands(commands, "building", "built", jobs, slots)
+    finally:
+        os.unlink(tmp)
+
+
+def _image_tags(
+    compose_data: dict, services: list[str], project_name: str, base_dir: Path
+) -> dict[str, str | None]:
+    """Return {service: content-addressed tag} for the named services with a build section.
+
+    The tag is None for services whose build inputs can't be hashed.
+    """
+    defined = compose_data.get("services") or {}
+    candidates = [s for s in services if "build" in (defined.get(s) or {})]
+    if not candidates:
+        return {}
+    with profiler.phase("hash build contexts"):
+        workers = min(MAX_HASH_WORKERS, len(candidates))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = pool.map(lambda s: build_hash(defined[s], base_dir), candidates)
+            return {
+                s: image_tag(project_name, s, digest) if digest is not None else None
+                for s, digest in zip(candidates, digests)
+            }
+
+
+def _existing_tags() -> set[str]:
+    """Tags of every image dtop has pre-built, from a single image listing."""
+    return {
+        tag for image in get_client().images({"label": [BUILD_HASH_LABEL]}) for tag in image["Tags"]
+    }
+
+
+def built_images(
+    compose_data: dict, services: list[str], project_name: str, base_dir: Path
+) -> dict[str, str]:
+    """Return {service: image tag} for the named services whose pre-built image already exists.
+
+    Used without --build, so services keep running on the image an earlier
+    prebuild() tagged instead of Compose's default image name.
+    """
+    tags = _image_tags(compose_data, services, project_name, base_dir)
+    if not any(tags.values()):
+        return {}
+    existing = _existing_tags()
+    return {s: tag for s, tag in tags.items() if tag in existing}
+
+
+def prebuild(
+    compose_data: dict,
+    services: list[str],
+    project_name: str,
+    base_dir: Path,
+    jobs: int = 4,
+    slots: threading.BoundedSemaphore | None = None,
+) -> dict[str, str]:
+    """Build the images of the named services that have a build section, skipping unchanged ones.
+
+    Each service's build inputs are hashed (see build_hash) and its image is
+    tagged with that hash, so a service whose tagged image already exists is
+    not rebuilt.  Existing images are found with a single listing and the
+    rest are built concurrently, sharing ``slots`` with other compose runs.
+
+    Services with a remote build context can't be hashed, so they are built
+    every time with a plain `docker compose build`, alongside the rest.
+
+    Returns {service: image tag} for the services to start with pin_images();
+    the remote-context services are left out, their images already built.
+    Raises CalledProcessError if a build fails.
+    """
+    tags = _image_tags(compose_data, services, project_name, base_dir)
+    images = {s: tag for s, tag in tags.items() if tag is not None}
+    unhashed = [s for s, tag in tags.items() if tag is None]
+
+    existing = _existing_tags() if images else set()
+    stale = [s for s, tag in images.items() if tag not in existing]
+    current = [s for s in images if s not in stale]
+    if current:
+        typer.echo(f"  ↳ images up to date: {', '.join(current)}")
+    if stale or unhashed:
+        transform = pipeline(
+            partial(select_services, names=stale + unhashed),
+            drop_foreign_depends_on,
+            partial(pin_images, images={s: images[s] for s in stale}, base_dir=base_dir),
+        )
+        with profiler.phase("build images"):
+            _build(transform(compose_data), stale + unhashed, project_name, jobs, slots)
+    return images
@@ -0,0 +1,182 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import typer
+
+# Docker CLI commands whose first argument is itself a subcommand.
+_COMMAND_GROUPS = {"compose", "container", "image", "network", "system", "volume"}
+# Options whose value is a separate argument, so it isn't mistaken for a subcommand.
+_OPTIONS_WITH_VALUES = {
+    "-f", "--file", "-t", "--time", "--filter", "--format", "--label", "--driver",
+    "--since", "--until",
+}
+# How many of the slowest external calls the summary lists individually.
+SUMMARY_CALLS = 15
+
+_enabled = False
+_origin = 0.0
+_spans: list[tuple[str, str, float, float, int, dict]] = []
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    """Start recording phases and external calls for this invocation."""
+    global _enabled, _origin
+    _enabled = True
+    _origin = time.perf_counter()
+    _spans.clear()
+
+
+def record(name: str, category: str, start: float, duration: float, **args):
+    """Record a finished span; start is a time.perf_counter() value."""
+    if _enabled:
+        _spans.append((name, category, start, duration, threading.get_ident(), args))
+
+
+@contextmanager
+def phase(name: str, **args) -> Iterator[None]:
+    """Time the enclosed block as a named phase (free when profiling is off)."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, "phase", start, time.perf_counter() - start, **args)
+
+
+def command_name(argv: list[str]) -> str:
+    """Shorten a docker argv to its command, e.g. "docker compose up"."""
+    words = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg.startswith("-"):
+            skip = arg in _OPTIONS_WITH_VALUES
+            continue
+        words.append(Path(arg).name if not words else arg)
+        if len(words) == 3 or (len(words) == 2 and arg not in _COMMAND_GROUPS):
+            break
+    return " ".join(words)
+
+
+class TracedPopen(subprocess.Popen):
+    """Popen that records its argv, duration and exit code once it has been waited on."""
+
+    def __init__(self, args: list[str], **kwargs):
+        self._started = time.perf_counter()
+        self._traced = False
+        super().__init__(args, **kwargs)
+
+    def wait(self, timeout=None):
+        returncode = super().wait(timeout)
+        if not self._traced:
+            self._traced = True
+            record(
+                command_name(self.args),
+                "subprocess",
+                self._started,
+                time.perf_counter() - self._started,
+                argv=list(self.args),
+                exit_code=returncode,
+            )
+        return returncode
+
+
+def run(args: list[str], **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run() that records argv, duration and exit code when profiling."""
+    if not _enabled:
+        return subprocess.run(args, **kwargs)
+    start = time.perf_counter()
+    returncode = None
+    try:
+        result = subprocess.run(args, **kwargs)
+        returncode = result.returncode
+        return result
+    finally:
+        record(
+            command_name(args),
+            "subprocess",
+            start,
+            time.perf_counter() - start,
+            argv=list(args),
+            exit_code=returncode,
+        )
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def print_summary():
+    """Print per-phase totals and the slowest external calls to stderr."""
+    total = time.perf_counter() - _origin
+
+    def echo(line: str = ""):
+        typer.echo(line, err=True)
+
+    phases: dict[str, list[float]] = {}
+    calls = []
+    for name, category, _, duration, _, args in _spans:
+        if category == "phase":
+            phases.setdefault(name, []).append(duration)
+        else:
+            calls.append((duration, category, name, args))
+
+    echo()
+    echo(f"Profile: {_ms(total)} ms total")
+    if phases:
+        width = max(len(name) for name in phases)
+        echo(f"  {'PHASE':<{width}}  {'CALLS':>5}  {'TOTAL MS':>10}  {'MAX MS':>10}")
+        for name, durations in sorted(phases.items(), key=lambda p: -sum(p[1])):
+            echo(
+                f"  {name:<{width}}  {len(durations):>5}  "
+                f"{_ms(sum(durations)):>10}  {_ms(max(durations)):>10}"
+            )
+
+    if calls:
+        by_category: dict[str, list[float]] = {}
+        for duration, category, _, _ in calls:
+            by_category.setdefault(category, []).append(duration)
+        echo()
+        for category, durations in sorted(by_category.items()):
+            echo(f"  {category}: {len(durations)} call(s), {_ms(sum(durations))} ms")
+        echo(f"  {'MS':>10}  {'EXIT':>5}  CALL")
+        for duration, category, name, args in sorted(calls, key=lambda c: -c[0])[:SUMMARY_CALLS]:
+            status = args.get("exit_code", args.get("status"))
+            detail = " ".join(args["argv"]) if "argv" in args else name
+            if len(detail) > 100:
+                detail = detail[:97] + "..."
+            echo(f"  {_ms(duration):>10}  {'' if status is None else status:>5}  {detail}")
+
+
+def write_trace(path: Path):
+    """Write every recorded span as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    events = [
+        {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - _origin) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": pid,
+            "tid": tid,
+            "args": args,
+        }
+        for name, category, start, duration, tid, args in _spans
+    ]
+    path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+    typer.echo(f"Trace written to {path}", err=True)
@@ -0,0 +1,173 @@
+import os
+import re
+import subprocess
+import threading
+from pathlib import Path
+
+import typer
+
+from docktapus.commands import profiler
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.fleet import run_commands
+from docktapus.commands.registry import OCT_CONFIG, open_registry
+from docktapus.commands.yaml_cache import load_yaml
+
+# $VAR, ${VAR}, ${VAR:-default} and ${VAR-default}, as Compose interpolates them.
+_VARIABLE = re.compile(
+    r"\$(?:\{(?P<braced>[A-Za-z_][A-Za-z0-9_]*)(?:(?P<op>:?-)(?P<default>[^}]*))?\}"
+    r"|(?P<bare>[A-Za-z_][A-Za-z0-9_]*))"
+)
+_DOCKER_HUB = ("docker.io/", "index.docker.io/")
+
+
+def _interpolate(value: str) -> str | None:
+    """Substitute environment variables into value; None if one is unset without a default."""
+    unresolved = False
+
+    def substitute(match: re.Match) -> str:
+        nonlocal unresolved
+        name = match.group("braced") or match.group("bare")
+        current = os.environ.get(name)
+        if current is None or (current == "" and match.group("op") == ":-"):
+            if match.group("op") is None:
+                unresolved = True
+                return ""
+            return match.group("default")
+        return current
+
+    result = _VARIABLE.sub(substitute, value.replace("$$", "\0")).replace("\0", "$")
+    return None if unresolved else result
+
+
+def familiar(ref: str) -> str:
+    """Normalise an image reference to the form `docker image ls` prints, e.g. redis:latest."""
+    name, at, digest = ref.partition("@")
+    for prefix in _DOCKER_HUB:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            if name.startswith("library/") and name.count("/") == 1:
+                name = name[len("library/"):]
+    if not at and ":" not in name.rsplit("/", 1)[-1]:
+        name += ":latest"
+    return f"{name}{at}{digest}"
+
+
+def _repository(ref: str) -> str:
+    name = ref.partition("@")[0]
+    last = name.rsplit("/", 1)[-1]
+    return name[: len(name) - len(last)] + last.partition(":")[0]
+
+
+def service_images(compose_data: dict, services: list[str] | None = None) -> set[str]:
+    """Image references the named services (default: all) run, in familiar form.
+
+    Services with a build section are built rather than pulled, and images
+    that refer to unset variables are left for Compose to resolve.
+    """
+    defined = compose_data.get("services") or {}
+    refs = set()
+    for name in defined if services is None else services:
+        svc_cfg = defined.get(name) or {}
+        if "build" in svc_cfg or not svc_cfg.get("image"):
+            continue
+        ref = _interpolate(str(svc_cfg["image"]))
+        if ref:
+            refs.add(familiar(ref))
+    return refs
+
+
+def missing_images(refs: set[str]) -> list[str]:
+    """Return the references that aren't present locally, found with a single image query."""
+    if not refs:
+        return []
+    with profiler.phase("find local images"):
+        rows = get_client().images({"reference": sorted({_repository(r) for r in refs})})
+    present = {ref for row in rows for ref in row["Tags"] + row["Digests"]}
+    return sorted(r for r in refs if r not in present)
+
+
+def pull_missing(
+    refs: set[str], jobs: int = 4, slots: threading.BoundedSemaphore | None = None
+) -> list[str]:
+    """Pull every image in refs that isn't present yet, up to `jobs` at a time.
+
+    Progress and failures are reported by run_commands().  Returns the
+    references that were pulled.
+    """
+    missing = missing_images(refs)
+    if not missing:
+        if refs:
+            typer.echo(f"  ↳ images present: {len(refs)}")
+        return []
+    typer.echo(f"  ↳ pulling {len(missing)} image(s), {len(refs) - len(missing)} present")
+    commands = {ref: ["docker", "pull", "--quiet", ref] for ref in missing}
+    with profiler.phase("pull images", images=len(missing)):
+        run_commands(commands, "pulling", "pulled", jobs, slots)
+    return missing
+
+
+def pull(
+    project_names: list[str] = typer.Argument(
+        None, help="Projects to pull images for (defaults to current folder name)"
+    ),
+    all_projects: bool = typer.Option(
+        False, "--all-projects", help="Pull images for every registered project"
+    ),
+    config_path: Path = typer.Option(
+        None, "-conf", "--config-file-path", help="Path to .dtop.yml config file"
+    ),
+    jobs: int = typer.Option(
+        4, "--jobs", "-j", min=1, help="Maximum concurrent pulls"
+    ),
+):
+    """
+    Pull the images a project's services run, ahead of `dtop up`.
+
+    Collects the images of every service in both the dev and prod compose
+    files, checks which are already present with a single image query,
+    and pulls the rest concurrently (up to --jobs at once).  An image used
+    by several services or projects is pulled once.  Services with a
+    build section are skipped; see `dtop up --build`.
+
+    Usage:
+      dtop pull [PROJECT_NAME...] [OPTIONS]
+
+    Examples:
+      dtop pull myproj
+      dtop pull --all-projects --jobs 8
+    """
+    registry = open_registry(config_path)
+    if not registry.exists():
+        typer.echo(f"❌ Config file not found: {config_path or OCT_CONFIG}")
+        raise typer.Exit(code=1)
+
+    if all_projects:
+        project_names = registry.names()
+        if not project_names:
+            typer.echo(f"No projects registered in {registry.projects_dir}")
+            raise typer.Exit()
+    elif not project_names:
+        project_names = [Path.cwd().name]
+
+    refs = set()
+    with profiler.phase("load compose files"):
+        for project_name in project_names:
+            project = registry.get(project_name)
+            if project is None:
+                typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
+                raise typer.Exit(code=1)
+            for compose_path in project["compose"].values():
+                refs |= service_images(load_yaml(compose_path) or {})
+
+    if not refs:
+        typer.echo("No images to pull")
+        return
+    try:
+        pulled = pull_missing(refs, jobs)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    except subprocess.CalledProcessError as e:
+        typer.echo(f"❌ docker pull exited with status {e.returncode}")
+        raise typer.Exit(code=e.returncode)
+    typer.echo(f"Pulled {len(pulled)} image(s)" if pulled else "All images are present")
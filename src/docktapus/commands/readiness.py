@@ -0,0 +1,168 @@
+import queue
+import socket
+import threading
+import time
+from typing import Callable
+
+from docktapus.commands import profiler
+from docktapus.commands.docker_api import DockerError, get_client
+
+# Container events that change whether a container is (or can become) ready.
+READY_ACTIONS = ["start", "die", "destroy", "health_status"]
+# Seconds between TCP probes of containers that have no healthcheck.
+PROBE_INTERVAL = 0.25
+PROBE_TIMEOUT = 0.2
+
+
+class NotReadyError(Exception):
+    """Raised when a container fails, turns unhealthy or isn't ready in time."""
+
+
+def _accepts_tcp(info: dict) -> bool:
+    """Return True once one of the container's TCPAddresses accepts a connection.
+
+    A refused connection means nothing listens yet.  Any other failure
+    means the address can't be reached from here at all, as container IPs
+    can't from outside Docker Desktop's VM, so it is dropped; a container
+    left with no address to try is taken as ready once it runs.
+    """
+    addresses = info["TCPAddresses"]
+    for address in list(addresses):
+        try:
+            with socket.create_connection(address, timeout=PROBE_TIMEOUT):
+                return True
+        except ConnectionRefusedError:
+            continue
+        except OSError:
+            addresses.remove(address)
+    return not addresses
+
+
+def _check(info: dict) -> bool:
+    """Return True once a container is ready; raise NotReadyError if it never will be."""
+    if info["State"] == "removed":
+        raise NotReadyError(f"{info['Name']} was removed")
+    if info["State"] in ("exited", "dead", "removing"):
+        # A one-shot service that ran to completion is as ready as it gets.
+        if info["State"] == "exited" and info["ExitCode"] == 0:
+            return True
+        raise NotReadyError(f"{info['Name']} exited with code {info['ExitCode']}")
+    if info["Health"] == "unhealthy":
+        raise NotReadyError(f"{info['Name']} is unhealthy")
+    if info["Health"] is not None:
+        return info["Health"] == "healthy"
+    if info["State"] != "running":
+        return False
+    # No healthcheck: wait for a listening port, if there is one to try.
+    return not info["TCPAddresses"] or _accepts_tcp(info)
+
+
+def _completed(info: dict) -> bool:
+    """Return True once a container has exited 0; raise NotReadyError on any other exit."""
+    return info["State"] in ("exited", "dead", "removing", "removed") and _check(info)
+
+
+def wait_ready(
+    ids: list[str],
+    timeout: float | None,
+    on_ready: Callable[[dict], None] | None = None,
+    check: Callable[[dict], bool] = _check,
+    cancel: threading.Event | None = None,
+):
+    """Block until every container is ready, calling on_ready(info) for each in turn.
+
+    A container with a healthcheck is ready once Docker reports it healthy.
+    Health changes are followed on the event stream, so this returns as
+    soon as the last container turns healthy rather than on a poll tick.
+    A container without a healthcheck is ready once it runs and accepts a
+    TCP connection on one of its published ports, or its exposed ports if
+    none are published (immediately, if it has none or none of them can be
+    reached from here), and one that has already exited 0 is finished.
+    ``check`` replaces that test, e.g. with _completed.
+
+    Raises NotReadyError if a container fails or turns unhealthy, if
+    ``cancel`` is set, or when ``timeout`` seconds (if any) pass first.
+    """
+    if not ids:
+        return
+    client = get_client()
+    started = time.time()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    events: queue.Queue = queue.Queue()
+
+    # Follow events from before the first inspect, so no transition is lost.
+    # The stream ends on its own at the deadline.
+    def pump():
+        try:
+            for event in client.events(
+                {"type": ["container"], "container": list(ids), "event": READY_ACTIONS},
+                since=started,
+                until=started + timeout if timeout is not None else None,
+            ):
+                events.put(event)
+        except DockerError as e:
+            events.put(e)
+
+    threading.Thread(target=pump, daemon=True).start()
+
+    with profiler.phase("wait for readiness", containers=len(ids)):
+        try:
+            pending = {info["ID"]: info for info in client.inspect_containers(list(ids))}
+        except DockerError as e:
+            raise NotReadyError(str(e))
+
+        while True:
+            for cid, info in list(pending.items()):
+                if check(info):
+                    del pending[cid]
+                    if on_ready is not None:
+                        on_ready(info)
+            if not pending:
+                return
+            if cancel is not None and cancel.is_set():
+                raise NotReadyError("cancelled")
+
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                names = ", ".join(sorted(info["Name"] for info in pending.values()))
+                raise NotReadyError(f"timed out after {timeout:g}s waiting for {names}")
+            probing = cancel is not None or any(
+                info["Health"] is None for info in pending.values()
+            )
+            if probing:
+                remaining = PROBE_INTERVAL if remaining is None else min(remaining, PROBE_INTERVAL)
+            try:
+                event = events.get(timeout=remaining)
+            except queue.Empty:
+                continue
+
+            if isinstance(event, DockerError):
+                raise NotReadyError(str(event))
+            info = pending.get(event["ID"])
+            if info is None:
+                continue
+            action, _, detail = event["Action"].partition(":")
+            if action == "health_status":
+                info["Health"] = detail.strip()
+            elif action == "start":
+                info["State"] = "running"
+            elif action == "die":
+                info["State"] = "exited"
+                info["ExitCode"] = int(event["Attributes"].get("exitCode", 0))
+            else:
+                # Removed before a die told us how it exited; its last
+                # ExitCode is stale.
+                info["State"] = "removed"
+
+
+def wait_completed(
+    ids: list[str],
+    on_done: Callable[[dict], None] | None = None,
+    cancel: threading.Event | None = None,
+):
+    """Block until every container has exited 0, as service_completed_successfully requires.
+
+    Like Compose there is no timeout; raises NotReadyError as soon as one
+    exits with another code, or if ``cancel`` is set.
+    """
+    wait_ready(ids, None, on_done, check=_completed, cancel=cancel)
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import quote, unquote
+
+import typer
+
+from docktapus.commands import profiler
+from docktapus.commands.yaml_cache import dump_yaml, load_yaml
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+OCT_CONFIG = Path.home() / ".dtop.yml"
+
+_IMPORT_STATE = ".legacy-import.json"
+
+
+@contextmanager
+def _flock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on path for the duration of the block."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _atomic_write(path: Path, data: dict):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            dump_yaml(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Registry:
+    """Project registry stored as one YAML file per project.
+
+    Lives in <config>.d/projects/ next to the legacy config file, so
+    ~/.dtop.yml maps to ~/.dtop.d/.  Looking up a project reads only its own
+    file, every write goes through a temp file and an atomic rename, and
+    read-modify-write updates hold a lock for that project alone.
+    """
+
+    def __init__(self, root: Path, legacy_config: Path | None = None):
+        self.root = root
+        self.projects_dir = root / "projects"
+        self.legacy_config = legacy_config
+
+    def _path(self, name: str) -> Path:
+        return self.projects_dir / f"{quote(name, safe='')}.yml"
+
+    def exists(self) -> bool:
+        return self.projects_dir.is_dir()
+
+    def names(self) -> list[str]:
+        if not self.exists():
+            return []
+        return sorted(unquote(p.stem) for p in self.projects_dir.glob("*.yml"))
+
+    def get(self, name: str) -> dict | None:
+        """Return a project's settings, or None if it isn't registered."""
+        try:
+            return load_yaml(self._path(name)) or {}
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[None]:
+        with _flock(self.projects_dir / f".{quote(name, safe='')}.lock"):
+            yield
+
+    def put(self, name: str, project: dict):
+        """Write a project's settings atomically.  Callers should hold lock(name)."""
+        self.projects_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self._path(name), project)
+
+    @contextmanager
+    def edit(self, name: str) -> Iterator[dict | None]:
+        """Lock a project and yield its settings; they are saved if the block succeeds.
+
+        Yields None (and writes nothing) when the project doesn't exist.
+        """
+        with self.lock(name):
+            project = self.get(name)
+            yield project
+            if project is not None:
+                self.put(name, project)
+
+    def import_legacy(self) -> list[str]:
+        """Import projects from the legacy single-file config.
+
+        Runs whenever the legacy file has changed since the last import and
+        only rewrites projects whose entry in it changed, so edits made
+        through the registry aren't clobbered by stale legacy entries.
+        Returns the names of the projects imported.
+        """
+        legacy = self.legacy_config
+        if legacy is None or not legacy.is_file():
+            return []
+
+        state_path = self.root / _IMPORT_STATE
+        st = legacy.stat()
+        stamp = [st.st_mtime_ns, st.st_size]
+
+        def read_state() -> dict:
+            try:
+                return json.loads(state_path.read_text())
+            except (OSError, ValueError):
+                return {}
+
+        if read_state().get("stamp") == stamp:
+            return []
+
+        imported = []
+        with _flock(self.root / ".legacy-import.lock"):
+            # Another process may have finished the import while we waited.
+            state = read_state()
+            if state.get("stamp") == stamp:
+                return []
+            config = load_yaml(legacy) or {}
+            digests = state.get("digests", {})
+            for name, project in (config.get("projects") or {}).items():
+                digest = hashlib.sha256(
+                    json.dumps(project, sort_keys=True, default=str).encode()
+                ).hexdigest()
+                if digests.get(name) == digest and self._path(name).exists():
+                    continue
+                with self.lock(name):
+                    self.put(name, project)
+                digests[name] = digest
+                imported.append(name)
+            state_path.write_text(json.dumps({"stamp": stamp, "digests": digests}))
+        return imported
+
+
+def open_registry(config_path: Path | None) -> Registry:
+    """Return the registry for a -conf value, importing legacy YAML projects if needed.
+
+    config_path may be a legacy .yml config file (its registry lives in the
+    sibling <name>.d directory) or a registry directory.  Without it the
+    default ~/.dtop.yml / ~/.dtop.d pair is used.
+    """
+    if not config_path:
+        typer.echo(f"Using default config path {OCT_CONFIG}")
+        config_path = OCT_CONFIG
+    config_path = config_path.expanduser()
+
+    if config_path.is_dir():
+        registry = Registry(config_path)
+    else:
+        registry = Registry(config_path.with_suffix(".d"), legacy_config=config_path)
+
+    with profiler.phase("import legacy config"):
+        imported = registry.import_legacy()
+    if imported:
+        typer.echo(
+            f"Imported {len(imported)} project(s) from {config_path} into {registry.projects_dir}"
+        )
+    return registry
@@ -0,0 +1,201 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
+
+# A node in the service graph: (env, service_name), e.g. ("prod", "db").
+Node = tuple[str, str]
+
+
+class DependencyCycleError(Exception):
+    """Raised when depends_on entries form a cycle that can't be scheduled."""
+
+
+def depends_on(svc_cfg: dict) -> dict[str, str]:
+    """Return {dependency: condition} for a service, normalising list-style depends_on."""
+    deps = (svc_cfg or {}).get("depends_on") or {}
+    if isinstance(deps, list):
+        return {d: "service_started" for d in deps}
+    return {
+        name: (cfg or {}).get("condition", "service_started")
+        for name, cfg in deps.items()
+    }
+
+
+def dependency_closure(
+    services: dict[str, dict], roots: list[str], exclude: set[str] = frozenset()
+) -> list[str]:
+    """Return roots plus everything they transitively depend on, in discovery order.
+
+    ``services`` maps each service name to the definition that would run
+    (prod and dev merged).  Excluded services are left out along with
+    whatever only they needed; unknown dependencies are ignored.
+    """
+    seen = set()
+    order = []
+    pending = [name for name in roots if name not in exclude]
+    while pending:
+        name = pending.pop(0)
+        if name in seen or name not in services:
+            continue
+        seen.add(name)
+        order.append(name)
+        pending.extend(d for d in depends_on(services[name]) if d not in exclude)
+    return order
+
+
+def build_service_graph(
+    composes: dict[str, dict],
+    selected: dict[str, list[str]],
+    exclude: set[str] = frozenset(),
+) -> tuple[dict[Node, set[Node]], dict[tuple[Node, Node], str]]:
+    """Build one dependency graph spanning every env's compose file.
+
+    A dependency resolves to whichever env is already starting that service
+    name, so a prod service that depends on a service swapped to dev waits
+    for the dev container.  Dependencies nobody selected are pulled in from
+    the dependent's own compose file first, then from any other env, and are
+    appended to ``selected`` so the caller starts them too, unless they are
+    in ``exclude``, in which case the edge is dropped.
+
+    Returns the graph ({node: dependencies}) and the condition of every edge
+    that waits for more than its dependency starting, as
+    {(dependent, dependency): condition}.
+    """
+    services = {env: (data.get("services") or {}) for env, data in composes.items()}
+    owner = {}
+    for env, names in selected.items():
+        for name in names:
+            owner.setdefault(name, env)
+
+    graph: dict[Node, set[Node]] = {}
+    gates: dict[tuple[Node, Node], str] = {}
+    pending = [(env, name) for env, names in selected.items() for name in names]
+
+    while pending:
+        node = pending.pop()
+        if node in graph:
+            continue
+        env, name = node
+        graph[node] = set()
+        for dep, condition in depends_on(services[env].get(name)).items():
+            if dep in exclude:
+                continue
+            dep_env = owner.get(dep)
+            if dep_env is None:
+                candidates = [env, *(e for e in services if e != env)]
+                dep_env = next((e for e in candidates if dep in services[e]), None)
+                if dep_env is None:
+                    continue
+                owner[dep] = dep_env
+                selected.setdefault(dep_env, []).append(dep)
+            dep_node = (dep_env, dep)
+            graph[node].add(dep_node)
+            if condition != "service_started":
+                gates[(node, dep_node)] = condition
+            pending.append(dep_node)
+
+    return graph, gates
+
+
+def compose_runs(graph: dict[Node, set[Node]]) -> dict[Node, int]:
+    """Assign every node the stage of the compose run that starts it.
+
+    Compose orders services within one run itself, so a dependency in the
+    same env never needs a run of its own: a node's stage is that of its
+    latest dependency, plus one if that dependency lives in the other env.
+    The services of one env and stage form a single run, and every run
+    only depends on runs of earlier stages.
+
+    Raises DependencyCycleError if depends_on entries form a cycle.
+    """
+    stages: dict[Node, int] = {}
+    remaining = {node: deps & graph.keys() for node, deps in graph.items()}
+    while remaining:
+        ready = [node for node, deps in remaining.items() if deps <= stages.keys()]
+        if not ready:
+            cycle = ", ".join(f"{env}:{name}" for env, name in sorted(remaining))
+            raise DependencyCycleError(f"Dependency cycle between: {cycle}")
+        for node in ready:
+            stages[node] = max(
+                (stages[dep] + (dep[0] != node[0]) for dep in remaining.pop(node)),
+                default=0,
+            )
+    return stages
+
+
+def run_service_graph(
+    graph: dict[Node, set[Node]],
+    launch: Callable[[str, list[str], threading.Event], None],
+    jobs: int = 4,
+):
+    """Start every node once its dependencies have started, `jobs` launches at a time.
+
+    Nodes are grouped into compose runs by compose_runs(), and each run is
+    handed to a single launch(env, services, cancel) call once the runs
+    holding its dependencies have returned.  A graph that stays within one
+    env is started by one launch.  If any launch raises, ``cancel`` is set
+    so in-flight launches can abort, nothing new is scheduled and the error
+    is re-raised once the running launches have returned.
+    """
+    stages = compose_runs(graph)
+    runs: dict[tuple[str, int], list[str]] = {}
+    for env, name in sorted(graph):
+        runs.setdefault((env, stages[(env, name)]), []).append(name)
+    remaining = {
+        run: {
+            (dep[0], stages[dep])
+            for name in names
+            for dep in graph[(run[0], name)]
+            if dep in stages
+        }
+        - {run}
+        for run, names in runs.items()
+    }
+    done: set[tuple[str, int]] = set()
+    running = {}
+    cancel = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while remaining or running:
+            for run in sorted(remaining, key=lambda run: run[1]):
+                if len(running) >= jobs:
+                    break
+                if remaining[run] <= done:
+                    del remaining[run]
+                    running[pool.submit(launch, run[0], runs[run], cancel)] = run
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                run = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    cancel.set()
+                    for other in running:
+                        other.cancel()
+                    wait(running)
+                    raise error
+                done.add(run)
+
+
+def shutdown_tiers(graph: dict[Node, set[Node]]) -> list[list[Node]]:
+    """Group nodes into tiers to stop in order, dependents before their dependencies.
+
+    The first tier holds nodes nothing depends on, and every later tier only
+    nodes whose dependents were all in earlier tiers, so each tier can be
+    stopped in parallel.  Nodes caught in a cycle share the final tier.
+    """
+    dependents: dict[Node, set[Node]] = {node: set() for node in graph}
+    for node, deps in graph.items():
+        for dep in deps:
+            if dep in dependents:
+                dependents[dep].add(node)
+
+    tiers = []
+    remaining = set(graph)
+    while remaining:
+        tier = sorted(node for node in remaining if not dependents[node] & remaining)
+        if not tier:
+            tier = sorted(remaining)
+        tiers.append(tier)
+        remaining.difference_update(tier)
+    return tiers
@@ -0,0 +1,191 @@
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import typer
+
+from docktapus.commands import daemon
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.inventory import PROJECT_LABEL, Container
+from docktapus.commands.ls import WATCH_ACTIONS, OutputFormat, _output, _sorted
+
+# Seconds to wait before reconnecting a lost event stream.
+RECONNECT_DELAY = 1.0
+EVENT_FILTERS = {"type": ["container"], "label": [PROJECT_LABEL], "event": WATCH_ACTIONS}
+
+
+class LiveInventory:
+    """Rows for every dtop-labelled container, kept current from Docker events.
+
+    One full listing seeds the rows; after that a background thread follows
+    the event stream and re-queries only the containers each event touches.
+    Before answering, catch_up() replays any events up to the present, so a
+    client never sees state older than its own request.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.rows: dict[str, dict] = {}
+        self.synced = 0.0
+        self._lock = threading.Lock()
+
+    def resync(self):
+        with self._lock:
+            now = time.time()
+            self.rows = {row["ID"]: row for row in self.client.containers({"label": [PROJECT_LABEL]})}
+            self.synced = now
+
+    def _refresh(self, ids: set[str]):
+        fresh = {
+            row["ID"]: row
+            for row in self.client.containers({"label": [PROJECT_LABEL], "id": sorted(ids)})
+        }
+        self.rows.update(fresh)
+        for cid in ids - fresh.keys():
+            self.rows.pop(cid, None)
+
+    def _touched(self, events) -> set[str]:
+        return {e["ID"] for e in events if e["Action"].split(":")[0] in WATCH_ACTIONS}
+
+    def catch_up(self):
+        with self._lock:
+            now = time.time()
+            touched = self._touched(self.client.events(EVENT_FILTERS, since=self.synced, until=now))
+            if touched:
+                self._refresh(touched)
+            self.synced = now
+
+    def follow(self):
+        """Apply events as they arrive, resyncing whenever the stream drops."""
+        while True:
+            try:
+                for event in self.client.events(EVENT_FILTERS, since=self.synced):
+                    touched = self._touched([event])
+                    if touched:
+                        with self._lock:
+                            self._refresh(touched)
+            except DockerError:
+                pass
+            time.sleep(RECONNECT_DELAY)
+            try:
+                self.resync()
+            except DockerError:
+                continue
+
+    def query(self, project_name: str | None, all: bool, ids: list[str] | None) -> list[dict]:
+        with self._lock:
+            rows = list(self.rows.values())
+        return [
+            row
+            for row in rows
+            if (project_name is None or row["Labels"].get(PROJECT_LABEL) == project_name)
+            and (all or row["State"] == "running")
+            and (not ids or any(row["ID"].startswith(i) or i.startswith(row["ID"]) for i in ids))
+        ]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            reply = self.server.answer(json.loads(self.rfile.readline()))
+        except DockerError as e:
+            reply = {"ok": False, "error": str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            reply = {"ok": False, "error": f"bad request: {e}"}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, inventory: LiveInventory):
+        self.inventory = inventory
+        self.docker_host = os.environ.get("DOCKER_HOST", "")
+        super().__init__(path, _Handler)
+
+    def answer(self, req: dict) -> dict:
+        if req.get("docker_host", "") != self.docker_host:
+            return {"ok": False, "error": "daemon serves a different DOCKER_HOST"}
+        op = req.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "containers": len(self.inventory.rows)}
+
+        self.inventory.catch_up()
+        project_name = req.get("project")
+        if op == "containers":
+            rows = self.inventory.query(project_name, req.get("all", True), req.get("ids"))
+            return {"ok": True, "containers": rows}
+        if op == "ls":
+            rows = self.inventory.query(project_name, True, None)
+            containers = _sorted(Container.from_row(row) for row in rows)
+            output = "".join(_output(containers, project_name, OutputFormat(req["format"])))
+            return {"ok": True, "output": output}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+
+def serve(
+    socket_path: Path = typer.Option(
+        None,
+        "--socket",
+        help="Unix socket to listen on (defaults to $XDG_RUNTIME_DIR/docktapus.sock)",
+    ),
+):
+    """
+    Run a resident daemon that keeps Docker state warm for other dtop commands.
+
+    Lists dtop-labelled containers once, then keeps that inventory current
+    from the Docker event stream and serves it over a local unix socket.
+    While it runs, `dtop ls` prints straight from the daemon without
+    loading the full CLI, and up, down and swap detect running services
+    without listing containers.  Commands fall back to querying Docker
+    directly whenever the daemon isn't running or can't answer; set
+    DTOP_NO_DAEMON=1 to bypass it.
+
+    Runs in the foreground until interrupted.
+
+    Usage:
+      dtop serve [OPTIONS]
+
+    Examples:
+      dtop serve &
+      dtop serve --socket /tmp/dtop.sock
+    """
+    path = str(socket_path) if socket_path else daemon.socket_path()
+    if daemon.request({"op": "ping"}, path) is not None:
+        typer.echo(f"❌ A dtop daemon is already listening on {path}")
+        raise typer.Exit(code=1)
+
+    # The daemon's own inventory queries must go to Docker, not to itself.
+    os.environ["DTOP_NO_DAEMON"] = "1"
+    inventory = LiveInventory(get_client())
+    try:
+        inventory.resync()
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    threading.Thread(target=inventory.follow, daemon=True).start()
+
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    umask = os.umask(0o177)
+    try:
+        server = _Server(path, inventory)
+    finally:
+        os.umask(umask)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    typer.echo(f"Listening on {path} ({len(inventory.rows)} container(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,249 @@
+import subprocess
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+import typer
+
+from docktapus.commands import profiler
+from docktapus.commands.compose_utils import (
+    drop_foreign_depends_on,
+    pipeline,
+    prepare_compose,
+    select_services,
+    stamp_config_hash,
+)
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.inventory import Inventory
+from docktapus.commands.prebuild import built_images, pin_images
+from docktapus.commands.registry import OCT_CONFIG, Registry, open_registry
+from docktapus.commands.up import _compose_up, _inject_labels
+from docktapus.commands.yaml_cache import load_yaml
+
+# Envs are started in this order on restore, so prod dependencies come up first.
+ENVS = ("prod", "dev")
+
+app = typer.Typer(
+    add_completion=False,
+    no_args_is_help=True,
+    help="Save and restore which services of a project run as dev or prod.",
+)
+
+_PROJECT = typer.Argument(None, help="Project name (defaults to current folder name)")
+_CONFIG = typer.Option(None, "-conf", "--config-file-path", help="Path to .dtop.yml config file")
+
+
+def _open(config_path: Path | None, project_name: str | None) -> tuple[Registry, str, dict]:
+    """Open the registry and return it with the project's name and entry, or exit."""
+    project_name = project_name or Path.cwd().name
+    registry = open_registry(config_path)
+    if not registry.exists():
+        typer.echo(f"❌ Config file not found: {config_path or OCT_CONFIG}")
+        raise typer.Exit(code=1)
+    project = registry.get(project_name)
+    if project is None:
+        typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
+        raise typer.Exit(code=1)
+    return registry, project_name, project
+
+
+def _layout(inventory: Inventory, project_name: str) -> dict[str, str]:
+    """Return {service: env} for every service with a running container."""
+    layout = {}
+    for c in inventory.project(project_name):
+        if c.running and c.service and c.env:
+            layout.setdefault(c.service, c.env)
+    return dict(sorted(layout.items()))
+
+
+def _snapshot(project: dict, project_name: str, name: str) -> dict:
+    snapshot = (project.get("snapshots") or {}).get(name)
+    if snapshot is None:
+        typer.echo(f"❌ No snapshot '{name}' for project '{project_name}'")
+        raise typer.Exit(code=1)
+    return snapshot
+
+
+@app.command("save")
+def save(
+    name: str = typer.Argument(..., help="Snapshot name"),
+    project_name: str = _PROJECT,
+    config_path: Path = _CONFIG,
+    force: bool = typer.Option(False, "--force", help="Overwrite an existing snapshot"),
+):
+    """
+    Record which env each running service of a project runs as.
+
+    The layout is read from the dtop.env labels of the running containers
+    and stored under NAME in the project's registry entry.
+
+    Examples:
+      dtop snapshot save debugging myproj
+      dtop snapshot save debugging --force
+    """
+    registry, project_name, _ = _open(config_path, project_name)
+    try:
+        layout = _layout(Inventory.load(project_name), project_name)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    if not layout:
+        typer.echo(f"❌ No services of project '{project_name}' are running")
+        raise typer.Exit(code=1)
+
+    with registry.edit(project_name) as project:
+        if project is None:
+            typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
+            raise typer.Exit(code=1)
+        snapshots = project.setdefault("snapshots", {})
+        if name in snapshots and not force:
+            typer.echo(f"❌ Snapshot '{name}' already exists! Use --force to overwrite")
+            raise typer.Exit(code=1)
+        snapshots[name] = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "services": layout,
+        }
+
+    for env in ENVS:
+        services = [s for s, e in layout.items() if e == env]
+        if services:
+            typer.echo(f"{env.capitalize() + ':':<6} {', '.join(services)}")
+    typer.echo(f"✅ Saved snapshot '{name}' of {project_name}")
+
+
+@app.command("restore")
+def restore(
+    name: str = typer.Argument(..., help="Snapshot name"),
+    project_name: str = _PROJECT,
+    config_path: Path = _CONFIG,
+):
+    """
+    Bring a project back to a saved dev/prod layout.
+
+    Only services whose running env differs from the snapshot are touched:
+    their containers are stopped in one batch, then each env's services are
+    started with a single docker compose run (prod first, then dev).
+    Services in the snapshot that aren't running are started, and running
+    services the snapshot doesn't mention are left alone.
+
+    Examples:
+      dtop snapshot restore debugging myproj
+    """
+    _, project_name, project = _open(config_path, project_name)
+    snapshot = _snapshot(project, project_name, name)
+
+    compose_paths = {env: project["compose"][env] for env in ENVS}
+    composes = {env: load_yaml(path) or {} for env, path in compose_paths.items()}
+    try:
+        inventory = Inventory.load(project_name)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+
+    targets: dict[str, list[str]] = {}
+    for service_name, env in snapshot["services"].items():
+        if inventory.running_env(project_name, service_name) == env:
+            continue
+        if service_name not in (composes[env].get("services") or {}):
+            typer.echo(f"❌ Service '{service_name}' has no {env} definition to restore")
+            raise typer.Exit(code=1)
+        targets.setdefault(env, []).append(service_name)
+
+    if not targets:
+        typer.echo(f"Project '{project_name}' already matches snapshot '{name}'")
+        return
+
+    for env in ENVS:
+        for service_name in targets.get(env, []):
+            was = inventory.running_env(project_name, service_name)
+            typer.echo(f"Restoring '{service_name}': {was or 'stopped'} → {env}")
+
+    changed = [s for services in targets.values() for s in services]
+    container_ids = [c.id for s in changed for c in inventory.service(project_name, s)]
+    if container_ids:
+        typer.echo(f"  Stopping {', '.join(changed)}...")
+        client = get_client()
+        try:
+            with profiler.phase("stop services"):
+                client.stop_containers(container_ids)
+                client.remove_containers(container_ids)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+
+    for env in ENVS:
+        services = targets.get(env)
+        if not services:
+            continue
+        typer.echo(f"  Starting {env} {', '.join(services)}...")
+        base_dir = Path(compose_paths[env]).parent
+        try:
+            # Run on the images an earlier --build tagged, as up does.
+            images = built_images(composes[env], services, project_name, base_dir)
+            transform = pipeline(
+                partial(select_services, names=services),
+                partial(pin_images, images=images, base_dir=base_dir),
+                partial(_inject_labels, env=env, project_name=project_name),
+                partial(stamp_config_hash, base_dir=base_dir),
+                partial(prepare_compose, project_name=project_name),
+                drop_foreign_depends_on,
+            )
+            with profiler.phase("prepare compose", env=env):
+                compose_data = transform(composes[env])
+            _compose_up(compose_data, project_name, services, False, no_deps=True)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+        except subprocess.CalledProcessError as e:
+            typer.echo(f"❌ docker compose exited with status {e.returncode}")
+            raise typer.Exit(code=e.returncode)
+
+    typer.echo(f"✅ Restored snapshot '{name}' of {project_name}")
+
+
+@app.command("ls")
+def list_snapshots(
+    project_name: str = _PROJECT,
+    config_path: Path = _CONFIG,
+):
+    """
+    List a project's saved snapshots.
+
+    Examples:
+      dtop snapshot ls myproj
+    """
+    _, project_name, project = _open(config_path, project_name)
+    snapshots = project.get("snapshots") or {}
+    if not snapshots:
+        typer.echo(f"No snapshots saved for project '{project_name}'")
+        return
+    for name, snapshot in sorted(snapshots.items()):
+        dev = sorted(s for s, env in snapshot["services"].items() if env == "dev")
+        typer.echo(
+            f"{name:<20} {snapshot.get('created_at', ''):<34} "
+            f"{len(snapshot['services'])} service(s), dev: {', '.join(dev) or '-'}"
+        )
+
+
+@app.command("rm")
+def remove(
+    name: str = typer.Argument(..., help="Snapshot name"),
+    project_name: str = _PROJECT,
+    config_path: Path = _CONFIG,
+):
+    """
+    Delete a saved snapshot.
+
+    Examples:
+      dtop snapshot rm debugging myproj
+    """
+    registry, project_name, _ = _open(config_path, project_name)
+    with registry.edit(project_name) as project:
+        if project is None:
+            typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
+            raise typer.Exit(code=1)
+        _snapshot(project, project_name, name)
+        del project["snapshots"][name]
+        if not project["snapshots"]:
+            del project["snapshots"]
+    typer.echo(f"✅ Deleted snapshot '{name}' of {project_name}")
@@ -0,0 +1,251 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import typer
+
+from docktapus.commands.docker_api import DockerError, _format_size, get_client
+from docktapus.commands.inventory import Container, Inventory
+from docktapus.commands.ls import _project_label, _redraw
+
+# Container events that add a container to the rollup or take it out.
+STATS_ACTIONS = ["start", "die", "destroy"]
+# With --no-stream, seconds to wait for every container's first sample.
+NO_STREAM_TIMEOUT = 10.0
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    """One resource reading of a container."""
+
+    time: float
+    cpu: float
+    memory: int
+    memory_limit: int
+
+
+class StatsAggregator:
+    """Recent samples of every tracked container, rolled up by project and env.
+
+    Each container keeps a fixed-size ring of its latest samples, so memory
+    stays bounded however long the stream runs.  Samples for containers
+    that aren't tracked (or no longer are) are dropped.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.containers: dict[str, Container] = {}
+        self.samples: dict[str, deque[Sample]] = {}
+
+    def track(self, container: Container):
+        self.containers[container.id] = container
+        self.samples.setdefault(container.id, deque(maxlen=self.window))
+
+    def forget(self, cid: str):
+        self.containers.pop(cid, None)
+        self.samples.pop(cid, None)
+
+    def add(self, sample: dict):
+        ring = self.samples.get(sample["ID"])
+        if ring is not None:
+            ring.append(
+                Sample(time.time(), sample["CPU"], sample["Memory"], sample["MemoryLimit"])
+            )
+
+    def sampled(self) -> bool:
+        """True once every tracked container has at least one sample."""
+        return all(self.samples.values())
+
+    def rollup(self) -> list[dict]:
+        """Totals per (project, env): current and window-average CPU, current and peak memory.
+
+        CPU is in percent of one core, memory in bytes; each is the sum over
+        the group's containers.
+        """
+        groups: dict[tuple[str, str], dict] = {}
+        for cid, c in self.containers.items():
+            row = groups.setdefault(
+                (c.project, c.env),
+                {
+                    "project": c.project,
+                    "env": c.env,
+                    "containers": 0,
+                    "cpu_percent": 0.0,
+                    "cpu_avg_percent": 0.0,
+                    "memory_bytes": 0,
+                    "memory_peak_bytes": 0,
+                },
+            )
+            row["containers"] += 1
+            ring = self.samples[cid]
+            if ring:
+                row["cpu_percent"] += ring[-1].cpu
+                row["cpu_avg_percent"] += sum(s.cpu for s in ring) / len(ring)
+                row["memory_bytes"] += ring[-1].memory
+                row["memory_peak_bytes"] += max(s.memory for s in ring)
+        for row in groups.values():
+            row["cpu_percent"] = round(row["cpu_percent"], 2)
+            row["cpu_avg_percent"] = round(row["cpu_avg_percent"], 2)
+        return [groups[key] for key in sorted(groups)]
+
+
+def _render(rows: list[dict]) -> list[str]:
+    """Return the rollup as table lines, one row per project and env."""
+    hdr = f"{'PROJECT':<20} {'ENV':<6} {'CONTAINERS':>10} {'CPU %':>8} {'AVG CPU %':>10} {'MEMORY':>10} {'PEAK MEM':>10}"
+    lines = [hdr, "-" * len(hdr)]
+    for row in rows:
+        lines.append(
+            f"{row['project']:<20} "
+            f"{row['env']:<6} "
+            f"{row['containers']:>10} "
+            f"{row['cpu_percent']:>8.1f} "
+            f"{row['cpu_avg_percent']:>10.1f} "
+            f"{_format_size(row['memory_bytes']):>10} "
+            f"{_format_size(row['memory_peak_bytes']):>10}"
+        )
+    return lines
+
+
+def stats(
+    project_name: str = typer.Argument(
+        None, help="Project to report on (defaults to all projects)"
+    ),
+    ndjson: bool = typer.Option(
+        False, "--ndjson", help="Print each rollup as JSON objects, one per line"
+    ),
+    no_stream: bool = typer.Option(
+        False, "--no-stream", help="Print one rollup and exit"
+    ),
+    interval: float = typer.Option(
+        2.0, "--interval", min=0.1, help="Seconds between rollups"
+    ),
+    window: int = typer.Option(
+        30, "--window", min=1, help="Samples kept per container for averages and peaks"
+    ),
+):
+    """
+    Show live CPU and memory use per project and env.
+
+    Follows the Docker stats stream of every running dtop-labelled
+    container and adds up their CPU (percent of one core) and memory per
+    project and dtop.env, so the dev half of a project can be compared
+    with its prod half.  Each container keeps only its last --window
+    samples, for the average CPU and peak memory columns.  Containers
+    started or stopped while stats runs join or leave the rollup.
+
+    The table is redrawn in place every --interval seconds.  With --ndjson
+    each rollup is printed instead as one JSON object per project and env,
+    with time, project, env, containers, cpu_percent, cpu_avg_percent,
+    memory_bytes and memory_peak_bytes.
+
+    Usage:
+      dtop stats [PROJECT_NAME] [OPTIONS]
+
+    Examples:
+      dtop stats
+      dtop stats myproj
+      dtop stats --no-stream
+      dtop stats myproj --ndjson --interval 10 > usage.ndjson
+    """
+    client = get_client()
+    aggregator = StatsAggregator(window)
+    items: queue.Queue = queue.Queue()
+    since = time.time()
+
+    def follow(ids: list[str]):
+        try:
+            for sample in client.stats(ids):
+                items.put(("sample", sample))
+        except DockerError as e:
+            items.put(("error", e))
+
+    def pump():
+        try:
+            for event in client.events(
+                {
+                    "type": ["container"],
+                    "label": [_project_label(project_name)],
+                    "event": STATS_ACTIONS,
+                },
+                since=since,
+            ):
+                items.put(("event", event))
+        except DockerError as e:
+            items.put(("error", e))
+
+    if not no_stream:
+        threading.Thread(target=pump, daemon=True).start()
+    try:
+        containers = Inventory.load(project_name, all=False).containers
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    for c in containers:
+        aggregator.track(c)
+    if containers:
+        threading.Thread(target=follow, args=([c.id for c in containers],), daemon=True).start()
+    elif no_stream:
+        typer.echo(f"No running containers found for {project_name or 'any project'}")
+        return
+
+    title = f"Resource use of {project_name or 'all projects'} (Ctrl-C to stop)"
+    drawn: list[str] = []
+
+    def emit():
+        nonlocal drawn
+        rows = aggregator.rollup()
+        if ndjson:
+            now = round(time.time(), 3)
+            for row in rows:
+                typer.echo(json.dumps({"time": now, **row}))
+        elif no_stream:
+            for line in _render(rows):
+                typer.echo(line)
+        else:
+            if not drawn:
+                typer.echo("\x1b[H\x1b[2J", nl=False, color=True)
+            drawn = _redraw(drawn, [title, "", *_render(rows)])
+
+    deadline = time.monotonic() + (NO_STREAM_TIMEOUT if no_stream else interval)
+    try:
+        while True:
+            try:
+                kind, item = items.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                emit()
+                if no_stream:
+                    return
+                deadline += interval
+                continue
+
+            if kind == "error":
+                typer.echo(f"❌ {item}")
+                raise typer.Exit(code=1)
+            if kind == "sample":
+                aggregator.add(item)
+                if no_stream and aggregator.sampled():
+                    emit()
+                    return
+                continue
+
+            action = item["Action"].split(":")[0]
+            if action == "start" and item["ID"] not in aggregator.containers:
+                try:
+                    started = Inventory.load(project_name, ids=[item["ID"]]).containers
+                except DockerError as e:
+                    # Skip the container rather than end the stream; on
+                    # stderr, so --ndjson output stays parseable.
+                    typer.echo(f"⚠ skipping started container {item['ID']}: {e}", err=True)
+                    continue
+                for c in started:
+                    aggregator.track(c)
+                if started:
+                    ids = [c.id for c in started]
+                    threading.Thread(target=follow, args=(ids,), daemon=True).start()
+            elif action in ("die", "destroy"):
+                aggregator.forget(item["ID"])
+    except KeyboardInterrupt:
+        pass
@@ -1,177 +1,339 @@
-import json
 import subprocess
+from functools import partial
 from pathlib import Path
 
-import yaml
 import typer
 
-from docktapus.commands.up import OCT_CONFIG, _inject_labels, _compose_up
-from docktapus.commands.compose_utils import prepare_compose
-
-
-def _get_label(labels_str: str, key: str) -> str:
-    """Extract a label value from the docker Labels string."""
-    for part in labels_str.split(","):
-        if part.strip().startswith(f"{key}="):
-            return part.strip().split("=", 1)[1]
-    return ""
-
-
-def _get_service_env(project_name: str, service_name: str) -> str | None:
-    """Return the dtop.env label ('prod' or 'dev') for a running service, or None."""
-    result = subprocess.run(
-        [
-            "docker",
-            "ps",
-            "--filter",
-            f"label=dtop.project={project_name}",
-            "--format",
-            "{{json .}}",
-        ],
-        capture_output=True,
-        text=True,
-    )
-    for line in result.stdout.strip().splitlines():
-        if not line:
-            continue
-        container = json.loads(line)
-        labels = container.get("Labels", "")
-        if _get_label(labels, "com.docker.compose.service") == service_name:
-            env = _get_label(labels, "dtop.env")
-            if env:
-                return env
-    return None
+from docktapus.commands import profiler
+from docktapus.commands.up import _inject_labels, _compose_up
+from docktapus.commands.compose_utils import (
+    compose_project_name,
+    drop_foreign_depends_on,
+    pipeline,
+    prepare_compose,
+    select_services,
+    stamp_config_hash,
+)
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.down import _grace_seconds
+from docktapus.commands.inventory import COMPOSE_PROJECT_LABEL, Inventory
+from docktapus.commands.prebuild import built_images, pin_images, prebuild
+from docktapus.commands.readiness import NotReadyError, wait_ready
+from docktapus.commands.registry import OCT_CONFIG, open_registry
+from docktapus.commands.yaml_cache import load_yaml
+
 
+def _host_ports(svc_cfg: dict) -> set[str]:
+    """Return the fixed host ports a service publishes."""
+    ports = set()
+    for port in svc_cfg.get("ports") or []:
+        if isinstance(port, dict):
+            host = str(port.get("published") or "")
+        else:
+            # "80", "8080:80", "127.0.0.1:8080:80/tcp", "127.0.0.1::80"
+            spec = str(port).split("/")[0]
+            host = spec.rsplit(":", 1)[0].rsplit(":", 1)[-1] if ":" in spec else ""
+        if host:
+            ports.add(host)
+    return ports
 
-def _stop_service_containers(project_name: str, service_name: str):
-    """Stop and remove containers for a specific service in a project."""
-    result = subprocess.run(
-        [
-            "docker",
-            "ps",
-            "-a",
-            "--filter",
-            f"label=dtop.project={project_name}",
-            "--format",
-            "{{json .}}",
-        ],
-        capture_output=True,
-        text=True,
-    )
-    container_ids = []
-    for line in result.stdout.strip().splitlines():
-        if not line:
-            continue
-        container = json.loads(line)
-        labels = container.get("Labels", "")
-        if _get_label(labels, "com.docker.compose.service") == service_name:
-            container_ids.append(container.get("ID"))
-
-    if container_ids:
-        subprocess.run(["docker", "stop", *container_ids], check=True)
-        subprocess.run(["docker", "rm", *container_ids], check=True)
+
+def _overlap_blocker(new_cfg: dict, old_cfg: dict) -> str | None:
+    """Explain why the two versions of a service can't run side by side, or return None."""
+    if new_cfg.get("container_name"):
+        return "has a fixed container_name"
+    shared = _host_ports(new_cfg) & _host_ports(old_cfg)
+    if shared:
+        return f"publishes host port {', '.join(sorted(shared))} in both envs"
+    return None
 
 
 def swap(
     project_name: str = typer.Argument(
         None, help="Project name (defaults to current folder name)"
     ),
-    service_name: str = typer.Argument(
-        ..., help="Service to swap between prod and dev"
+    service_names: str = typer.Argument(
+        ..., help="Comma-separated list of services to swap between prod and dev"
     ),
     config_path: Path = typer.Option(
         None, "-conf", "--config-file-path", help="Path to .dtop.yml config file"
     ),
     build: bool = typer.Option(
-        False, "--build", help="Rebuild containers before starting"
+        False, "--build", help="Build images whose sources changed before starting"
+    ),
+    overlap: bool = typer.Option(
+        False,
+        "--overlap",
+        help="Start the new version and wait until it is ready before stopping the old one",
+    ),
+    timeout: int = typer.Option(
+        120, "--timeout", min=1, help="With --overlap, seconds to wait for readiness"
     ),
 ):
     """
-    Swap a service between prod and dev.
+    Swap one or more services between prod and dev.
+
+    Detects whether each service is currently running as prod or dev,
+    stops it, and starts the opposite version.  Several services can be
+    swapped at once: project state is read with a single query and each
+    target env is started with one docker compose run.
 
-    Detects whether the service is currently running as prod or dev,
-    stops it, and starts the opposite version.
+    With --build, changed images are built in parallel before anything is
+    stopped, and unchanged ones are reused (see `dtop up --help`).
+
+    With --overlap, the new version is started next to the old one and the
+    old containers are only stopped once the new ones are ready: healthy,
+    if the service has a healthcheck, otherwise accepting TCP connections.
+    Both versions answer on the compose network in between.  If the new
+    version fails or isn't ready within --timeout seconds it is removed and
+    the old one keeps running.  Services that publish the same host port
+    in both envs, or have a fixed container_name, can't run twice and are
+    stopped first as usual.
 
     Usage:
-      dtop swap [PROJECT_NAME] SERVICE_NAME [OPTIONS]
+      dtop swap [PROJECT_NAME] SERVICE_NAMES [OPTIONS]
 
     Examples:
       dtop swap myproj api
       dtop swap myproj api --build
+      dtop swap myproj api,worker,web
+      dtop swap myproj api --overlap --timeout 60
     """
     if not project_name:
         project_name = Path.cwd().name
 
-    if not config_path or not config_path.is_file():
-        typer.echo(f"Using default config path {OCT_CONFIG}")
-        config_path = OCT_CONFIG
-
-    if not config_path.exists():
-        typer.echo(f"❌ Config file not found: {config_path}")
+    registry = open_registry(config_path)
+    if not registry.exists():
+        typer.echo(f"❌ Config file not found: {config_path or OCT_CONFIG}")
         raise typer.Exit(code=1)
 
-    with config_path.open() as f:
-        config = yaml.safe_load(f) or {}
+    project = registry.get(project_name)
+    if project is None:
+        typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
+        raise typer.Exit(code=1)
+    compose_paths = {
+        "dev": project["compose"]["dev"],
+        "prod": project["compose"]["prod"],
+    }
+    composes = {env: load_yaml(path) or {} for env, path in compose_paths.items()}
+    env_services = {
+        env: set((data.get("services") or {}).keys()) for env, data in composes.items()
+    }
 
-    projects = config.get("projects", {})
-    if project_name not in projects:
-        typer.echo(f"❌ Project '{project_name}' not found in {config_path}")
+    names = list(dict.fromkeys(s.strip() for s in service_names.split(",") if s.strip()))
+    try:
+        inventory = Inventory.load(project_name)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
         raise typer.Exit(code=1)
 
-    project = projects[project_name]
-    dev_compose_path = project["compose"]["dev"]
-    prod_compose_path = project["compose"]["prod"]
+    # Validate every service before touching any container.
+    targets: dict[str, list[str]] = {}
+    current: dict[str, str] = {}
+    for service_name in names:
+        if service_name not in env_services["dev"] | env_services["prod"]:
+            typer.echo(
+                f"❌ Service '{service_name}' not found in dev or prod compose files"
+            )
+            raise typer.Exit(code=1)
 
-    with open(dev_compose_path) as f:
-        dev_compose = yaml.safe_load(f) or {}
-    with open(prod_compose_path) as f:
-        prod_compose = yaml.safe_load(f) or {}
+        current_env = inventory.running_env(project_name, service_name)
+        if current_env is None:
+            typer.echo(
+                f"❌ Service '{service_name}' is not currently running in project '{project_name}'"
+            )
+            raise typer.Exit(code=1)
 
-    all_dev_services = list((dev_compose.get("services") or {}).keys())
-    all_prod_services = list((prod_compose.get("services") or {}).keys())
+        target_env = "dev" if current_env == "prod" else "prod"
+        if service_name not in env_services[target_env]:
+            typer.echo(
+                f"❌ Service '{service_name}' has no {target_env} definition to swap to"
+            )
+            raise typer.Exit(code=1)
 
-    if service_name not in all_dev_services and service_name not in all_prod_services:
-        typer.echo(
-            f"❌ Service '{service_name}' not found in dev or prod compose files"
-        )
-        raise typer.Exit(code=1)
+        current[service_name] = current_env
+        targets.setdefault(target_env, []).append(service_name)
 
-    current_env = _get_service_env(project_name, service_name)
+    for service_name in names:
+        target_env = "dev" if current[service_name] == "prod" else "prod"
+        typer.echo(f"Swapping '{service_name}' from {current[service_name]} → {target_env}")
 
-    if current_env is None:
-        typer.echo(
-            f"❌ Service '{service_name}' is not currently running in project '{project_name}'"
-        )
+    # Build before stopping anything, so a failed build leaves the old
+    # containers running.  Without --build, images an earlier build tagged
+    # are still used.
+    images: dict[str, dict[str, str]] = {}
+    try:
+        for target_env, services in targets.items():
+            find = prebuild if build else built_images
+            images[target_env] = find(
+                composes[target_env],
+                services,
+                project_name,
+                Path(compose_paths[target_env]).parent,
+            )
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
         raise typer.Exit(code=1)
+    except subprocess.CalledProcessError as e:
+        typer.echo(f"❌ docker compose build exited with status {e.returncode}")
+        raise typer.Exit(code=e.returncode)
+
+    overlapping: set[str] = set()
+    if overlap:
+        for target_env, services in targets.items():
+            for service_name in services:
+                blocker = _overlap_blocker(
+                    composes[target_env]["services"][service_name] or {},
+                    (composes[current[service_name]].get("services") or {}).get(service_name)
+                    or {},
+                )
+                if blocker:
+                    typer.echo(
+                        f"  ⚠ '{service_name}' {blocker}; stopping it before starting {target_env}"
+                    )
+                else:
+                    overlapping.add(service_name)
+
+    # Stop every container of the services that can't overlap in one batch
+    client = get_client()
+    stop_first = [name for name in names if name not in overlapping]
+    if stop_first:
+        typer.echo(f"  Stopping {', '.join(stop_first)}...")
+        container_ids = [
+            c.id for name in stop_first for c in inventory.service(project_name, name)
+        ]
+        try:
+            with profiler.phase("stop services"):
+                client.stop_containers(container_ids)
+                client.remove_containers(container_ids)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
 
-    if current_env == "prod":
-        target_env = "dev"
-        if service_name not in all_dev_services:
-            typer.echo(f"❌ Service '{service_name}' has no dev definition to swap to")
+    # Start each target env with a compose dict containing only the services
+    # being swapped to it, so Docker Compose doesn't touch the others.
+    for target_env, services in targets.items():
+        typer.echo(f"  Starting {target_env} {', '.join(services)}...")
+        base_dir = Path(compose_paths[target_env]).parent
+        pinned = images.get(target_env, {})
+        transform = pipeline(
+            partial(select_services, names=services),
+            partial(pin_images, images=pinned, base_dir=base_dir),
+            partial(_inject_labels, env=target_env, project_name=project_name),
+            partial(stamp_config_hash, base_dir=base_dir),
+            partial(prepare_compose, project_name=project_name),
+            drop_foreign_depends_on,
+        )
+        try:
+            with profiler.phase("prepare compose", env=target_env):
+                compose_data = transform(composes[target_env])
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
             raise typer.Exit(code=1)
-        target_compose = dev_compose
-    else:
-        target_env = "prod"
-        if service_name not in all_prod_services:
-            typer.echo(f"❌ Service '{service_name}' has no prod definition to swap to")
+        # Old containers in the same compose project would be recreated in
+        # place, so overlapping services are scaled up next to them instead.
+        scale = {}
+        compose_project = compose_project_name(project_name)
+        for s in services:
+            same_project = [
+                c
+                for c in inventory.service(project_name, s)
+                if c.labels.get(COMPOSE_PROJECT_LABEL) == compose_project
+            ]
+            if s in overlapping and same_project:
+                deploy = (compose_data["services"][s] or {}).get("deploy") or {}
+                scale[s] = len(same_project) + (deploy.get("replicas") or 1)
+        try:
+            _compose_up(compose_data, project_name, services, False, no_deps=True, scale=scale)
+        except subprocess.CalledProcessError as e:
+            typer.echo(f"❌ docker compose exited with status {e.returncode}")
+            if overlapping:
+                kept = sorted(overlapping)
+                typer.echo(f"  Keeping the previous version of {', '.join(kept)} running")
+                try:
+                    _remove_replacements(project_name, kept, inventory)
+                except DockerError as err:
+                    typer.echo(f"❌ {err}")
+            raise typer.Exit(code=e.returncode)
+
+    if overlapping:
+        try:
+            _cut_over(project_name, sorted(overlapping), inventory, composes, current, timeout)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
             raise typer.Exit(code=1)
-        target_compose = prod_compose
 
-    typer.echo(f"Swapping '{service_name}' from {current_env} → {target_env}")
+    for target_env, services in targets.items():
+        for service_name in services:
+            typer.echo(f"✅ '{service_name}' is now running as {target_env}")
 
-    # Stop the currently running service
-    typer.echo(f"  Stopping {current_env} '{service_name}'...")
-    _stop_service_containers(project_name, service_name)
 
-    # Start the target version – build a minimal compose dict containing
-    # only the service being swapped so Docker Compose doesn't touch others.
-    typer.echo(f"  Starting {target_env} '{service_name}'...")
-    minimal_compose = {k: v for k, v in target_compose.items() if k != "services"}
-    minimal_compose["services"] = {
-        service_name: target_compose["services"][service_name]
+def _replacements(
+    project_name: str, services: list[str], previous: Inventory
+) -> dict[str, list[str]]:
+    """Return {service: ids} of the containers started since ``previous`` was taken."""
+    fresh = Inventory.load(project_name)
+    old_ids = {c.id for name in services for c in previous.service(project_name, name)}
+    return {
+        name: [c.id for c in fresh.service(project_name, name) if c.id not in old_ids]
+        for name in services
     }
-    labelled = _inject_labels(minimal_compose, target_env, project_name)
-    labelled = prepare_compose(labelled, project_name)
-    _compose_up(labelled, [service_name], build)
 
-    typer.echo(f"✅ '{service_name}' is now running as {target_env}")
+
+def _remove_replacements(project_name: str, services: list[str], previous: Inventory):
+    """Stop and remove every container started for services since ``previous`` was taken."""
+    replacements = _replacements(project_name, services, previous)
+    new_ids = [cid for ids in replacements.values() for cid in ids]
+    if new_ids:
+        client = get_client()
+        with profiler.phase("remove replacements"):
+            client.stop_containers(new_ids)
+            client.remove_containers(new_ids)
+
+
+def _cut_over(
+    project_name: str,
+    services: list[str],
+    previous: Inventory,
+    composes: dict[str, dict],
+    current: dict[str, str],
+    timeout: int,
+):
+    """Wait for the new containers of overlapped services, then stop the old ones.
+
+    If any replacement fails or isn't ready in time, every replacement is
+    removed and the old containers are left running.
+    """
+    client = get_client()
+    old = {name: [c.id for c in previous.service(project_name, name)] for name in services}
+    old_ids = {cid for ids in old.values() for cid in ids}
+    new = _replacements(project_name, services, previous)
+    new_ids = [cid for ids in new.values() for cid in ids]
+
+    missing = [name for name in services if not new[name]]
+    typer.echo(f"  Waiting for {', '.join(services)} to become ready...")
+    try:
+        if missing:
+            raise NotReadyError(f"no new container was started for {', '.join(missing)}")
+        wait_ready(
+            new_ids,
+            timeout,
+            on_ready=lambda info: typer.echo(f"  ✅ {info['Name']} is ready"),
+        )
+    except NotReadyError as e:
+        typer.echo(f"❌ {e}; keeping the previous version of {', '.join(services)} running")
+        if new_ids:
+            with profiler.phase("remove replacements"):
+                client.stop_containers(new_ids)
+                client.remove_containers(new_ids)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"  Stopping previous {', '.join(services)}...")
+    groups: dict[int | None, list[str]] = {}
+    for name in services:
+        svc_cfg = (composes[current[name]].get("services") or {}).get(name) or {}
+        groups.setdefault(_grace_seconds(svc_cfg.get("stop_grace_period")), []).extend(old[name])
+    with profiler.phase("stop services"):
+        for grace, ids in groups.items():
+            client.stop_containers(ids, timeout=grace)
+        client.remove_containers(sorted(old_ids))
@@ -1,108 +1,223 @@
+from functools import partial
 from pathlib import Path
-import copy
 import os
 import subprocess
 import tempfile
+import threading
 
-import yaml
 import typer
 
-from docktapus.commands.compose_utils import prepare_compose
-
-OCT_CONFIG = Path.home() / ".dtop.yml"
+from docktapus.commands import profiler
+from docktapus.commands.compose_utils import (
+    CONFIG_HASH_LABEL,
+    TEMP_COMPOSE_PREFIX,
+    compose_project_name,
+    drop_foreign_depends_on,
+    pipeline,
+    prepare_compose,
+    stamp_config_hash,
+)
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.fleet import current_prefix, popen, prefixed_output, run_projects
+from docktapus.commands.inventory import COMPOSE_PROJECT_LABEL, Inventory
+from docktapus.commands.prebuild import built_images, pin_images, prebuild
+from docktapus.commands.pull import _interpolate, familiar, pull_missing, service_images
+from docktapus.commands.readiness import NotReadyError, wait_completed, wait_ready
+from docktapus.commands.registry import OCT_CONFIG, Registry, open_registry
+from docktapus.commands.scheduler import (
+    DependencyCycleError,
+    Node,
+    build_service_graph,
+    dependency_closure,
+    run_service_graph,
+)
+from docktapus.commands.yaml_cache import dump_yaml, load_yaml
 
 
 def _inject_labels(compose_data: dict, env: str, project_name: str) -> dict:
-    """Return a copy of compose_data with dtop labels added to every service."""
-    data = copy.deepcopy(compose_data)
-    for svc_cfg in data.get("services", {}).values():
+    """Return compose_data with dtop labels added to every service.
+
+    Only the services mapping, each service's top-level dict and its labels
+    are copied; everything else is shared with compose_data.
+    """
+    services = {}
+    for svc_name, svc_cfg in compose_data.get("services", {}).items():
         labels = svc_cfg.get("labels", {})
         # Normalise list-style labels to dict
         if isinstance(labels, list):
             labels = dict(label.split("=", 1) for label in labels)
-        labels["dtop.env"] = env
-        labels["dtop.project"] = project_name
-        svc_cfg["labels"] = labels
-    return data
+        labels = {**labels, "dtop.env": env, "dtop.project": project_name}
+        services[svc_name] = {**svc_cfg, "labels": labels}
+    return {**compose_data, "services": services}
+
+
+def _unchanged_services(
+    inventory: Inventory,
+    project_name: str,
+    labelled: dict[str, dict],
+    nodes,
+    rebuild: set[Node],
+) -> set[Node]:
+    """Return the nodes whose running containers already carry the wanted config hash.
+
+    ``inventory`` holds the project's containers.  A service counts as
+    unchanged only if every one of its containers is running with the hash
+    stamped on its labelled definition and on the image its tag currently
+    names; services whose image was rebuilt without a content-addressed tag
+    never count as unchanged.
+
+    The hash only covers the compose definition, so a mutable tag (redis:7,
+    :latest) that was pulled again is caught through the container's image
+    instead: Docker reports a container by its image ID rather than the
+    reference it was created from once that reference points elsewhere.
+    """
+    unchanged = set()
+    for env, name in nodes:
+        svc_cfg = labelled[env]["services"].get(name)
+        if svc_cfg is None or (env, name) in rebuild:
+            continue
+        image = svc_cfg.get("image") and _interpolate(str(svc_cfg["image"]))
+        digests = {
+            c.labels.get(CONFIG_HASH_LABEL)
+            if c.running and (not image or familiar(c.image) == familiar(image))
+            else None
+            for c in inventory.service(project_name, name)
+            if c.env == env
+        }
+        if digests == {svc_cfg["labels"][CONFIG_HASH_LABEL]}:
+            unchanged.add((env, name))
+    return unchanged
 
 
-def _compose_up(compose_data: dict, services: list[str], build: bool):
-    """Write compose_data to a temp file and run docker compose up on services."""
-    fd, tmp = tempfile.mkstemp(suffix=".yml")
+def _compose_up(
+    compose_data: dict,
+    project_name: str,
+    services: list[str],
+    build: bool,
+    no_deps: bool = False,
+    cancel: threading.Event | None = None,
+    scale: dict[str, int] | None = None,
+):
+    """Write compose_data to a temp file and run docker compose up on services.
+
+    The services run in project_name's own compose project (see
+    compose_project_name()).  ``scale`` ({service: replicas}) adds
+    containers alongside the existing ones instead of recreating them.  If
+    ``cancel`` is set while compose is running, the process is terminated
+    and CalledProcessError is raised.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=TEMP_COMPOSE_PREFIX, suffix=".yml")
     try:
-        with os.fdopen(fd, "w") as f:
-            yaml.safe_dump(compose_data, f, sort_keys=False)
-        cmd = ["docker", "compose", "-f", tmp, "up", "-d"]
+        with profiler.phase("write compose file"), os.fdopen(fd, "w") as f:
+            dump_yaml(compose_data, f)
+        compose_project = compose_project_name(project_name)
+        cmd = ["docker", "compose", "-p", compose_project, "-f", tmp, "up", "-d"]
         if build:
             cmd.insert(-1, "--build")
+        if no_deps:
+            cmd.append("--no-deps")
+        if scale:
+            cmd.append("--no-recreate")
+            for name, replicas in sorted(scale.items()):
+                cmd.extend(["--scale", f"{name}={replicas}"])
         if services:
             cmd.extend(services)
         typer.echo(f"  → {' '.join(cmd)}")
-        subprocess.run(cmd, check=True)
+        proc = popen(cmd)
+        while True:
+            try:
+                proc.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    proc.terminate()
+                    proc.wait()
+                    break
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
     finally:
         os.unlink(tmp)
 
 
-def up(
-    project_name: str = typer.Argument(
-        None, help="Project to run (defaults to current folder name)"
-    ),
-    dev: str = typer.Option(
-        None,
-        "--dev",
-        help="Comma-separated list of dev services to run, or ALL for all dev services",
-    ),
-    config_path: Path = typer.Option(
-        None, "-conf", "--config-file-path", help="Path to .dtop.yml config file"
-    ),
-    build: bool = typer.Option(
-        False, "--build", help="Rebuild containers before starting"
-    ),
-):
+def _wait_until_ready(project_name: str, nodes: set[Node], timeout: int):
+    """Block until every container of the given services is ready, one line per container.
+
+    Both envs are waited on together from a single event stream, so this
+    returns the moment the last container becomes ready.
     """
-    Start Docker containers for a Docktapus project.
+    try:
+        containers = [
+            c for c in Inventory.load(project_name).containers if (c.env, c.service) in nodes
+        ]
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    total = len(containers)
+    if not total:
+        return
+    typer.echo(f"Waiting for {total} container(s) to become ready...")
+    ready = 0
 
-    Starts the requested dev services from the dev compose file and all
-    prod services whose names do NOT collide with a requested dev service.
-    Every container is labelled with dtop.env (prod/dev) and
-    dtop.project (<project_name>).
+    def report(info: dict):
+        nonlocal ready
+        ready += 1
+        status = "finished" if info["State"] == "exited" else "ready"
+        typer.echo(f"  ✅ {info['Name']} is {status} ({ready}/{total})")
 
-    Usage:
-      dtop up [PROJECT_NAME] [OPTIONS]
+    try:
+        wait_ready([c.id for c in containers], timeout, on_ready=report)
+    except NotReadyError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
 
-    Examples:
-      dtop up myproj --build
-      dtop up myproj --dev api,worker
-      dtop up myproj --dev ALL
-    """
-    if not project_name:
-        project_name = Path.cwd().name
 
-    if not config_path or not config_path.is_file():
-        typer.echo(f"Using default config path {OCT_CONFIG}")
-        config_path = OCT_CONFIG
+def _release_dependents(
+    project_name: str, gated: dict[Node, str], cancel: threading.Event | None = None
+):
+    """Block until each node meets the condition its later-started dependents wait on.
 
-    if not config_path.exists():
-        typer.echo(f"❌ Config file not found: {config_path}")
-        raise typer.Exit(code=1)
+    ``gated`` maps nodes to service_healthy or service_completed_successfully:
+    the first waits for their containers to turn healthy, the second for
+    them to exit 0.  Raises NotReadyError if one never will.
+    """
+    containers = [
+        c for c in Inventory.load(project_name).containers if (c.env, c.service) in gated
+    ]
+    healthy = [c for c in containers if gated[(c.env, c.service)] == "service_healthy"]
+    completing = [c for c in containers if c not in healthy]
+    if completing:
+        names = ", ".join(sorted({c.service for c in completing}))
+        typer.echo(f"  ↳ waiting for {names} to complete")
+    wait_ready([c.id for c in healthy], None, cancel=cancel)
+    wait_completed([c.id for c in completing], cancel=cancel)
 
-    with config_path.open() as f:
-        config = yaml.safe_load(f) or {}
 
-    projects = config.get("projects", {})
-    if project_name not in projects:
-        typer.echo(f"❌ Project '{project_name}' not found in {config_path}")
+def _up_project(
+    project_name: str,
+    registry: Registry,
+    dev: str | None,
+    build: bool,
+    jobs: int,
+    force: bool,
+    slots: threading.BoundedSemaphore,
+    wait: bool = False,
+    timeout: int = 120,
+    minimal: bool = False,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    prefetch: bool = False,
+):
+    """Bring one project up; see up() for the details."""
+    project = registry.get(project_name)
+    if project is None:
+        typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
         raise typer.Exit(code=1)
-
-    project = projects[project_name]
     dev_compose_path = project["compose"]["dev"]
     prod_compose_path = project["compose"]["prod"]
 
     # Load both compose files
-    with open(dev_compose_path) as f:
-        dev_compose = yaml.safe_load(f) or {}
-    with open(prod_compose_path) as f:
-        prod_compose = yaml.safe_load(f) or {}
+    dev_compose = load_yaml(dev_compose_path) or {}
+    prod_compose = load_yaml(prod_compose_path) or {}
 
     all_dev_service_names = list((dev_compose.get("services") or {}).keys())
     all_prod_service_names = list((prod_compose.get("services") or {}).keys())
@@ -116,8 +231,44 @@ def up(
     else:
         dev_to_start = []
 
-    # Prod services: everything NOT shadowed by a requested dev service
-    prod_to_start = [s for s in all_prod_service_names if s not in dev_to_start]
+    include = include or []
+    exclude = set(exclude or [])
+    unknown = sorted(
+        (set(dev_to_start) - set(all_dev_service_names))
+        | ((set(include) | exclude) - set(all_dev_service_names) - set(all_prod_service_names))
+    )
+    if unknown:
+        typer.echo(f"❌ Unknown service(s) in {project_name}: {', '.join(unknown)}")
+        raise typer.Exit(code=1)
+
+    composes = {"prod": prod_compose, "dev": dev_compose}
+    if minimal:
+        # Each name runs from prod unless it was requested as a dev service
+        # (or only dev defines it); start just what the requested services
+        # and --with need, following depends_on across both files.
+        if not dev_to_start and not include:
+            typer.echo("❌ --minimal needs services to start: pass --dev or --with")
+            raise typer.Exit(code=1)
+        owner = {name: "dev" for name in all_dev_service_names}
+        owner.update({name: "prod" for name in all_prod_service_names})
+        owner.update({name: "dev" for name in dev_to_start})
+        merged = {name: composes[env]["services"][name] or {} for name, env in owner.items()}
+        with profiler.phase("resolve dependency closure"):
+            closure = dependency_closure(merged, dev_to_start + include, exclude)
+        dev_to_start = [name for name in closure if owner[name] == "dev"]
+        prod_to_start = [
+            name for name in all_prod_service_names if name in closure and owner[name] == "prod"
+        ]
+    else:
+        # Prod services: everything NOT shadowed by a requested dev service
+        dev_to_start = [s for s in dev_to_start if s not in exclude]
+        prod_to_start = [
+            s for s in all_prod_service_names if s not in dev_to_start and s not in exclude
+        ]
+
+    selected = {"prod": prod_to_start, "dev": dev_to_start}
+    with profiler.phase("build service graph"):
+        graph, gates = build_service_graph(composes, selected, exclude)
 
     typer.echo(f"Project: {project_name}")
     if dev_to_start:
@@ -125,16 +276,307 @@ def up(
     if prod_to_start:
         typer.echo(f"Prod services: {', '.join(prod_to_start)}")
 
-    # Start prod services (labelled prod)
-    if prod_to_start:
-        prod_labelled = _inject_labels(prod_compose, "prod", project_name)
-        prod_labelled = prepare_compose(prod_labelled, project_name)
-        _compose_up(prod_labelled, prod_to_start, build)
+    compose_paths = {"prod": prod_compose_path, "dev": dev_compose_path}
 
-    # Start dev services (labelled dev)
-    if dev_to_start:
-        dev_labelled = _inject_labels(dev_compose, "dev", project_name)
-        dev_labelled = prepare_compose(dev_labelled, project_name)
-        _compose_up(dev_labelled, dev_to_start, build)
+    # With --prefetch, pull missing images up front and in parallel rather
+    # than letting each compose run pull its own while creating containers.
+    if prefetch:
+        refs = set()
+        for env in composes:
+            refs |= service_images(composes[env], [name for e, name in graph if e == env])
+        try:
+            pull_missing(refs, jobs, slots)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+        except subprocess.CalledProcessError as e:
+            typer.echo(f"❌ docker pull exited with status {e.returncode}")
+            raise typer.Exit(code=e.returncode)
+
+    # With --build, build images ahead of compose, skipping any whose
+    # content-addressed tag already exists.  Services prebuild() can't hash
+    # are built every time, so compose up never needs --build.  Without it,
+    # services still run on the images an earlier --build tagged.
+    images: dict[str, dict[str, str]] = {}
+    rebuild: set[Node] = set()
+    try:
+        for env, compose_path in compose_paths.items():
+            names = sorted(name for node_env, name in graph if node_env == env)
+            base_dir = Path(compose_path).parent
+            if build:
+                images[env] = prebuild(composes[env], names, project_name, base_dir, jobs, slots)
+            else:
+                images[env] = built_images(composes[env], names, project_name, base_dir)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    except subprocess.CalledProcessError as e:
+        typer.echo(f"❌ docker compose build exited with status {e.returncode}")
+        raise typer.Exit(code=e.returncode)
+    if build:
+        rebuild = {
+            (env, name)
+            for env, name in graph
+            if "build" in ((composes[env].get("services") or {}).get(name) or {})
+            and name not in images[env]
+        }
+
+    # Label every env's services and stamp each with a hash of its
+    # effective config, so unchanged running services can be skipped.
+    labelled = {}
+    with profiler.phase("label and hash services"):
+        for env, compose_path in compose_paths.items():
+            if selected[env]:
+                base_dir = Path(compose_path).parent
+                transform = pipeline(
+                    partial(pin_images, images=images.get(env, {}), base_dir=base_dir),
+                    partial(_inject_labels, env=env, project_name=project_name),
+                    partial(stamp_config_hash, base_dir=base_dir),
+                )
+                labelled[env] = transform(composes[env])
+
+    selected_nodes = set(graph)
+    try:
+        inventory = Inventory.load(project_name)
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    if not force:
+        unchanged = _unchanged_services(inventory, project_name, labelled, graph, rebuild)
+        if unchanged:
+            names = ", ".join(f"{name} ({env})" for env, name in sorted(unchanged))
+            typer.echo(f"Up to date:    {names}")
+        graph = {
+            node: deps - unchanged for node, deps in graph.items() if node not in unchanged
+        }
+        if not graph:
+            typer.echo("All services are up to date")
+            if wait:
+                _wait_until_ready(project_name, selected_nodes, timeout)
+            return
+
+    # Containers started before compose runs were given the project's own
+    # compose project live in another one, where compose wouldn't recreate
+    # them; remove those of the services about to start.
+    compose_project = compose_project_name(project_name)
+    stray = [
+        c.id
+        for env, name in graph
+        for c in inventory.service(project_name, name)
+        if c.labels.get(COMPOSE_PROJECT_LABEL) != compose_project
+    ]
+    if stray:
+        client = get_client()
+        try:
+            with profiler.phase("remove stray containers"):
+                client.stop_containers(stray)
+                client.remove_containers(stray)
+        except DockerError as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(code=1)
+
+    # Prepare each env that still has work sequentially, so shared networks
+    # and volumes are only created once, then let the scheduler start
+    # services from both halves in dependency order.
+    prepared = {}
+    try:
+        with profiler.phase("prepare compose"):
+            for env in labelled:
+                if any(node_env == env for node_env, _ in graph):
+                    transform = pipeline(
+                        partial(prepare_compose, project_name=project_name),
+                        drop_foreign_depends_on,
+                    )
+                    prepared[env] = transform(labelled[env])
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+
+    prefix = current_prefix()
+
+    def launch(env: str, services: list[str], cancel: threading.Event):
+        # Compose enforces conditions between services of the same run; only
+        # dependents started by a later run are released from here.
+        batch = {(env, s) for s in services}
+        gated: dict[Node, str] = {}
+        for (node, dep), condition in gates.items():
+            if dep in batch and node in graph and node not in batch:
+                if gated.get(dep) != "service_completed_successfully":
+                    gated[dep] = condition
+        with prefixed_output(prefix):
+            with slots:
+                _compose_up(prepared[env], project_name, services, False, no_deps=True, cancel=cancel)
+            if gated:
+                _release_dependents(project_name, gated, cancel)
+
+    try:
+        with profiler.phase("start services"):
+            run_service_graph(graph, launch, jobs)
+    except (DependencyCycleError, DockerError, NotReadyError) as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    except subprocess.CalledProcessError as e:
+        typer.echo(f"❌ docker compose exited with status {e.returncode}")
+        raise typer.Exit(code=e.returncode)
 
     typer.echo("Services started")
+    if wait:
+        _wait_until_ready(project_name, selected_nodes, timeout)
+
+
+def up(
+    project_names: list[str] = typer.Argument(
+        None, help="Projects to run (defaults to current folder name)"
+    ),
+    all_projects: bool = typer.Option(
+        False, "--all-projects", help="Start every registered project"
+    ),
+    dev: str = typer.Option(
+        None,
+        "--dev",
+        help="Comma-separated list of dev services to run, or ALL for all dev services",
+    ),
+    config_path: Path = typer.Option(
+        None, "-conf", "--config-file-path", help="Path to .dtop.yml config file"
+    ),
+    build: bool = typer.Option(
+        False, "--build", help="Build images whose sources changed before starting"
+    ),
+    jobs: int = typer.Option(
+        4,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Maximum concurrent docker compose invocations (and projects)",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Start every selected service, even if it is up to date"
+    ),
+    wait: bool = typer.Option(
+        False, "--wait", help="Wait until every selected service is healthy or listening"
+    ),
+    timeout: int = typer.Option(
+        120, "--timeout", min=1, help="With --wait, seconds to wait before failing"
+    ),
+    minimal: bool = typer.Option(
+        False,
+        "--minimal",
+        help="Start only the requested services and what they depend on",
+    ),
+    include: str = typer.Option(
+        None, "--with", help="Comma-separated list of extra services to start"
+    ),
+    exclude: str = typer.Option(
+        None, "--without", help="Comma-separated list of services not to start"
+    ),
+    prefetch: bool = typer.Option(
+        False, "--prefetch", help="Pull missing images in parallel before starting"
+    ),
+):
+    """
+    Start Docker containers for a Docktapus project.
+
+    Starts the requested dev services from the dev compose file and all
+    prod services whose names do NOT collide with a requested dev service.
+    Every container is labelled with dtop.env (prod/dev) and
+    dtop.project (<project_name>).
+
+    Prod and dev services are started from a single dependency graph built
+    from depends_on in both compose files, so dependents wait for their
+    dependencies whichever env those run in.  Each env's services start in
+    one compose run that orders them itself; runs are only split where a
+    dependency crosses between prod and dev, and independent runs go
+    concurrently (up to --jobs at once).  Across runs, dependents wait for
+    a service_healthy dependency to turn healthy and for a
+    service_completed_successfully one to exit 0, and up fails if it
+    exits with another code.
+
+    Each service is labelled with dtop.config-hash, a hash of its effective
+    definition and environment.  Services whose running containers already
+    carry the current hash are skipped, and if nothing changed docker
+    compose is not run at all.  Use --force to start everything regardless.
+
+    With --wait, up only returns once every selected container, prod and
+    dev alike, is ready: healthy if it has a healthcheck, otherwise
+    accepting TCP connections on its ports.  Health changes are followed on
+    the Docker event stream, so it returns as soon as the last one is
+    ready, and fails if a container exits non-zero, turns unhealthy or
+    isn't ready within --timeout seconds.  One-shot services that already
+    exited 0 count as finished.
+
+    With --minimal, only the requested dev services, any --with services
+    and everything they transitively depend on (following depends_on
+    across both compose files) are started; other prod services stay down.
+    A dependency runs from prod unless it was requested with --dev.
+    --without leaves services out, along with anything only they needed;
+    their dependents start without them.  Without --minimal, --without
+    drops services from the usual selection.
+
+    With --prefetch, the images of the selected services that aren't
+    present yet are found with one image query and pulled in parallel (up
+    to --jobs at once) before any compose run, instead of compose pulling
+    them one service at a time.
+
+    With --build, images are built before compose runs.  Each service's
+    build context, Dockerfile and build args are hashed and its image is
+    tagged dtop/<project>-<service>:<hash>; images whose tag already exists
+    are reused, and the rest are built in parallel (up to --jobs at once).
+
+    Several projects (or --all-projects) are brought up concurrently, up to
+    --jobs at a time, with each output line prefixed by its project name.
+    --jobs also caps docker compose runs across all of them.  The exit
+    status is non-zero if any project failed.
+
+    Usage:
+      dtop up [PROJECT_NAME...] [OPTIONS]
+
+    Examples:
+      dtop up myproj --build
+      dtop up myproj --prefetch
+      dtop up myproj --dev api,worker
+      dtop up myproj --dev ALL
+      dtop up myproj --dev api --jobs 8
+      dtop up myproj --force
+      dtop up myproj --dev api --wait --timeout 60
+      dtop up myproj --dev api --minimal --with worker --without mailer
+      dtop up proj1 proj2 proj3 --jobs 2
+      dtop up --all-projects
+    """
+    registry = open_registry(config_path)
+    if not registry.exists():
+        typer.echo(f"❌ Config file not found: {config_path or OCT_CONFIG}")
+        raise typer.Exit(code=1)
+
+    if all_projects:
+        project_names = registry.names()
+        if not project_names:
+            typer.echo(f"No projects registered in {registry.projects_dir}")
+            raise typer.Exit()
+    elif not project_names:
+        project_names = [Path.cwd().name]
+
+    # Shared by every project so --jobs bounds compose runs overall.
+    slots = threading.BoundedSemaphore(jobs)
+    run = partial(
+        _up_project,
+        registry=registry,
+        dev=dev,
+        build=build,
+        jobs=jobs,
+        force=force,
+        slots=slots,
+        wait=wait,
+        timeout=timeout,
+        minimal=minimal,
+        include=[s.strip() for s in (include or "").split(",") if s.strip()],
+        exclude=[s.strip() for s in (exclude or "").split(",") if s.strip()],
+        prefetch=prefetch,
+    )
+
+    if len(project_names) == 1:
+        run(project_names[0])
+        return
+
+    code = run_projects(project_names, run, jobs)
+    if code:
+        raise typer.Exit(code=code)
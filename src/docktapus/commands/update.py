@@ -1,9 +1,8 @@
 from pathlib import Path
 from datetime import datetime, timezone
-import yaml
 import typer
 
-OCT_CONFIG = Path.home() / ".dtop.yml"
+from docktapus.commands.registry import OCT_CONFIG, open_registry
 
 
 def update(
@@ -47,51 +46,40 @@ def update(
     if not project_name:
         project_name = Path.cwd().name
 
-    if not config_path.is_file():
-        typer.echo(f"Using default config path {OCT_CONFIG} ")
-        config_path = OCT_CONFIG
-
-    # Load config
-    if not config_path.exists():
-        typer.echo(f"❌ Config file not found: {config_path}")
-        raise typer.Exit(code=1)
-
-    with config_path.open() as f:
-        config = yaml.safe_load(f) or {}
-
-    projects = config.get("projects", {})
-    if project_name not in projects:
-        typer.echo(f"❌ Project '{project_name}' not found in {config_path}")
+    registry = open_registry(config_path)
+    if not registry.exists():
+        typer.echo(f"❌ Config file not found: {config_path or OCT_CONFIG}")
         raise typer.Exit(code=1)
 
-    project = projects[project_name]
-
-    # Update root if provided
-    if root:
-        root_path = root.expanduser().resolve()
-        project["root"] = str(root_path)
-        typer.echo(f"Updated project root: {root_path}")
-
-    # Update dev compose file if provided
-    if dev_compose_file:
-        dev_path = dev_compose_file.expanduser().resolve()
-        if not dev_path.is_file():
-            typer.echo(f"❌ Dev compose file not found: {dev_path}")
-            raise typer.Exit(code=1)
-        project.setdefault("compose", {})["dev"] = str(dev_path)
-        typer.echo(f"Updated dev compose: {dev_path}")
-
-    # Update prod compose file if provided
-    if prod_compose_file:
-        prod_path = prod_compose_file.expanduser().resolve()
-        if not prod_path.is_file():
-            typer.echo(f"❌ Prod compose file not found: {prod_path}")
+    # Hold the project's lock for the whole read-modify-write; nothing is
+    # saved if validation below exits early.
+    with registry.edit(project_name) as project:
+        if project is None:
+            typer.echo(f"❌ Project '{project_name}' not found in {registry.projects_dir}")
             raise typer.Exit(code=1)
-        project.setdefault("compose", {})["prod"] = str(prod_path)
-        typer.echo(f"Updated prod compose: {prod_path}")
 
-    # Save updated config
-    with config_path.open("w") as f:
-        yaml.safe_dump(config, f, sort_keys=False)
+        # Update root if provided
+        if root:
+            root_path = root.expanduser().resolve()
+            project["root"] = str(root_path)
+            typer.echo(f"Updated project root: {root_path}")
+
+        # Update dev compose file if provided
+        if dev_compose_file:
+            dev_path = dev_compose_file.expanduser().resolve()
+            if not dev_path.is_file():
+                typer.echo(f"❌ Dev compose file not found: {dev_path}")
+                raise typer.Exit(code=1)
+            project.setdefault("compose", {})["dev"] = str(dev_path)
+            typer.echo(f"Updated dev compose: {dev_path}")
+
+        # Update prod compose file if provided
+        if prod_compose_file:
+            prod_path = prod_compose_file.expanduser().resolve()
+            if not prod_path.is_file():
+                typer.echo(f"❌ Prod compose file not found: {prod_path}")
+                raise typer.Exit(code=1)
+            project.setdefault("compose", {})["prod"] = str(prod_path)
+            typer.echo(f"Updated prod compose: {prod_path}")
 
     typer.echo(f"Project '{project_name}' updated successfully!")
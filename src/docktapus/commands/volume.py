@@ -0,0 +1,132 @@
+import time
+from pathlib import Path
+
+import typer
+
+from docktapus.commands import profiler
+from docktapus.commands.docker_api import DockerError, get_client
+from docktapus.commands.inventory import PROJECT_LABEL
+
+# Image providing sh and tar for the copy.
+HELPER_IMAGE = "busybox"
+CLONED_FROM_LABEL = "dtop.cloned-from"
+
+app = typer.Typer(
+    add_completion=False,
+    no_args_is_help=True,
+    help="Manage Docker volumes of Docktapus projects.",
+)
+
+
+def _find_volume(name: str) -> dict | None:
+    for vol in get_client().volumes({"name": [name]}):
+        if vol["Name"] == name:
+            return vol
+    return None
+
+
+def _copy_command(source: str, target: str, image: str, replace: bool) -> list[str]:
+    """Return the `docker run` command that copies source's data into target.
+
+    Both volumes are mounted into one helper container, so the tar stream
+    stays on the Docker host.
+    """
+    copy = "tar -C /from -cf - . | tar -C /to -xf -"
+    if replace:
+        copy = f"find /to -mindepth 1 -delete && {copy}"
+    mounts = ["-v", f"{source}:/from:ro", "-v", f"{target}:/to"]
+    script = f"set -o pipefail && {copy}"
+    return ["docker", "run", "--rm", "--network", "none", *mounts, image, "sh", "-c", script]
+
+
+@app.command("clone")
+def clone(
+    source: str = typer.Argument(..., help="Volume to copy"),
+    target: str = typer.Argument(..., help="Volume to create with a copy of its data"),
+    project_name: str = typer.Option(
+        None,
+        "--project",
+        "-p",
+        help="Project to label the copy with (defaults to the source's dtop.project)",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Replace the contents of an existing target volume"
+    ),
+    image: str = typer.Option(
+        HELPER_IMAGE, "--image", help="Image providing sh and tar for the copy"
+    ),
+):
+    """
+    Copy a volume's data into a new volume, e.g. a prod database into a dev copy.
+
+    Both volumes are mounted into a single helper container, where one tar
+    streams the data straight into another, so nothing is written to disk
+    in between and the data never leaves the Docker host, even a remote
+    one.  With --force the target's old contents are deleted first.
+
+    The new volume is labelled dtop.project (from --project, or the source
+    volume's own label), so `dtop down --remove-volumes` and
+    `dtop gc --volumes` clean it up along with the project's other
+    volumes.  Stop containers writing to the source first for a consistent
+    copy.
+
+    Usage:
+      dtop volume clone SOURCE TARGET [OPTIONS]
+
+    Examples:
+      dtop volume clone myproj_pgdata myproj_pgdata_dev
+      dtop volume clone myproj_pgdata scratch --project myproj --force
+      DOCKER_HOST=ssh://build dtop volume clone data data-copy
+    """
+    if source == target:
+        typer.echo("❌ Source and target volume must differ")
+        raise typer.Exit(code=1)
+
+    client = get_client()
+    try:
+        source_volume = _find_volume(source)
+        if source_volume is None:
+            typer.echo(f"❌ Volume '{source}' not found")
+            raise typer.Exit(code=1)
+        project_name = (
+            project_name or source_volume["Labels"].get(PROJECT_LABEL) or Path.cwd().name
+        )
+
+        existing = _find_volume(target)
+        if existing is not None and not force:
+            typer.echo(f"❌ Volume '{target}' already exists! Use --force to replace its contents")
+            raise typer.Exit(code=1)
+
+        writers = client.containers({"volume": [source]}, all=False)
+        if writers:
+            names = ", ".join(sorted(row["Names"] for row in writers))
+            typer.echo(f"  ⚠ '{source}' is in use by {names}; the copy may be inconsistent")
+
+        if existing is None:
+            typer.echo(f"  ↳ creating volume '{target}'")
+            client.create_volume(
+                target, {PROJECT_LABEL: project_name, CLONED_FROM_LABEL: source}
+            )
+    except DockerError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+
+    command = _copy_command(source, target, image, existing is not None)
+    typer.echo(f"Cloning '{source}' → '{target}'...")
+    start = time.monotonic()
+    with profiler.phase("copy volume"):
+        returncode = profiler.TracedPopen(command).wait()
+
+    if returncode:
+        typer.echo(f"❌ copying the volume data failed (exit {returncode})")
+        if existing is None:
+            try:
+                client.remove_volume(target)
+            except DockerError:
+                typer.echo(f"  ⚠ could not remove the partial copy '{target}'")
+        raise typer.Exit(code=returncode)
+
+    typer.echo(
+        f"✅ Cloned '{source}' → '{target}' in {time.monotonic() - start:.1f}s"
+        f" (labelled {PROJECT_LABEL}={project_name})"
+    )
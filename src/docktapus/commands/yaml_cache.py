@@ -0,0 +1,137 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import yaml
+
+from docktapus.commands import profiler
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper, SafeLoader
+
+# Entries kept before the least recently used are evicted.  Every project
+# typically has three (its registry file and both compose files), so this
+# covers fleets of well over a thousand projects; DTOP_YAML_CACHE_ENTRIES
+# overrides it.
+MAX_ENTRIES = 4096
+# Eviction trims the cache to this share of the cap, so it only runs once
+# per batch of new entries instead of on every write.
+EVICT_TO = 0.75
+
+
+def _max_entries() -> int:
+    try:
+        return max(1, int(os.environ.get("DTOP_YAML_CACHE_ENTRIES", MAX_ENTRIES)))
+    except ValueError:
+        return MAX_ENTRIES
+
+
+def _cache_dir() -> Path:
+    if os.environ.get("DTOP_CACHE_DIR"):
+        return Path(os.environ["DTOP_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "docktapus" / "yaml"
+
+
+def _entry_path(path: Path) -> Path:
+    return _cache_dir() / f"{hashlib.sha256(str(path).encode()).hexdigest()}.pickle"
+
+
+def _read_entry(entry_path: Path) -> dict | None:
+    try:
+        with entry_path.open("rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+
+
+def _write_entry(entry_path: Path, entry: dict, new: bool):
+    """Atomically write a cache entry; a new one may evict the least recently used."""
+    try:
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry_path)
+        if new:
+            _evict(entry_path.parent)
+    except OSError:
+        pass
+
+
+def _evict(cache_dir: Path):
+    """Once the cache holds more than the cap, trim it to EVICT_TO of it, oldest first.
+
+    Entries are only counted here; their mtimes are read when there is
+    something to evict.
+    """
+    limit = _max_entries()
+    with os.scandir(cache_dir) as it:
+        paths = [e.path for e in it if e.name.endswith(".pickle")]
+    if len(paths) <= limit:
+        return
+    entries = []
+    for p in paths:
+        try:
+            entries.append((os.stat(p).st_mtime_ns, p))
+        except OSError:
+            continue
+    entries.sort()
+    for _, p in entries[: len(entries) - int(limit * EVICT_TO)]:
+        Path(p).unlink(missing_ok=True)
+
+
+def load_yaml(path: str | Path):
+    """Parse a YAML file, reusing the on-disk parsed copy when the file is unchanged.
+
+    Entries live under $XDG_CACHE_HOME/docktapus/yaml (or DTOP_CACHE_DIR) and
+    are keyed by resolved path.  A matching mtime and size returns the cached
+    data without reading the file; otherwise the file is hashed and only
+    re-parsed if its content actually changed.  Every call returns a fresh
+    object, so callers may mutate the result.
+    """
+    with profiler.phase("load yaml", path=str(path)):
+        return _load_yaml(Path(path).expanduser().resolve())
+
+
+def _load_yaml(path: Path):
+    st = path.stat()
+    entry_path = _entry_path(path)
+    entry = _read_entry(entry_path)
+
+    if entry and (entry["mtime_ns"], entry["size"]) == (st.st_mtime_ns, st.st_size):
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry["data"]
+
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if entry and entry["digest"] == digest:
+        data = entry["data"]
+    else:
+        data = yaml.load(raw, Loader=SafeLoader)
+
+    _write_entry(
+        entry_path,
+        {
+            "path": str(path),
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "digest": digest,
+            "data": data,
+        },
+        new=entry is None,
+    )
+    return data
+
+
+def dump_yaml(data, stream):
+    """Write data as YAML using the libyaml dumper when available."""
+    yaml.dump(data, stream, Dumper=SafeDumper, sort_keys=False)
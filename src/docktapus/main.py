@@ -1,47 +1,178 @@
-from docktapus.commands.init import init
-from docktapus.commands.update import update
-from docktapus.commands.up import up
-from docktapus.commands.down import down
-from docktapus.commands.ls import ls
-from docktapus.commands.swap import swap
+import importlib
+from pathlib import Path
+
+import click
 import typer
+from typer.core import TyperGroup
+
+# Subcommands are imported only when invoked, so `dtop ls` never pays for
+# yaml, tempfile or the compose machinery.  name -> (module, function, help, hidden);
+# the attribute may also be a typer.Typer, for commands with subcommands.
+COMMANDS = {
+    "init": (
+        "docktapus.commands.init",
+        "init",
+        "Register a new project with its dev & prod compose files",
+        False,
+    ),
+    "update": (
+        "docktapus.commands.update",
+        "update",
+        "Update an existing project's configuration",
+        False,
+    ),
+    "up": (
+        "docktapus.commands.up",
+        "up",
+        "Start containers (dev services + non-colliding prod services)",
+        False,
+    ),
+    "pull": (
+        "docktapus.commands.pull",
+        "pull",
+        "Pull missing images for a project's services in parallel",
+        False,
+    ),
+    "down": (
+        "docktapus.commands.down",
+        "down",
+        "Stop and remove containers for a project",
+        False,
+    ),
+    "ls": ("docktapus.commands.ls", "ls", "List all Docktapus-managed containers", False),
+    "ps": ("docktapus.commands.ls", "ls", "List all Docktapus-managed containers", True),
+    "swap": (
+        "docktapus.commands.swap",
+        "swap",
+        "Swap a service between dev and prod environments",
+        False,
+    ),
+    "snapshot": (
+        "docktapus.commands.snapshot",
+        "app",
+        "Save and restore which services run as dev or prod",
+        False,
+    ),
+    "volume": (
+        "docktapus.commands.volume",
+        "app",
+        "Clone project volumes, e.g. a prod database into a dev copy",
+        False,
+    ),
+    "gc": (
+        "docktapus.commands.gc",
+        "gc",
+        "Remove orphaned Docktapus containers, networks and volumes",
+        False,
+    ),
+    "stats": (
+        "docktapus.commands.stats",
+        "stats",
+        "Show live CPU and memory use per project and env",
+        False,
+    ),
+    "serve": (
+        "docktapus.commands.serve",
+        "serve",
+        "Run a daemon that keeps Docker state warm for faster commands",
+        False,
+    ),
+}
+
+
+def load_command(name: str) -> click.Command:
+    """Import the module behind a subcommand and build its click command."""
+    module, attr, _, hidden = COMMANDS[name]
+    func = getattr(importlib.import_module(module), attr)
+    if isinstance(func, typer.Typer):
+        group = typer.main.get_group(func)
+        group.name, group.hidden = name, hidden
+        return group
+    sub = typer.Typer(add_completion=False)
+    sub.command(name, hidden=hidden)(func)
+    return typer.main.get_command(sub)
+
+
+class LazyGroup(TyperGroup):
+    """TyperGroup that registers placeholder commands and imports the real one on use."""
+
+    def __init__(self, **attrs):
+        super().__init__(**attrs)
+        # Help listings and typo suggestions only need names and summaries.
+        for name, (_, _, short_help, hidden) in COMMANDS.items():
+            self.add_command(click.Command(name, short_help=short_help, hidden=hidden))
+
+    def resolve_command(self, ctx: click.Context, args: list[str]):
+        cmd_name, cmd, args = super().resolve_command(ctx, args)
+        if cmd_name in COMMANDS:
+            cmd = load_command(cmd_name)
+        return cmd_name, cmd, args
+
 
 app = typer.Typer(
     name="Docktapus",
+    cls=LazyGroup,
     invoke_without_command=True,
     no_args_is_help=False,
 )
 
 
+def _start_profiling(ctx: typer.Context, trace: Path | None):
+    """Record phases and docker calls, reporting them once the command finishes."""
+    from docktapus.commands import profiler
+
+    profiler.enable()
+
+    def report():
+        profiler.print_summary()
+        if trace is not None:
+            profiler.write_trace(trace)
+
+    ctx.call_on_close(report)
+
+
 @app.callback()
-def main(ctx: typer.Context):
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Time each phase and docker call and print a summary to stderr",
+    ),
+    trace: Path = typer.Option(
+        None,
+        "--profile-trace",
+        help="Also write the timings as a Chrome trace-event JSON file (implies --profile)",
+    ),
+):
     """Docktapus CLI - manage dev and prod Docker Compose environments."""
+    if profile or trace is not None:
+        _start_profiling(ctx, trace)
+
     if ctx.invoked_subcommand is None:
         typer.echo(
             "🐙 Docktapus — manage dev & prod Docker Compose environments\n"
             "\n"
-            "Usage: dtop <command> [options]\n"
+            "Usage: dtop [--profile] [--profile-trace FILE] <command> [options]\n"
             "\n"
             "Commands:\n"
             "  init     Register a new project with its dev & prod compose files\n"
             "  update   Update an existing project's configuration\n"
             "  up       Start containers (dev services + non-colliding prod services)\n"
+            "  pull     Pull missing images for a project's services in parallel\n"
             "  down     Stop and remove containers for a project\n"
             "  ls       List all Docktapus-managed containers\n"
             "  swap     Swap a service between dev and prod environments\n"
+            "  snapshot Save and restore which services run as dev or prod\n"
+            "  volume   Clone project volumes, e.g. a prod database into a dev copy\n"
+            "  gc       Remove orphaned Docktapus containers, networks and volumes\n"
+            "  stats    Show live CPU and memory use per project and env\n"
+            "  serve    Run a daemon that keeps Docker state warm for faster commands\n"
             "\n"
             "Run 'dtop <command> --help' for details on a specific command."
         )
         raise typer.Exit()
 
 
-app.command("init")(init)
-app.command("update")(update)
-app.command("up")(up)
-app.command("down")(down)
-app.command("ls")(ls)
-app.command("ps", hidden=True)(ls)
-app.command("swap")(swap)
-
 if __name__ == "__main__":
     app()
@@ -0,0 +1,222 @@
+import json
+import queue
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from docktapus.commands.docker_api import DockerClient, DockerError
+
+CONTAINER = {
+    "Id": "abcdef1234567890",
+    "Names": ["/proj-api-1"],
+    "Image": "api:latest",
+    "State": "running",
+    "Status": "Up 2 minutes",
+    "Ports": [
+        {"IP": "0.0.0.0", "PrivatePort": 80, "PublicPort": 8080, "Type": "tcp"},
+        {"IP": "0.0.0.0", "PrivatePort": 80, "PublicPort": 8080, "Type": "tcp"},
+    ],
+    "Labels": {"dtop.project": "proj", "dtop.env": "dev"},
+    "NetworkSettings": {"Networks": {"proj_net": {}}},
+    "Mounts": [{"Type": "volume", "Name": "proj_data"}, {"Type": "bind", "Source": "/src"}],
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers the handful of Engine API endpoints the tests exercise."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return "unix"
+
+    def _send(self, status: int, body=None):
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        while (event := self.server.events.get()) is not None:
+            line = (json.dumps(event) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.server.requests.append(("GET", url.path, parse_qs(url.query)))
+        if url.path == "/_ping":
+            self._send(200, "OK")
+        elif url.path == "/containers/json":
+            self._send(200, [CONTAINER])
+        elif url.path == "/networks/proj_net":
+            self._send(200, {"Name": "proj_net"})
+        elif url.path == "/events":
+            self._stream_events()
+        else:
+            self._send(404, {"message": f"no such object: {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        self.server.requests.append(("POST", url.path, parse_qs(url.query)))
+        if url.path == "/containers/dropped/stop":
+            # Close the connection without answering.
+            self.close_connection = True
+        elif url.path == "/containers/slow/stop":
+            time.sleep(0.5)
+            self.send_response(204)
+            self.end_headers()
+        elif url.path == "/containers/stopped/stop":
+            # Already stopped: 304 without a body.
+            self.send_response(304)
+            self.end_headers()
+        elif url.path.endswith("/stop"):
+            self.send_response(204)
+            self.end_headers()
+        else:
+            self._send(404, {"message": f"no such object: {url.path}"})
+
+    def do_DELETE(self):
+        url = urlsplit(self.path)
+        self.server.requests.append(("DELETE", url.path, parse_qs(url.query)))
+        self._send(404, {"message": f"no such container: {url.path.rsplit('/', 1)[-1]}"})
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    server = _Server(str(tmp_path / "docker.sock"), _Handler)
+    server.requests = []
+    server.events = queue.Queue()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.events.put(None)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(daemon):
+    client = DockerClient(f"unix://{daemon.server_address}")
+    yield client
+    client.close()
+
+
+def test_ping(client):
+    assert client.ping()
+
+
+def test_ping_without_daemon(tmp_path):
+    assert not DockerClient(f"unix://{tmp_path / 'missing.sock'}").ping()
+
+
+def test_containers_are_normalised_like_the_cli(client, daemon):
+    rows = client.containers({"label": ["dtop.project=proj"]}, all=False)
+
+    assert rows == [
+        {
+            "ID": "abcdef123456",
+            "Names": "proj-api-1",
+            "Image": "api:latest",
+            "State": "running",
+            "Status": "Up 2 minutes",
+            "Ports": "0.0.0.0:8080->80/tcp",
+            "Labels": {"dtop.project": "proj", "dtop.env": "dev"},
+            "Networks": ["proj_net"],
+            "Mounts": ["proj_data"],
+        }
+    ]
+    _, path, query = daemon.requests[-1]
+    assert path == "/containers/json"
+    assert query["all"] == ["0"]
+    assert json.loads(query["filters"][0]) == {"label": ["dtop.project=proj"]}
+
+
+def test_requests_share_one_connection(client, daemon):
+    client.ping()
+    client.containers()
+    assert len(client._idle) == 1
+
+
+def test_network_exists_is_false_on_404(client):
+    assert client.network_exists("proj_net")
+    assert not client.network_exists("other_net")
+
+
+def test_unknown_object_raises_with_status(client):
+    with pytest.raises(DockerError) as excinfo:
+        client.remove_containers(["missing"])
+    assert excinfo.value.status == 404
+
+
+def test_stop_treats_304_as_already_stopped(client, daemon):
+    client.stop_containers(["stopped", "running"], timeout=5)
+
+    stops = sorted((path, query) for method, path, query in daemon.requests if method == "POST")
+    assert stops == [
+        ("/containers/running/stop", {"t": ["5"]}),
+        ("/containers/stopped/stop", {"t": ["5"]}),
+    ]
+
+
+def test_stop_without_timeout_outlasts_the_read_timeout(daemon):
+    client = DockerClient(f"unix://{daemon.server_address}", timeout=0.2)
+    client.stop_containers(["slow"])
+    # The client's own timeout is back in force afterwards.
+    assert client._idle[0].sock.gettimeout() == 0.2
+
+
+def _stops(daemon, cid):
+    return [path for method, path, _ in daemon.requests if path == f"/containers/{cid}/stop"]
+
+
+def test_dropped_new_connection_is_not_retried(client, daemon):
+    with pytest.raises(DockerError):
+        client.stop_containers(["dropped"])
+    assert len(_stops(daemon, "dropped")) == 1
+
+
+def test_dropped_reused_connection_is_retried_once(client, daemon):
+    client.ping()
+    with pytest.raises(DockerError):
+        client.stop_containers(["dropped"])
+    assert len(_stops(daemon, "dropped")) == 2
+
+
+def test_events_follow_a_chunked_stream(client, daemon):
+    daemon.events.put({"Type": "container", "Action": "start", "Actor": {"ID": "abcdef1234567890"}})
+    daemon.events.put(
+        {
+            "Type": "container",
+            "Action": "die",
+            "Actor": {"ID": "abcdef1234567890", "Attributes": {"exitCode": "0"}},
+        }
+    )
+    daemon.events.put(None)
+
+    events = list(client.events({"type": ["container"]}, since=100))
+
+    assert events == [
+        {"Type": "container", "Action": "start", "ID": "abcdef123456", "Attributes": {}},
+        {"Type": "container", "Action": "die", "ID": "abcdef123456", "Attributes": {"exitCode": "0"}},
+    ]
+    _, path, query = daemon.requests[-1]
+    assert path == "/events"
+    assert query["since"] == ["100"]
@@ -0,0 +1,79 @@
+import pytest
+
+from docktapus.commands.down import _grace_seconds, _shutdown_graph
+from docktapus.commands.inventory import Container
+from docktapus.commands.scheduler import shutdown_tiers
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [
+        (None, None),
+        (10, 10),
+        (2.5, 3),
+        ("10s", 10),
+        ("1m30s", 90),
+        ("1h", 3600),
+        ("1.5s", 2),
+        ("500ms", 1),
+        ("0s", 0),
+        ("10", None),
+        ("ten seconds", None),
+        ("10s later", None),
+    ],
+)
+def test_grace_seconds(value, seconds):
+    assert _grace_seconds(value) == seconds
+
+
+def test_dependents_stop_before_their_dependencies():
+    graph = {
+        ("prod", "web"): {("dev", "api")},
+        ("dev", "api"): {("prod", "db"), ("prod", "cache")},
+        ("prod", "db"): set(),
+        ("prod", "cache"): set(),
+        ("prod", "cron"): {("prod", "db")},
+    }
+    assert shutdown_tiers(graph) == [
+        [("prod", "cron"), ("prod", "web")],
+        [("dev", "api")],
+        [("prod", "cache"), ("prod", "db")],
+    ]
+
+
+def test_cycle_shares_the_last_tier():
+    graph = {
+        ("prod", "a"): {("prod", "b")},
+        ("prod", "b"): {("prod", "a")},
+        ("prod", "c"): {("prod", "a")},
+    }
+    assert shutdown_tiers(graph) == [[("prod", "c")], [("prod", "a"), ("prod", "b")]]
+
+
+def _container(env: str, service: str) -> Container:
+    return Container.from_row(
+        {
+            "ID": f"{env}-{service}",
+            "State": "running",
+            "Labels": {
+                "dtop.project": "proj",
+                "dtop.env": env,
+                "com.docker.compose.service": service,
+            },
+        }
+    )
+
+
+def test_shutdown_graph_follows_the_env_each_service_runs_in():
+    containers = [_container("prod", "db"), _container("dev", "api"), _container("prod", "web")]
+    composes = {
+        "prod": {"services": {"web": {"depends_on": ["api", "gone"]}, "db": {}}},
+        "dev": {"services": {"api": {"depends_on": {"db": {"condition": "service_healthy"}}}}},
+    }
+    graph, by_node = _shutdown_graph(containers, composes)
+    assert graph == {
+        ("prod", "db"): set(),
+        ("dev", "api"): {("prod", "db")},
+        ("prod", "web"): {("dev", "api")},
+    }
+    assert [c.id for c in by_node[("dev", "api")]] == ["dev-api"]
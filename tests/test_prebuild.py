@@ -0,0 +1,73 @@
+import pytest
+
+from docktapus.commands.prebuild import _ignore_patterns, _ignored, build_hash
+
+
+@pytest.mark.parametrize(
+    "rel, pattern, ignored",
+    [
+        ("README.md", "*.md", True),
+        ("docs/x.md", "*.md", False),
+        ("docs/x.md", "**/*.md", True),
+        ("README.md", "**/*.md", True),
+        ("docs/deep/x.md", "docs/*.md", False),
+        ("docs/deep/x.md", "docs/**", True),
+        ("docs/x.md", "docs", True),
+        ("a/b", "?/b", True),
+        ("ab/b", "?/b", False),
+        ("x.log", "x.[lt]og", True),
+        ("node_modules/pkg/index.js", "node_modules", True),
+    ],
+)
+def test_patterns_match_like_docker(rel, pattern, ignored):
+    assert _ignored(rel, [(pattern, False)]) is ignored
+
+
+def test_last_matching_pattern_wins():
+    assert not _ignored("README.md", [("*.md", False), ("README.md", True)])
+    assert _ignored("README.md", [("README.md", True), ("*.md", False)])
+    assert _ignored("CHANGES.md", [("*.md", False), ("README.md", True)])
+
+
+def test_ignore_file_is_parsed_in_order(tmp_path):
+    (tmp_path / ".dockerignore").write_text("# comment\n\n/build/\n*.md\n!README.md\n")
+    assert _ignore_patterns(tmp_path) == [("build", False), ("*.md", False), ("README.md", True)]
+
+
+@pytest.fixture
+def context(tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM scratch\n")
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "x.md").write_text("one")
+    (tmp_path / "NOTES.md").write_text("notes")
+    (tmp_path / ".dockerignore").write_text("*.md\n")
+    return tmp_path
+
+
+def test_hash_changes_with_files_docker_sends(context):
+    svc_cfg = {"build": {"context": "."}}
+    before = build_hash(svc_cfg, context)
+    (context / "docs" / "x.md").write_text("two")
+    assert build_hash(svc_cfg, context) != before
+
+
+def test_hash_ignores_excluded_files(context):
+    svc_cfg = {"build": {"context": "."}}
+    before = build_hash(svc_cfg, context)
+    (context / "NOTES.md").write_text("edited")
+    assert build_hash(svc_cfg, context) == before
+
+
+def test_hash_covers_dockerfile_and_build_args(context, monkeypatch):
+    svc_cfg = {"build": {"context": ".", "args": ["VERSION"]}}
+    monkeypatch.setenv("VERSION", "1")
+    before = build_hash(svc_cfg, context)
+    monkeypatch.setenv("VERSION", "2")
+    assert build_hash(svc_cfg, context) != before
+    monkeypatch.setenv("VERSION", "1")
+    (context / "Dockerfile").write_text("FROM busybox\n")
+    assert build_hash(svc_cfg, context) != before
+
+
+def test_remote_context_is_not_hashed(tmp_path):
+    assert build_hash({"build": "https://github.com/example/repo.git"}, tmp_path) is None
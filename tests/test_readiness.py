@@ -0,0 +1,112 @@
+import socket
+
+import pytest
+
+from docktapus.commands import readiness
+from docktapus.commands.docker_api import _normalise_inspect
+from docktapus.commands.readiness import NotReadyError, _accepts_tcp, wait_completed
+
+
+def _inspect(ports: dict) -> dict:
+    return {
+        "Id": "abcdef1234567890",
+        "Name": "/proj-api-1",
+        "State": {"Status": "running"},
+        "Config": {"ExposedPorts": {"80/tcp": {}, "53/udp": {}}},
+        "NetworkSettings": {"Ports": ports, "Networks": {"proj_net": {"IPAddress": "172.18.0.2"}}},
+    }
+
+
+def test_published_ports_are_probed_on_the_host(monkeypatch):
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    info = _normalise_inspect(_inspect({"80/tcp": [{"HostIp": "0.0.0.0", "HostPort": "8080"}]}))
+    assert info["TCPAddresses"] == [("127.0.0.1", 8080)]
+
+
+def test_published_ports_of_a_remote_daemon(monkeypatch):
+    monkeypatch.setenv("DOCKER_HOST", "tcp://build.example:2375")
+    info = _normalise_inspect(_inspect({"80/tcp": [{"HostIp": "", "HostPort": "8080"}]}))
+    assert info["TCPAddresses"] == [("build.example", 8080)]
+
+
+def test_unpublished_ports_are_probed_on_the_container():
+    info = _normalise_inspect(_inspect({"80/tcp": None}))
+    assert info["TCPAddresses"] == [("172.18.0.2", 80)]
+
+
+@pytest.fixture
+def listener():
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        yield server.getsockname()
+
+
+@pytest.fixture
+def closed_port():
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        address = server.getsockname()
+    return address
+
+
+def test_listening_port_is_ready(listener, closed_port):
+    assert _accepts_tcp({"TCPAddresses": [closed_port, listener]})
+
+
+def test_refused_port_is_retried(closed_port):
+    info = {"TCPAddresses": [closed_port]}
+    assert not _accepts_tcp(info)
+    assert info["TCPAddresses"] == [closed_port]
+
+
+def test_unreachable_address_is_dropped(monkeypatch, closed_port):
+    def unreachable(address, timeout):
+        raise TimeoutError if address != closed_port else ConnectionRefusedError
+
+    monkeypatch.setattr(socket, "create_connection", unreachable)
+    info = {"TCPAddresses": [("172.18.0.2", 80), closed_port]}
+    assert not _accepts_tcp(info)
+    assert info["TCPAddresses"] == [closed_port]
+
+    info = {"TCPAddresses": [("172.18.0.2", 80)]}
+    assert _accepts_tcp(info)
+    assert info["TCPAddresses"] == []
+
+
+class _Client:
+    """Reports one running container, then replays the given events."""
+
+    def __init__(self, events: list[dict]):
+        self._events = events
+
+    def inspect_containers(self, ids):
+        return [
+            {
+                "ID": "c1",
+                "Name": "proj-migrate-1",
+                "State": "running",
+                "Health": None,
+                "ExitCode": 0,
+                "TCPAddresses": [],
+            }
+        ]
+
+    def events(self, filters, since=None, until=None):
+        yield from self._events
+
+
+def _event(action: str, **attributes) -> dict:
+    return {"Type": "container", "Action": action, "ID": "c1", "Attributes": attributes}
+
+
+def test_completion_follows_die_exit_code(monkeypatch):
+    monkeypatch.setattr(readiness, "get_client", lambda: _Client([_event("die", exitCode="0")]))
+    wait_completed(["c1"])
+
+    monkeypatch.setattr(readiness, "get_client", lambda: _Client([_event("die", exitCode="3")]))
+    with pytest.raises(NotReadyError, match="exited with code 3"):
+        wait_completed(["c1"])
+
+
+def test_destroy_without_die_is_a_failure(monkeypatch):
+    monkeypatch.setattr(readiness, "get_client", lambda: _Client([_event("destroy")]))
+    with pytest.raises(NotReadyError, match="was removed"):
+        wait_completed(["c1"])
@@ -0,0 +1,97 @@
+import os
+import threading
+
+import pytest
+import yaml
+
+from docktapus.commands import registry as registry_module
+from docktapus.commands.registry import Registry, open_registry
+
+
+def _write_legacy(path, projects: dict, mtime_ns: int):
+    path.write_text(yaml.safe_dump({"projects": projects}))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    path = tmp_path / "dtop.yml"
+    _write_legacy(path, {"api": {"compose": {"dev": "a.yml"}}, "web": {"compose": {}}}, 10**18)
+    return path
+
+
+def test_legacy_config_is_imported_once(legacy):
+    registry = open_registry(legacy)
+    assert registry.projects_dir == legacy.with_suffix(".d") / "projects"
+    assert registry.names() == ["api", "web"]
+    assert registry.get("api") == {"compose": {"dev": "a.yml"}}
+    assert registry.import_legacy() == []
+
+
+def test_only_changed_legacy_entries_are_reimported(legacy):
+    registry = open_registry(legacy)
+    with registry.edit("web") as project:
+        project["compose"]["dev"] = "edited.yml"
+
+    _write_legacy(
+        legacy, {"api": {"compose": {"dev": "b.yml"}}, "web": {"compose": {}}}, 10**18 + 1
+    )
+    assert registry.import_legacy() == ["api"]
+    assert registry.get("api") == {"compose": {"dev": "b.yml"}}
+    # The registry edit isn't clobbered by the unchanged legacy entry.
+    assert registry.get("web") == {"compose": {"dev": "edited.yml"}}
+
+
+def test_registry_directory_has_no_legacy_config(tmp_path):
+    registry = open_registry(tmp_path)
+    assert registry.legacy_config is None
+    assert registry.names() == []
+    assert registry.get("missing") is None
+
+
+def test_concurrent_edits_are_serialised(tmp_path):
+    registry = Registry(tmp_path)
+    with registry.lock("api"):
+        registry.put("api", {"count": 0})
+
+    def bump():
+        for _ in range(10):
+            with registry.edit("api") as project:
+                project["count"] += 1
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.get("api") == {"count": 40}
+
+
+def test_edit_of_missing_project_writes_nothing(tmp_path):
+    registry = Registry(tmp_path)
+    with registry.edit("ghost") as project:
+        assert project is None
+    assert registry.names() == []
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path, monkeypatch):
+    registry = Registry(tmp_path)
+    registry.put("api", {"compose": {"dev": "a.yml"}})
+
+    def broken_dump(data, f):
+        f.write("compose: {dev: ")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(registry_module, "dump_yaml", broken_dump)
+    with pytest.raises(OSError, match="disk full"):
+        registry.put("api", {"compose": {"dev": "b.yml"}})
+
+    assert registry.get("api") == {"compose": {"dev": "a.yml"}}
+    assert [p.name for p in registry.projects_dir.iterdir() if p.suffix == ".tmp"] == []
+
+
+def test_names_round_trip_through_file_names(tmp_path):
+    registry = Registry(tmp_path)
+    registry.put("team/api v2", {})
+    assert registry.names() == ["team/api v2"]
+    assert registry.get("team/api v2") == {}
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from docktapus.commands.compose_utils import drop_foreign_depends_on
+from docktapus.commands.scheduler import (
+    DependencyCycleError,
+    compose_runs,
+    run_service_graph,
+)
+
+
+def test_same_env_dependencies_share_a_run():
+    graph = {
+        ("prod", "api"): {("prod", "db")},
+        ("prod", "db"): set(),
+        ("prod", "worker"): {("prod", "api")},
+    }
+    assert compose_runs(graph) == {("prod", "db"): 0, ("prod", "api"): 0, ("prod", "worker"): 0}
+
+
+def test_crossing_envs_starts_a_later_run():
+    graph = {
+        ("prod", "db"): set(),
+        ("dev", "api"): {("prod", "db")},
+        ("prod", "web"): {("dev", "api")},
+        ("prod", "cache"): set(),
+    }
+    assert compose_runs(graph) == {
+        ("prod", "db"): 0,
+        ("prod", "cache"): 0,
+        ("dev", "api"): 1,
+        ("prod", "web"): 2,
+    }
+
+
+def test_cycle_is_reported():
+    graph = {("prod", "a"): {("dev", "b")}, ("dev", "b"): {("prod", "a")}}
+    with pytest.raises(DependencyCycleError, match="dev:b, prod:a"):
+        compose_runs(graph)
+
+
+def test_runs_launch_after_their_dependencies():
+    graph = {
+        ("prod", "db"): set(),
+        ("dev", "api"): {("prod", "db")},
+        ("prod", "web"): {("dev", "api")},
+    }
+    launched = []
+    run_service_graph(graph, lambda env, services, cancel: launched.append((env, services)))
+    assert launched == [("prod", ["db"]), ("dev", ["api"]), ("prod", ["web"])]
+
+
+def test_failed_launch_cancels_the_rest():
+    graph = {
+        ("prod", "db"): set(),
+        ("dev", "slow"): set(),
+        ("dev", "api"): {("prod", "db")},
+    }
+    slow_started = threading.Event()
+    slow_cancelled = threading.Event()
+    launched = []
+
+    def launch(env, services, cancel):
+        launched.append((env, services))
+        if env == "prod":
+            slow_started.wait(5)
+            raise RuntimeError("compose failed")
+        # The dev run started alongside prod sees the cancellation.
+        slow_started.set()
+        if cancel.wait(5):
+            slow_cancelled.set()
+
+    with pytest.raises(RuntimeError, match="compose failed"):
+        run_service_graph(graph, launch, jobs=2)
+    assert slow_cancelled.is_set()
+    assert ("dev", ["api"]) not in launched
+
+
+def test_foreign_depends_on_is_dropped():
+    compose_data = {
+        "services": {
+            "api": {"depends_on": {"db": {"condition": "service_healthy"}, "auth": {}}},
+            "worker": {"depends_on": ["api", "queue"]},
+            "auth": {"image": "auth"},
+            "cron": {"depends_on": ["queue"]},
+        }
+    }
+    services = drop_foreign_depends_on(compose_data)["services"]
+    assert services["api"]["depends_on"] == {"auth": {}}
+    assert services["worker"]["depends_on"] == ["api"]
+    assert "depends_on" not in services["cron"]
+    # The input is left untouched.
+    assert compose_data["services"]["cron"]["depends_on"] == ["queue"]
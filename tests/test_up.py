@@ -0,0 +1,45 @@
+from docktapus.commands import up
+from docktapus.commands.compose_utils import CONFIG_HASH_LABEL
+from docktapus.commands.inventory import Container, Inventory
+
+
+def _container(image: str, state: str = "running", digest: str = "abc") -> Container:
+    return Container.from_row(
+        {
+            "ID": "c1",
+            "Image": image,
+            "State": state,
+            "Labels": {
+                "dtop.project": "proj",
+                "com.docker.compose.project": "proj",
+                "dtop.env": "prod",
+                "com.docker.compose.service": "cache",
+                CONFIG_HASH_LABEL: digest,
+            },
+        }
+    )
+
+
+def _unchanged(container: Container, image: str) -> set:
+    labelled = {
+        "prod": {"services": {"cache": {"image": image, "labels": {CONFIG_HASH_LABEL: "abc"}}}}
+    }
+    inventory = Inventory([container])
+    return up._unchanged_services(inventory, "proj", labelled, [("prod", "cache")], set())
+
+
+def test_running_container_with_same_hash_is_unchanged():
+    assert _unchanged(_container("redis:7"), "docker.io/library/redis:7") == {("prod", "cache")}
+
+
+def test_stopped_container_is_changed():
+    assert _unchanged(_container("redis:7", state="exited"), "redis:7") == set()
+
+
+def test_repulled_tag_is_changed():
+    # Docker lists a container by image ID once its tag points elsewhere.
+    assert _unchanged(_container("sha256:0123456789ab"), "redis:7") == set()
+
+
+def test_changed_hash_is_changed():
+    assert _unchanged(_container("redis:7", digest="old"), "redis:7") == set()
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from docktapus.commands import yaml_cache
+from docktapus.commands.yaml_cache import load_yaml
+
+
+@pytest.fixture
+def parses(tmp_path, monkeypatch):
+    """Point the cache at tmp_path and count real YAML parses."""
+    monkeypatch.setenv("DTOP_CACHE_DIR", str(tmp_path / "cache"))
+    calls = []
+    real_load = yaml_cache.yaml.load
+
+    def counting_load(*args, **kwargs):
+        calls.append(args)
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(yaml_cache.yaml, "load", counting_load)
+    return calls
+
+
+def _write(path, text: str, mtime_ns: int):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_file_is_not_read_again(tmp_path, parses, monkeypatch):
+    path = tmp_path / "compose.yml"
+    _write(path, "services: {db: {}}\n", 10**18)
+    assert load_yaml(path) == {"services": {"db": {}}}
+
+    monkeypatch.setattr(type(path), "read_bytes", lambda self: pytest.fail("file was read"))
+    assert load_yaml(path) == {"services": {"db": {}}}
+    assert len(parses) == 1
+
+
+def test_changed_mtime_and_size_reparse(tmp_path, parses):
+    path = tmp_path / "compose.yml"
+    _write(path, "services: {db: {}}\n", 10**18)
+    load_yaml(path)
+    _write(path, "services: {db: {}, api: {}}\n", 10**18 + 1)
+    assert load_yaml(path) == {"services": {"db": {}, "api": {}}}
+    assert len(parses) == 2
+
+
+def test_changed_size_alone_reparses(tmp_path, parses):
+    path = tmp_path / "compose.yml"
+    _write(path, "a: 1\n", 10**18)
+    load_yaml(path)
+    _write(path, "a: 12\n", 10**18)
+    assert load_yaml(path) == {"a": 12}
+
+
+def test_same_size_new_content_is_caught_by_mtime(tmp_path, parses):
+    path = tmp_path / "compose.yml"
+    _write(path, "a: 1\n", 10**18)
+    load_yaml(path)
+    _write(path, "a: 2\n", 10**18 + 1)
+    assert load_yaml(path) == {"a": 2}
+    assert len(parses) == 2
+
+
+def test_touched_file_with_same_content_is_not_reparsed(tmp_path, parses):
+    path = tmp_path / "compose.yml"
+    _write(path, "a: 1\n", 10**18)
+    load_yaml(path)
+    # Only the sha256 shows nothing changed; the entry takes the new mtime.
+    _write(path, "a: 1\n", 10**18 + 1)
+    assert load_yaml(path) == {"a": 1}
+    _write(path, "a: 1\n", 10**18 + 1)
+    assert load_yaml(path) == {"a": 1}
+    assert len(parses) == 1
+
+
+def test_every_call_returns_a_fresh_object(tmp_path, parses):
+    path = tmp_path / "compose.yml"
+    _write(path, "services: {db: {}}\n", 10**18)
+    load_yaml(path)["services"]["db"]["image"] = "mutated"
+    assert load_yaml(path) == {"services": {"db": {}}}
+
+
+def test_corrupt_entry_is_ignored(tmp_path, parses):
+    path = tmp_path / "compose.yml"
+    _write(path, "a: 1\n", 10**18)
+    load_yaml(path)
+    yaml_cache._entry_path(path.resolve()).write_bytes(b"not a pickle")
+    assert load_yaml(path) == {"a": 1}
+
+
+def test_eviction_trims_a_batch_of_the_oldest_entries(tmp_path, parses, monkeypatch):
+    monkeypatch.setenv("DTOP_YAML_CACHE_ENTRIES", "4")
+    paths = []
+    for i in range(5):
+        paths.append(tmp_path / f"{i}.yml")
+        _write(paths[-1], f"n: {i}\n", 10**18)
+        load_yaml(paths[-1])
+        if i < 4:
+            os.utime(yaml_cache._entry_path(paths[-1].resolve()), ns=(i, i))
+    # The fifth entry went over the cap of 4; the cache is back to 3.
+    cached = {p.name for p in (tmp_path / "cache").glob("*.pickle")}
+    assert cached == {yaml_cache._entry_path(p.resolve()).name for p in paths[2:]}
+
+
+def test_updating_an_entry_does_not_evict(tmp_path, parses, monkeypatch):
+    path = tmp_path / "compose.yml"
+    _write(path, "a: 1\n", 10**18)
+    load_yaml(path)
+    evictions = []
+    monkeypatch.setattr(yaml_cache, "_evict", evictions.append)
+    _write(path, "a: 2\n", 10**18 + 1)
+    load_yaml(path)
+    assert evictions == []